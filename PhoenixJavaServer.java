@@ -0,0 +1,713 @@
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileManager;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.io.PrintWriter;
+import java.io.StringWriter;
+import java.lang.management.ManagementFactory;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.security.MessageDigest;
+import java.security.NoSuchAlgorithmException;
+import java.security.Permission;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.PropertyPermission;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.zip.Deflater;
+import java.util.zip.GZIPOutputStream;
+
+/**
+ * Long-lived JVM that compiles submissions in memory and runs each one in its own class loader.
+ * Started and restarted by Phoenix_java.py; speaks a length-prefixed protocol on a loopback port.
+ */
+public class PhoenixJavaServer {
+    static final int CACHE_ENTRIES = 128;
+    static final JavaCompiler COMPILER = ToolProvider.getSystemJavaCompiler();
+    static final ThreadMXBean THREADS = ManagementFactory.getThreadMXBean();
+    static final long POLL_MS = 10;  // How often a run's CPU time and threads are checked
+
+    // Compiled class bytes by source hash, least recently used evicted first
+    static final Map<String, Map<String, byte[]>> CLASS_CACHE = Collections.synchronizedMap(
+        new LinkedHashMap<String, Map<String, byte[]>>(16, 0.75f, true) {
+            @Override
+            protected boolean removeEldestEntry(Map.Entry<String, Map<String, byte[]>> eldest) {
+                return size() > CACHE_ENTRIES;
+            }
+        });
+
+    static final ConcurrentHashMap<String, Object> COMPILE_LOCKS = new ConcurrentHashMap<>();
+
+    // Per-run stdin/stdout/stderr; inherited by threads the submission starts itself
+    static final InheritableThreadLocal<InputStream> IN = new InheritableThreadLocal<>();
+    static final InheritableThreadLocal<PrintStream> OUT = new InheritableThreadLocal<>();
+    static final InheritableThreadLocal<PrintStream> ERR = new InheritableThreadLocal<>();
+    static final InheritableThreadLocal<Job> JOB = new InheritableThreadLocal<>();
+
+    // Settings a submission may not change, because every other run in this JVM would see them
+    static final List<Permission> SHARED_STATE = List.of(
+        new RuntimePermission("setIO"),
+        new RuntimePermission("setSecurityManager"),
+        new RuntimePermission("shutdownHooks"),
+        new RuntimePermission("setDefaultUncaughtExceptionHandler"),
+        new PropertyPermission("*", "write"));  // System.setProperty, Locale.setDefault, TimeZone.setDefault
+
+    public static void main(String[] args) throws IOException {
+        int workers = args.length > 0 ? Integer.parseInt(args[0]) : Runtime.getRuntime().availableProcessors();
+        PrintStream console = System.out;
+        System.setIn(new DispatchInputStream());
+        System.setOut(new PrintStream(new DispatchOutputStream(OUT, console), true));
+        System.setErr(new PrintStream(new DispatchOutputStream(ERR, System.err), true));
+        if (!installGuard()) {
+            // Without it one run could change what every other run sees; Python uses javac/java instead
+            console.println("UNSUPPORTED no security manager");
+            console.flush();
+            System.exit(2);
+        }
+        if (THREADS.isThreadCpuTimeSupported()) {
+            THREADS.setThreadCpuTimeEnabled(true);
+        }
+
+        ServerSocket server = new ServerSocket(0, 50, InetAddress.getLoopbackAddress());
+        console.println("PORT " + server.getLocalPort());
+        console.flush();
+
+        ExecutorService pool = Executors.newFixedThreadPool(workers);
+        while (true) {
+            Socket socket = server.accept();
+            pool.submit(() -> handle(socket));
+        }
+    }
+
+    static void handle(Socket socket) {
+        boolean restart = false;
+        try (Socket s = socket;
+             DataInputStream in = new DataInputStream(new BufferedInputStream(s.getInputStream()));
+             DataOutputStream out = new DataOutputStream(new BufferedOutputStream(s.getOutputStream()))) {
+            String className = readString(in);
+            String mainClass = readString(in);
+            String source = readString(in);
+            byte[] stdin = readBytes(in);
+            long timeoutMs = in.readLong();
+            long cpuLimitMs = in.readLong();
+            long maxOutput = in.readLong();
+            int headBytes = in.readInt();
+            int tailBytes = in.readInt();
+            String spillDir = readString(in);
+
+            CaptureOutputStream stdout = new CaptureOutputStream(maxOutput, headBytes, tailBytes,
+                                                                 spillDir.isEmpty() ? null : new File(spillDir));
+            CaptureOutputStream stderr = new CaptureOutputStream(maxOutput, headBytes, tailBytes, null);
+            Result result = execute(className, mainClass, source, stdin, timeoutMs, cpuLimitMs, stdout, stderr);
+            writeString(out, result.status);
+            writeCapture(out, stdout);
+            writeCapture(out, stderr);
+            out.writeLong(result.wallNanos);
+            out.writeLong(result.cpuNanos);
+            out.writeBoolean(result.cached);
+            out.flush();
+            restart = result.restart;
+        } catch (IOException e) {
+            // Client went away; nothing to report
+        }
+        if (restart) {
+            // A submission thread could not be stopped; Python starts a fresh daemon
+            Runtime.getRuntime().halt(3);
+        }
+    }
+
+    static class Result {
+        String status = "ok";
+        long wallNanos = 0;
+        long cpuNanos = -1;
+        boolean cached = false;
+        boolean restart = false;
+    }
+
+    /** What the security manager needs to know about the run a thread belongs to. */
+    static class Job {
+        final ThreadGroup group;
+        volatile boolean denied = false;
+        volatile Integer exitStatus = null;  // Set by System.exit() from any of its threads
+
+        Job(ThreadGroup group) {
+            this.group = group;
+        }
+    }
+
+    @SuppressWarnings({"deprecation", "removal"})  // ThreadGroup.setDaemon, Thread.getId
+    static Result execute(String className, String mainClass, String source, byte[] stdin, long timeoutMs,
+                          long cpuLimitMs, CaptureOutputStream stdout, CaptureOutputStream stderr) {
+        Result result = new Result();
+        if (cpuLimitMs > 0 && !THREADS.isThreadCpuTimeSupported()) {
+            result.status = "unsupported";  // The CPU limit can't be measured here
+            return result;
+        }
+        String key = sha256(className + "\0" + source);
+        Map<String, byte[]> classes;
+        // Concurrent runs of the same source (e.g. a batch of test cases) wait for a single compile
+        synchronized (COMPILE_LOCKS.computeIfAbsent(key, k -> new Object())) {
+            classes = CLASS_CACHE.get(key);
+            result.cached = classes != null;
+            if (classes == null) {
+                StringBuilder errors = new StringBuilder();
+                classes = compile(className, source, errors);
+                if (classes != null) {
+                    CLASS_CACHE.put(key, classes);
+                }
+                COMPILE_LOCKS.remove(key);
+                if (classes == null) {
+                    result.status = "compile_error";
+                    stderr.writeQuietly(errors.toString());
+                    return result;
+                }
+            }
+        }
+
+        // A fresh loader per run keeps static state from leaking between submissions.
+        // The file is named after the public class, which need not be the one declaring main()
+        Method main;
+        try {
+            Class<?> cls = new MemoryClassLoader(classes).loadClass(mainClass);
+            main = cls.getMethod("main", String[].class);
+            main.setAccessible(true);
+        } catch (ReflectiveOperationException | LinkageError e) {
+            result.status = "runtime_error";
+            stderr.writeQuietly("Error: no main method found in class " + mainClass);
+            return result;
+        }
+
+        // Every thread of the run lives in its own group, so its CPU time can be summed and leftovers stopped
+        ThreadGroup group = new ThreadGroup("submission-" + key.substring(0, 8)) {
+            @Override
+            public void uncaughtException(Thread thread, Throwable e) {
+                if (!(e instanceof ExitException)) {  // System.exit() in a thread is not a crash
+                    super.uncaughtException(thread, e);
+                }
+            }
+        };
+        group.setDaemon(true);
+        Job job = new Job(group);
+        Throwable[] failure = new Throwable[1];
+        long[] cpu = {-1};
+        Thread runner = new Thread(group, () -> {
+            IN.set(new ByteArrayInputStream(stdin));
+            OUT.set(new PrintStream(stdout, true, StandardCharsets.UTF_8));
+            ERR.set(new PrintStream(stderr, true, StandardCharsets.UTF_8));
+            JOB.set(job);
+            try {
+                main.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                failure[0] = e.getCause();
+            } catch (Throwable e) {
+                failure[0] = e;
+            } finally {
+                if (THREADS.isCurrentThreadCpuTimeSupported()) {
+                    cpu[0] = THREADS.getCurrentThreadCpuTime();
+                }
+            }
+        }, "main");
+        runner.setDaemon(false);  // Like a real main thread, so the threads it starts are non-daemon too
+
+        long started = System.nanoTime();
+        long deadline = started + timeoutMs * 1_000_000L;
+        Map<Long, Long> threadCpu = new HashMap<>();  // Last CPU time seen per thread, kept after it ends
+        runner.start();
+        try {
+            // As in a real JVM the program runs until its last non-daemon thread ends
+            while (true) {
+                Thread waitFor = null;
+                for (Thread thread : threadsOf(group)) {
+                    long nanos = THREADS.getThreadCpuTime(thread.getId());
+                    if (nanos >= 0) {
+                        threadCpu.merge(thread.getId(), nanos, Math::max);
+                    }
+                    if (waitFor == null && !thread.isDaemon() && thread.isAlive()) {
+                        waitFor = thread;
+                    }
+                }
+                if (waitFor == null || job.exitStatus != null) {
+                    break;  // System.exit() ends the whole program, whichever thread called it
+                }
+                if (cpuLimitMs > 0 && sum(threadCpu) > cpuLimitMs * 1_000_000L) {
+                    result.status = "cpu_limit";
+                    break;
+                }
+                if (System.nanoTime() > deadline) {
+                    result.status = "timeout";
+                    break;
+                }
+                waitFor.join(POLL_MS);
+            }
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+        }
+        result.wallNanos = System.nanoTime() - started;
+
+        // Daemon threads, and everything once a limit was hit, must not outlive the run
+        result.restart = !stopAll(group);
+        if (cpu[0] >= 0) {
+            threadCpu.merge(runner.getId(), cpu[0], Math::max);
+        }
+        result.cpuNanos = THREADS.isThreadCpuTimeSupported() ? sum(threadCpu) : -1;
+
+        if (job.denied) {
+            result.status = "unsupported";  // It changed JVM-wide state; Python reruns it in its own JVM
+        } else if (!result.status.equals("ok")) {
+            // Limit hit; already set above
+        } else if (job.exitStatus != null) {
+            if (job.exitStatus != 0) {
+                result.status = "runtime_error";
+                stderr.writeQuietly("Program exited with status " + job.exitStatus);
+            }
+        } else if (failure[0] instanceof OutputLimitError) {
+            result.status = "output_limit";
+        } else if (failure[0] instanceof OutOfMemoryError) {
+            result.status = "memory_limit";
+        } else if (failure[0] != null) {
+            result.status = "runtime_error";
+            StringWriter trace = new StringWriter();
+            failure[0].printStackTrace(new PrintWriter(trace));
+            stderr.writeQuietly("Exception in thread \"main\" " + trace);
+        }
+        return result;
+    }
+
+    static List<Thread> threadsOf(ThreadGroup group) {
+        Thread[] threads = new Thread[group.activeCount() + 16];
+        int count = group.enumerate(threads, true);
+        List<Thread> alive = new ArrayList<>();
+        for (int i = 0; i < count; i++) {
+            if (threads[i].isAlive()) {
+                alive.add(threads[i]);
+            }
+        }
+        return alive;
+    }
+
+    static long sum(Map<Long, Long> threadCpu) {
+        long total = 0;
+        for (long nanos : threadCpu.values()) {
+            total += nanos;
+        }
+        return total;
+    }
+
+    /** Stops every thread left in the group; false when one of them would not stop. */
+    @SuppressWarnings({"deprecation", "removal"})
+    static boolean stopAll(ThreadGroup group) {
+        List<Thread> threads = threadsOf(group);
+        for (Thread thread : threads) {
+            try {
+                thread.stop();
+            } catch (UnsupportedOperationException e) {
+                // Thread.stop is gone on newer JDKs; the caller restarts the daemon instead
+                return false;
+            }
+        }
+        long deadline = System.nanoTime() + 1_000_000_000L;
+        for (Thread thread : threads) {
+            try {
+                thread.join(Math.max(1, (deadline - System.nanoTime()) / 1_000_000L));
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+            }
+            if (thread.isAlive()) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    static Map<String, byte[]> compile(String className, String source, StringBuilder errors) {
+        if (COMPILER == null) {
+            errors.append("No Java compiler available in this JVM (a JDK is required).");
+            return null;
+        }
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        Map<String, ByteArrayOutputStream> outputs = new HashMap<>();
+        StandardJavaFileManager standard = COMPILER.getStandardFileManager(diagnostics, null, StandardCharsets.UTF_8);
+        JavaFileManager manager = new ForwardingJavaFileManager<StandardJavaFileManager>(standard) {
+            @Override
+            public JavaFileObject getJavaFileForOutput(Location location, String name, JavaFileObject.Kind kind, FileObject sibling) {
+                return new SimpleJavaFileObject(URI.create("mem:///" + name.replace('.', '/') + kind.extension), kind) {
+                    @Override
+                    public OutputStream openOutputStream() {
+                        ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+                        outputs.put(name, bytes);
+                        return bytes;
+                    }
+                };
+            }
+        };
+        JavaFileObject file = new SimpleJavaFileObject(URI.create("string:///" + className + ".java"), JavaFileObject.Kind.SOURCE) {
+            @Override
+            public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+                return source;
+            }
+        };
+
+        boolean ok = COMPILER.getTask(null, manager, diagnostics, null, null, List.of(file)).call();
+        if (!ok) {
+            // Same shape as javac's own messages: File.java:LINE: error: MESSAGE
+            for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+                errors.append(className).append(".java:").append(d.getLineNumber()).append(": ")
+                      .append(d.getKind().toString().toLowerCase()).append(": ")
+                      .append(d.getMessage(null)).append('\n');
+            }
+            return null;
+        }
+        Map<String, byte[]> classes = new HashMap<>();
+        outputs.forEach((name, bytes) -> classes.put(name, bytes.toByteArray()));
+        return classes;
+    }
+
+    @SuppressWarnings("removal")
+    static boolean installGuard() {
+        // System.exit() from a submission ends only that run, not the daemon; the rest of the checks
+        // keep a submission to its own threads and away from settings every run shares
+        try {
+            System.setSecurityManager(new SecurityManager() {
+                @Override
+                public void checkPermission(Permission perm) {
+                    Job job = JOB.get();
+                    if (job == null) {
+                        return;
+                    }
+                    for (Permission shared : SHARED_STATE) {
+                        if (shared.implies(perm)) {
+                            job.denied = true;
+                            throw new SecurityException("Not allowed in the shared JVM: " + perm);
+                        }
+                    }
+                }
+
+                @Override
+                public void checkPermission(Permission perm, Object context) {
+                    checkPermission(perm);
+                }
+
+                @Override
+                public void checkAccess(Thread thread) {
+                    checkAccess(thread.getThreadGroup());
+                }
+
+                @Override
+                public void checkAccess(ThreadGroup group) {
+                    Job job = JOB.get();
+                    // A terminated thread has no group and nothing left to change
+                    if (job != null && group != null && !job.group.parentOf(group)) {
+                        job.denied = true;
+                        throw new SecurityException("Not allowed in the shared JVM: changing another run's threads");
+                    }
+                }
+
+                @Override
+                public void checkExit(int status) {
+                    Job job = JOB.get();
+                    if (job != null) {
+                        job.exitStatus = status;
+                        throw new ExitException(status);
+                    }
+                }
+            });
+            return true;
+        } catch (UnsupportedOperationException | SecurityException e) {
+            return false;  // JDK 18+ without -Djava.security.manager=allow, or 24+ where it is gone
+        }
+    }
+
+    static class ExitException extends SecurityException {
+        final int status;
+
+        ExitException(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    static class OutputLimitError extends Error {
+    }
+
+    /**
+     * Keeps only the head and tail of a stream in memory; once it outgrows them, all of it is
+     * also written to a gzip spill file that Python pages through lazily.
+     */
+    static class CaptureOutputStream extends OutputStream {
+        final long limit;
+        final byte[] head;
+        final byte[] tail;
+        File spillDir;
+        int headSize = 0;
+        int tailEnd = 0;
+        int tailSize = 0;
+        long count = 0;
+        File spillFile;
+        OutputStream spill;
+
+        CaptureOutputStream(long limit, int headBytes, int tailBytes, File spillDir) {
+            this.limit = limit;
+            this.head = new byte[headBytes];
+            this.tail = new byte[tailBytes];
+            this.spillDir = spillDir;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            write(new byte[]{(byte) b}, 0, 1);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            if (count + len > limit) {
+                accept(b, off, (int) Math.max(0, limit - count));
+                throw new OutputLimitError();
+            }
+            accept(b, off, len);
+        }
+
+        synchronized void writeQuietly(String text) {
+            byte[] bytes = text.getBytes(StandardCharsets.UTF_8);
+            accept(bytes, 0, (int) Math.max(0, Math.min(bytes.length, limit - count)));
+        }
+
+        private void accept(byte[] b, int off, int len) {
+            if (len <= 0) {
+                return;
+            }
+            // Nothing has been dropped yet while the stream still fits in head + tail
+            if (spill == null && spillDir != null && count + len > head.length + tail.length) {
+                startSpill();
+            }
+            if (spill != null) {
+                try {
+                    spill.write(b, off, len);
+                } catch (IOException e) {
+                    abandonSpill();
+                }
+            }
+            count += len;
+            int toHead = Math.min(len, head.length - headSize);
+            System.arraycopy(b, off, head, headSize, toHead);
+            headSize += toHead;
+            off += toHead;
+            len -= toHead;
+            if (len == 0 || tail.length == 0) {
+                return;
+            }
+            if (len >= tail.length) {
+                System.arraycopy(b, off + len - tail.length, tail, 0, tail.length);
+                tailEnd = 0;
+                tailSize = tail.length;
+                return;
+            }
+            int first = Math.min(len, tail.length - tailEnd);
+            System.arraycopy(b, off, tail, tailEnd, first);
+            System.arraycopy(b, off + first, tail, 0, len - first);
+            tailEnd = (tailEnd + len) % tail.length;
+            tailSize = Math.min(tail.length, tailSize + len);
+        }
+
+        synchronized byte[] headBytes() {
+            return Arrays.copyOf(head, headSize);
+        }
+
+        synchronized byte[] tailBytes() {
+            byte[] bytes = new byte[tailSize];
+            if (tailSize == 0) {
+                return bytes;
+            }
+            int start = Math.floorMod(tailEnd - tailSize, tail.length);
+            int first = Math.min(tailSize, tail.length - start);
+            System.arraycopy(tail, start, bytes, 0, first);
+            System.arraycopy(tail, 0, bytes, first, tailSize - first);
+            return bytes;
+        }
+
+        private void startSpill() {
+            try {
+                spillDir.mkdirs();
+                spillFile = File.createTempFile("tmp", ".gz", spillDir);
+                spill = new GZIPOutputStream(new FileOutputStream(spillFile), 65536) {
+                    {
+                        def.setLevel(Deflater.BEST_SPEED);
+                    }
+                };
+                spill.write(head, 0, headSize);
+                spill.write(tailBytes());
+            } catch (IOException e) {
+                abandonSpill();
+            }
+        }
+
+        private void abandonSpill() {
+            try {
+                if (spill != null) {
+                    spill.close();
+                }
+            } catch (IOException e) {
+                // Deleted below either way
+            }
+            if (spillFile != null) {
+                spillFile.delete();
+            }
+            spill = null;
+            spillFile = null;
+            spillDir = null;
+        }
+
+        /** Closes the spill file and returns its path, or "" when everything fit in memory. */
+        synchronized String finish() {
+            if (spill != null) {
+                try {
+                    spill.close();
+                } catch (IOException e) {
+                    abandonSpill();
+                }
+                spill = null;
+            }
+            return spillFile == null ? "" : spillFile.getPath();
+        }
+    }
+
+    static class DispatchOutputStream extends OutputStream {
+        final ThreadLocal<PrintStream> target;
+        final PrintStream fallback;
+
+        DispatchOutputStream(ThreadLocal<PrintStream> target, PrintStream fallback) {
+            this.target = target;
+            this.fallback = fallback;
+        }
+
+        PrintStream stream() {
+            PrintStream stream = target.get();
+            return stream != null ? stream : fallback;
+        }
+
+        @Override
+        public void write(int b) {
+            stream().write(b);
+        }
+
+        @Override
+        public void write(byte[] b, int off, int len) {
+            stream().write(b, off, len);
+        }
+
+        @Override
+        public void flush() {
+            stream().flush();
+        }
+    }
+
+    static class DispatchInputStream extends InputStream {
+        InputStream stream() {
+            InputStream stream = IN.get();
+            return stream != null ? stream : InputStream.nullInputStream();
+        }
+
+        @Override
+        public int read() throws IOException {
+            return stream().read();
+        }
+
+        @Override
+        public int read(byte[] b, int off, int len) throws IOException {
+            return stream().read(b, off, len);
+        }
+
+        @Override
+        public int available() throws IOException {
+            return stream().available();
+        }
+    }
+
+    static class MemoryClassLoader extends ClassLoader {
+        final Map<String, byte[]> classes;
+
+        MemoryClassLoader(Map<String, byte[]> classes) {
+            super(ClassLoader.getPlatformClassLoader());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) {
+                throw new ClassNotFoundException(name);
+            }
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    static String sha256(String text) {
+        try {
+            byte[] digest = MessageDigest.getInstance("SHA-256").digest(text.getBytes(StandardCharsets.UTF_8));
+            StringBuilder hex = new StringBuilder();
+            for (byte b : digest) {
+                hex.append(String.format("%02x", b));
+            }
+            return hex.toString();
+        } catch (NoSuchAlgorithmException e) {
+            throw new IllegalStateException(e);
+        }
+    }
+
+    static byte[] readBytes(DataInputStream in) throws IOException {
+        byte[] bytes = new byte[in.readInt()];
+        in.readFully(bytes);
+        return bytes;
+    }
+
+    static String readString(DataInputStream in) throws IOException {
+        return new String(readBytes(in), StandardCharsets.UTF_8);
+    }
+
+    static void writeBytes(DataOutputStream out, byte[] bytes) throws IOException {
+        out.writeInt(bytes.length);
+        out.write(bytes);
+    }
+
+    static void writeString(DataOutputStream out, String text) throws IOException {
+        writeBytes(out, text.getBytes(StandardCharsets.UTF_8));
+    }
+
+    static void writeCapture(DataOutputStream out, CaptureOutputStream capture) throws IOException {
+        String spillPath = capture.finish();
+        writeBytes(out, capture.headBytes());
+        writeBytes(out, capture.tailBytes());
+        out.writeLong(capture.count);
+        writeString(out, spillPath);
+    }
+}
@@ -0,0 +1,172 @@
+import time
+import threading
+import contextlib
+from collections import OrderedDict, deque
+from config import *
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+class TokenBucket:
+    """
+    rate tokens per second, at most burst saved up; every admitted request spends one.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_in(self):
+        # Seconds until the next token
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def full(self):
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class _Ticket:
+    def __init__(self, user):
+        self.user = user
+        self.admitted = False
+
+
+class AdmissionController:
+    """
+    Per-user token buckets and a concurrency limit for each action (execute, format, llm).
+    Requests that can't start yet wait in a round-robin queue across users, so one busy user only
+    delays their own requests; waiting longer than the action's timeout raises AdmissionRejected.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(ADMISSION_LIMITS if limits is None else limits)
+        self._buckets = {}
+        self._queues = {action: OrderedDict() for action in self.limits}  # {user: deque of tickets}
+        self._running = {action: 0 for action in self.limits}
+        self._cond = threading.Condition()
+
+    def _bucket(self, user, action):
+        bucket = self._buckets.get((user, action))
+        if bucket is None:
+            if len(self._buckets) >= ADMISSION_MAX_BUCKETS:
+                # Full buckets belong to idle users and are the same as new ones
+                for key in [key for key, old in self._buckets.items() if old.full()]:
+                    del self._buckets[key]
+            limits = self.limits[action]
+            bucket = self._buckets[(user, action)] = TokenBucket(limits["rate"], limits["burst"])
+        return bucket
+
+    def _dispatch(self, action):
+        # Hand free slots to the users at the front of the rotation that still have tokens
+        queues = self._queues[action]
+        for user in list(queues):
+            if self._running[action] >= self.limits[action]["slots"]:
+                break
+            if not self._bucket(user, action).take():
+                continue
+            ticket = queues[user].popleft()
+            ticket.admitted = True
+            self._running[action] += 1
+            # Served users go to the back, so the next free slot goes to someone else
+            if queues[user]:
+                queues.move_to_end(user)
+            else:
+                del queues[user]
+        self._cond.notify_all()
+
+    def _position(self, action, ticket):
+        # Place in the round-robin order: every user ahead serves one request per round
+        queues = self._queues[action]
+        index = queues[ticket.user].index(ticket)
+        position, after = 1, False
+        for user, tickets in queues.items():
+            if user == ticket.user:
+                after = True
+                position += index
+                continue
+            position += min(len(tickets), index if after else index + 1)
+        return position
+
+    def _leave(self, ticket, action):
+        with self._cond:
+            if ticket.admitted:
+                self._running[action] -= 1
+            else:
+                queue = self._queues[action].get(ticket.user)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[action][ticket.user]
+            self._dispatch(action)
+
+    @contextlib.contextmanager
+    def admit(self, user, action, on_wait=None, timeout=None):
+        """
+        Hold one of the action's slots for the duration of the with block.
+        on_wait(position, retry_in) is called about every ADMISSION_POLL_INTERVAL seconds while queued;
+        retry_in is how long until this user's own rate limit allows another request.
+        """
+        limits = self.limits[action]
+        timeout = limits["timeout"] if timeout is None else timeout
+        ticket = _Ticket(user)
+        with self._cond:
+            if sum(len(queue) for queue in self._queues[action].values()) >= limits["queue"]:
+                raise AdmissionRejected(f"Too many {action} requests are waiting. Try again in a moment.")
+            self._queues[action].setdefault(user, deque()).append(ticket)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                with self._cond:
+                    self._dispatch(action)
+                    if ticket.admitted:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionRejected(f"The server is busy: your {action} request waited {timeout:.0f}s. "
+                                                "Try again in a moment.")
+                    position = self._position(action, ticket)
+                    retry_in = self._bucket(user, action).retry_in()
+                if on_wait is not None:
+                    on_wait(position, retry_in)  # Outside the lock: it may render UI or raise
+                with self._cond:
+                    if not ticket.admitted:
+                        self._cond.wait(min(ADMISSION_POLL_INTERVAL, max(remaining, 0.01)))
+            yield
+        finally:
+            self._leave(ticket, action)
+
+    def stats(self):
+        with self._cond:
+            return {action: {"running": self._running[action],
+                             "queued": sum(len(queue) for queue in self._queues[action].values())}
+                    for action in self.limits}
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission():
+    # One controller per server process, shared by every Streamlit session
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController()
+    return _admission
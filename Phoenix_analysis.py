@@ -0,0 +1,260 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from config import *
+
+LOOPS = (ast.For, ast.AsyncFor, ast.While)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+LIST_BUILDERS = {"list", "sorted"}
+LIST_METHODS = {"split", "splitlines", "readlines"}  # str/file methods that return a list
+LINEAR_LIST_METHODS = {"index", "count", "remove"}  # O(n) on every call
+
+
+def _order(depth):
+    return "O(1)" if depth <= 0 else "O(n)" if depth == 1 else f"O(n^{depth})"
+
+
+def _is_constant_iter(node):
+    # range(4), a literal tuple or list: the loop runs a fixed number of times
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(isinstance(element, ast.Constant) for element in node.elts)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range":
+        return all(isinstance(arg, ast.Constant) for arg in node.args)
+    return False
+
+
+def _is_constant_loop(node):
+    if isinstance(node, (ast.For, ast.AsyncFor)):
+        return _is_constant_iter(node.iter)
+    return False
+
+
+def _loop_levels(node):
+    # How many levels of non-constant iteration a loop or comprehension adds
+    if isinstance(node, COMPREHENSIONS):
+        return sum(1 for generator in node.generators if not _is_constant_iter(generator.iter))
+    return 0 if _is_constant_loop(node) else 1
+
+
+def _loop_parts(node):
+    # (parts evaluated once, before the loop starts; parts evaluated on every iteration)
+    if isinstance(node, (ast.For, ast.AsyncFor)):
+        return [node.iter], [node.target, *node.body, *node.orelse]
+    if isinstance(node, ast.While):
+        return [], [node.test, *node.body, *node.orelse]
+    first, *rest = node.generators
+    elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+    return [first.iter], [first.target, *first.ifs, *rest, *elements]
+
+
+def _call_name(node):
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _value_kind(node):
+    # Rough type of an assigned value: "list", "str", "other"
+    if isinstance(node, (ast.List, ast.ListComp)):
+        return "list"
+    if isinstance(node, ast.JoinedStr) or isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return "str"
+    if isinstance(node, ast.Call):
+        name = _call_name(node)
+        if (isinstance(node.func, ast.Name) and name in LIST_BUILDERS
+                or isinstance(node.func, ast.Attribute) and name in LIST_METHODS):
+            return "list"
+        if isinstance(node.func, ast.Name) and name in ("str", "input"):
+            return "str"
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult) and isinstance(node.left, ast.List):
+        return "list"  # [0] * n
+    return "other"
+
+
+def _name_kinds(tree):
+    # Names that are only ever assigned lists (or only strings); anything reassigned to another kind is dropped
+    kinds = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            kind = _value_kind(node.value)
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    kinds.setdefault(target.id, set()).add(kind)
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            annotation = node.annotation.value if isinstance(node.annotation, ast.Subscript) else node.annotation
+            name = annotation.id if isinstance(annotation, ast.Name) else None
+            kind = "list" if name in ("list", "List") else "str" if name == "str" else "other"
+            kinds.setdefault(node.target.id, set()).add(kind)
+    lists = {name for name, seen in kinds.items() if seen == {"list"}}
+    strings = {name for name, seen in kinds.items() if seen == {"str"}}
+    return lists, strings
+
+
+class ComplexityAnalyzer(ast.NodeVisitor):
+    """
+    Walks the AST like CodeOptimizer, but only reports: loop-nesting depth and the usual quadratic
+    patterns (list membership, string building, pop(0), iterrows...) with the complexity each implies.
+    """
+
+    def __init__(self, lists, strings):
+        self.lists = lists
+        self.strings = strings
+        self.depth = 0
+        self.max_depth = 0
+        self.worst = 0
+        self.findings = []
+
+    def report(self, node, pattern, message, depth):
+        self.worst = max(self.worst, depth)
+        self.findings.append({
+            "line": node.lineno,
+            "column": node.col_offset + 1,
+            "pattern": pattern,
+            "message": message,
+            "complexity": _order(depth),
+        })
+
+    def _nest_depth(self, node):
+        # Deepest chain of non-constant loops starting at node
+        if isinstance(node, LOOPS + COMPREHENSIONS):
+            outer, inner = _loop_parts(node)
+        else:
+            outer, inner = [], list(ast.iter_child_nodes(node))
+        depth = 0
+        for child in inner:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+                continue
+            depth = max(depth, self._nest_depth(child))
+        if isinstance(node, LOOPS + COMPREHENSIONS):
+            depth += _loop_levels(node)
+        # A loop in the iterable runs once before this one starts, not inside it
+        return max([depth] + [self._nest_depth(child) for child in outer])
+
+    def _visit_loop(self, node):
+        levels = _loop_levels(node)
+        if self.depth == 0 and levels:
+            nest = self._nest_depth(node)
+            if nest >= 2:
+                self.report(node, "nested loops", f"Loops nested {nest} deep.", nest)
+        if isinstance(node, COMPREHENSIONS):
+            self._visit_generators(node)
+            return
+        outer, inner = _loop_parts(node)
+        for child in outer:
+            self.visit(child)
+        self.depth += levels
+        self.max_depth = max(self.max_depth, self.depth)
+        for child in inner:
+            self.visit(child)
+        self.depth -= levels
+
+    def _visit_generators(self, node):
+        # Each generator's iterable runs once per iteration of the generators before it
+        depth = self.depth
+        for generator in node.generators:
+            self.visit(generator.iter)
+            if not _is_constant_iter(generator.iter):
+                self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+            self.visit(generator.target)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in ([node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]):
+            self.visit(element)
+        self.depth = depth
+
+    visit_For = visit_AsyncFor = visit_While = _visit_loop
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_loop
+
+    def _visit_function(self, node):
+        # A function body is analysed on its own; where it is called from is unknown
+        depth, self.depth = self.depth, 0
+        self.generic_visit(node)
+        self.depth = depth
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _visit_function
+
+    def visit_Compare(self, node):
+        if self.depth:
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, ast.Name) and right.id in self.lists:
+                    self.report(node, "list membership",
+                                f"`in {right.id}` scans the whole list on every iteration; use a set.", self.depth + 1)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if (self.depth and isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name)
+                and node.target.id in self.strings):
+            self.report(node, "string concatenation",
+                        f"`{node.target.id} +=` copies the whole string each time; collect parts and ''.join them.",
+                        self.depth + 1)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        value = node.value
+        if (self.depth and isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add)
+                and isinstance(value.left, ast.Name) and value.left.id in self.strings
+                and any(isinstance(target, ast.Name) and target.id == value.left.id for target in node.targets)):
+            self.report(node, "string concatenation",
+                        f"`{value.left.id} = {value.left.id} + ...` copies the whole string each time; "
+                        "collect parts and ''.join them.", self.depth + 1)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        name = _call_name(node)
+        if isinstance(node.func, ast.Attribute):
+            receiver = node.func.value
+            if name == "pop" and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0:
+                self.report(node, "pop(0)", "`pop(0)` shifts every element; use collections.deque.popleft().",
+                            self.depth + 1)
+            elif name == "insert" and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0:
+                self.report(node, "insert(0)", "`insert(0, ...)` shifts every element; use collections.deque.appendleft().",
+                            self.depth + 1)
+            elif name == "iterrows":
+                self.report(node, "iterrows", "`iterrows()` builds a Series per row; use vectorised operations or itertuples().",
+                            max(1, self.depth))
+            elif self.depth and name in LINEAR_LIST_METHODS and isinstance(receiver, ast.Name) and receiver.id in self.lists:
+                self.report(node, f"list.{name}", f"`{receiver.id}.{name}()` scans the list on every iteration.",
+                            self.depth + 1)
+            elif self.depth and name == "sort":
+                self.report(node, "sort in loop", "Sorting inside a loop; sort once outside it or keep a heap.",
+                            self.depth + 1)
+        elif self.depth and name == "sorted":
+            self.report(node, "sort in loop", "Sorting inside a loop; sort once outside it or keep a heap.", self.depth + 1)
+        self.generic_visit(node)
+
+
+_analysis_cache = OrderedDict()
+_analysis_lock = threading.Lock()
+
+
+def analyze_python_code(code):
+    """
+    Static complexity findings for Python source, cached by source hash so it can run on every edit.
+    Returns {"findings": [...], "max_depth": int, "complexity": "O(...)", "error": str or None}.
+    """
+    key = hashlib.sha256(code.encode()).hexdigest()
+    with _analysis_lock:
+        if key in _analysis_cache:
+            _analysis_cache.move_to_end(key)
+            return _analysis_cache[key]
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        analysis = {"findings": [], "max_depth": 0, "complexity": None, "error": f"Line {e.lineno}: {e.msg}"}
+    else:
+        analyzer = ComplexityAnalyzer(*_name_kinds(tree))
+        analyzer.visit(tree)
+        findings = sorted(analyzer.findings, key=lambda finding: (finding["line"], finding["column"]))
+        analysis = {"findings": findings, "max_depth": analyzer.max_depth,
+                    "complexity": _order(max(analyzer.max_depth, analyzer.worst)), "error": None}
+
+    with _analysis_lock:
+        _analysis_cache[key] = analysis
+        while len(_analysis_cache) > ANALYSIS_CACHE_ENTRIES:
+            _analysis_cache.popitem(last=False)
+    return analysis
@@ -0,0 +1,335 @@
+import os
+import time
+import uuid
+import pickle
+import hashlib
+import tempfile
+import socket
+import sqlite3
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+from Phoenix_sandbox import StdinFile
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    language TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result BLOB,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, submitted);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    languages TEXT NOT NULL,
+    capacity INTEGER NOT NULL,
+    running INTEGER NOT NULL,
+    started REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+def _local_input(data):
+    # An uploaded input file sent with a job, saved on this host; named after its content so a repeated
+    # input maps to the same file, and so the same result-cache key
+    path = os.path.join(BROKER_INPUT_DIR, hashlib.sha256(data).hexdigest())
+    if not os.path.exists(path):
+        os.makedirs(BROKER_INPUT_DIR, exist_ok=True)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+    elif os.stat(path).st_mtime < time.time() - INPUT_FILE_MAX_AGE / 2:
+        os.utime(path)  # Still in use: keep prune_input_files away from it
+    return StdinFile(path)
+
+
+class Broker:
+    """
+    Job queue in a SQLite file shared by Phoenix frontends and execution workers.
+    Frontends submit() and wait; workers claim(), run and complete() jobs, heartbeating as they go.
+    A job whose worker stops heartbeating is queued again, up to BROKER_MAX_ATTEMPTS times.
+    Files travel by content, since workers and frontends needn't share a disk: an uploaded input
+    goes out with its job, and a spilled stdout comes back with its result.
+    """
+
+    def __init__(self, path=BROKER_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _db(self):
+        # A connection per call keeps the broker safe to use from any thread
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")  # Take the write lock up front so two workers can't claim one job
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    # Frontend side
+
+    def submit(self, language, code, custom_input=None, **options):
+        job_id = uuid.uuid4().hex
+        stdin_file = None
+        if isinstance(custom_input, StdinFile):
+            with custom_input.open() as f:
+                stdin_file, custom_input = f.read(), None
+        payload = pickle.dumps({"code": code, "custom_input": custom_input, "stdin_file": stdin_file, "options": options})
+        with self._db() as db:
+            db.execute("INSERT INTO jobs (id, language, payload, status, submitted) VALUES (?, ?, ?, 'queued', ?)",
+                       (job_id, language, payload, time.time()))
+        return job_id
+
+    def status(self, job_id):
+        with self._db() as db:
+            row = db.execute("SELECT status, worker, attempts, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": job_id, "status": row[0], "worker": row[1], "attempts": row[2], "error": row[3]}
+
+    def wait(self, job_id, timeout=BROKER_RESULT_TIMEOUT):
+        """
+        Poll until the job finishes; returns (output, metrics), or None if no worker finished it in time.
+        """
+        deadline = time.monotonic() + timeout
+        last_sweep = 0
+        while time.monotonic() < deadline:
+            with self._db() as db:
+                row = db.execute("SELECT status, result, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status, result, error = row
+            if status in ("done", "failed"):
+                with self._db() as db:
+                    db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                if status == "done":
+                    return self._received(*pickle.loads(result))
+                return f"Unexpected error: {error}", {"status": "internal_error"}
+            # Frontends sweep too, so dead workers are noticed even when every worker is gone
+            if time.monotonic() - last_sweep > BROKER_HEARTBEAT_INTERVAL:
+                self.requeue_stale()
+                self.drop_abandoned()
+                last_sweep = time.monotonic()
+            time.sleep(BROKER_POLL_INTERVAL)
+        # The frontend runs it itself now. Whatever state the job is in, nobody will read its result:
+        # a queued job never runs, and the worker running it finds no row left to post to
+        with self._db() as db:
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return None
+
+    def _received(self, output, metrics):
+        # A spilled stdout arrives as the gzip file's bytes; it becomes a spill file on this host
+        data = metrics.pop("stdout_spill_data", None)
+        if data is not None:
+            try:
+                os.makedirs(CAPTURE_SPILL_DIR, exist_ok=True)
+                fd, metrics["stdout_spill"] = tempfile.mkstemp(suffix=".gz", dir=CAPTURE_SPILL_DIR)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+            except OSError:
+                metrics["stdout_spill"] = None  # Only the head and tail in the output are left
+        return output, metrics
+
+    def run(self, language, code, custom_input=None, timeout=BROKER_RESULT_TIMEOUT, **options):
+        return self.wait(self.submit(language, code, custom_input, **options), timeout)
+
+    # Worker side
+
+    def claim(self, worker_id, languages):
+        # Oldest queued job in one of the worker's languages, or None
+        marks = ",".join("?" * len(languages))
+        with self._transaction() as db:
+            row = db.execute(f"SELECT id, language, payload FROM jobs WHERE status = 'queued' AND language IN ({marks}) "
+                             "ORDER BY submitted LIMIT 1", list(languages)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, started = ?, attempts = attempts + 1 WHERE id = ?",
+                       (worker_id, time.time(), row[0]))
+        job = pickle.loads(row[2])
+        job.update(id=row[0], language=row[1])
+        if job.get("stdin_file") is not None:
+            job["custom_input"] = _local_input(job.pop("stdin_file"))
+        return job
+
+    def complete(self, job_id, worker_id, result):
+        # Only the worker that holds the job may post it; a requeued job belongs to someone else now,
+        # and a job whose frontend gave up is gone, so its result is dropped
+        output, metrics = result
+        if metrics.get("stdout_spill"):
+            # The spill file is local to this worker; its content goes back with the result
+            try:
+                with open(metrics["stdout_spill"], "rb") as f:
+                    metrics = dict(metrics, stdout_spill=None, stdout_spill_data=f.read())
+            except OSError:
+                metrics = dict(metrics, stdout_spill=None)
+            result = output, metrics
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = 'done', result = ?, finished = ? WHERE id = ? AND worker = ?",
+                       (pickle.dumps(result), time.time(), job_id, worker_id))
+
+    def fail(self, job_id, worker_id, error):
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ? AND worker = ?",
+                       (error, time.time(), job_id, worker_id))
+
+    def heartbeat(self, worker_id, languages, capacity, running):
+        with self._db() as db:
+            db.execute("INSERT INTO workers (id, host, pid, languages, capacity, running, started, heartbeat) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                       "capacity = excluded.capacity, running = excluded.running, heartbeat = excluded.heartbeat",
+                       (worker_id, socket.gethostname(), os.getpid(), ",".join(languages), capacity, running,
+                        time.time(), time.time()))
+
+    def unregister(self, worker_id):
+        # Clean shutdown: hand unfinished jobs straight back to the queue
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND worker = ?",
+                       (worker_id,))
+            db.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def requeue_stale(self, timeout=BROKER_HEARTBEAT_TIMEOUT, max_attempts=BROKER_MAX_ATTEMPTS):
+        cutoff = time.time() - timeout
+        with self._transaction() as db:
+            stale = "SELECT id FROM workers WHERE heartbeat < ?"
+            db.execute(f"UPDATE jobs SET status = 'failed', error = 'The execution worker died {max_attempts} times.', "
+                       f"finished = ? WHERE status = 'running' AND attempts >= ? AND worker IN ({stale})",
+                       (time.time(), max_attempts, cutoff))
+            db.execute(f"UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND worker IN ({stale})",
+                       (cutoff,))
+            db.execute("DELETE FROM workers WHERE heartbeat < ?", (cutoff,))
+
+    def drop_abandoned(self, timeout=BROKER_RESULT_TIMEOUT):
+        # Jobs whose frontend stopped waiting (or died before it could clean up): results nobody
+        # collected, and queued jobs that would only run for a user who has moved on
+        cutoff = time.time() - timeout
+        with self._db() as db:
+            db.execute("DELETE FROM jobs WHERE (status IN ('done', 'failed') AND finished < ?) "
+                       "OR (status = 'queued' AND submitted < ?)", (cutoff, cutoff))
+
+    # Reporting
+
+    def nodes(self, timeout=BROKER_HEARTBEAT_TIMEOUT):
+        # Live workers with their capacity and current load
+        with self._db() as db:
+            rows = db.execute("SELECT id, host, pid, languages, capacity, running, heartbeat FROM workers "
+                              "WHERE heartbeat >= ? ORDER BY host, id", (time.time() - timeout,)).fetchall()
+        return [{"id": row[0], "host": row[1], "pid": row[2], "languages": row[3].split(","), "capacity": row[4],
+                 "running": row[5], "heartbeat_age_s": time.time() - row[6]} for row in rows]
+
+    def capacity(self, language=None):
+        nodes = [node for node in self.nodes() if language is None or language in node["languages"]]
+        with self._db() as db:
+            queued = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {"workers": len(nodes), "slots": sum(node["capacity"] for node in nodes),
+                "busy": sum(node["running"] for node in nodes), "queued": queued}
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker()
+    return _broker
+
+
+def worker_main(path=BROKER_DB, capacity=BROKER_WORKER_CAPACITY, languages=("Python", "SQL", "C++", "Java")):
+    """
+    Pull jobs from the broker and run them locally until interrupted.
+    """
+    from Phoenix_utils import run_code, prune_input_files  # Imported here: Phoenix_utils itself submits to the broker
+    from Phoenix_warmup import Warmup
+
+    # Workers only execute code, so they warm the pool and compilers but load no LLM models
+    if WARMUP_ENABLED:
+        Warmup(models=[]).start()
+    broker = Broker(path)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    executor = ThreadPoolExecutor(max_workers=capacity, thread_name_prefix="phoenix-broker")
+    stopping = threading.Event()
+    running = [0]
+    lock = threading.Lock()
+
+    def beat():
+        while not stopping.is_set():
+            with lock:
+                active = running[0]
+            try:
+                broker.heartbeat(worker_id, languages, capacity, active)
+                broker.requeue_stale()
+                broker.drop_abandoned()
+            except sqlite3.OperationalError:
+                pass  # Database locked past the timeout; the next beat comes well before the worker counts as dead
+            prune_input_files()  # Including the input files jobs brought along
+            stopping.wait(BROKER_HEARTBEAT_INTERVAL)
+
+    def execute(job):
+        try:
+            result = run_code(job["language"], job["code"], job["custom_input"], local=True, **job["options"])
+            broker.complete(job["id"], worker_id, result)
+        except Exception as e:
+            broker.fail(job["id"], worker_id, str(e) or type(e).__name__)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    broker.heartbeat(worker_id, languages, capacity, 0)
+    threading.Thread(target=beat, daemon=True).start()
+    print(f"Phoenix worker {worker_id}: {capacity} slots for {', '.join(languages)} on {path}", flush=True)
+    try:
+        while True:
+            with lock:
+                full = running[0] >= capacity
+            try:
+                job = None if full else broker.claim(worker_id, languages)
+            except sqlite3.OperationalError:
+                job = None  # "database is locked": other processes held the write lock past the timeout; try again
+            if job is None:
+                time.sleep(BROKER_POLL_INTERVAL)
+                continue
+            with lock:
+                running[0] += 1
+            executor.submit(execute, job)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopping.set()
+        broker.unregister(worker_id)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Phoenix execution worker")
+    parser.add_argument("--db", default=BROKER_DB, help="broker SQLite file (shared with the frontends)")
+    parser.add_argument("--capacity", type=int, default=BROKER_WORKER_CAPACITY, help="jobs run at once")
+    parser.add_argument("--languages", default="Python,SQL,C++,Java", help="comma-separated languages to accept")
+    args = parser.parse_args()
+    worker_main(args.db, args.capacity, [language for language in args.languages.split(",") if language])
@@ -0,0 +1,280 @@
+import os
+import re
+import ast
+import sys
+import shutil
+import hashlib
+import threading
+import contextlib
+from collections import OrderedDict
+from config import *
+from Phoenix_sandbox import StdinFile
+
+
+# Only outcomes that depend on nothing but (code, input) are worth remembering;
+# timeouts and CPU-limit kills depend on how busy the host was, internal_error on the sandbox itself
+CACHEABLE_STATUSES = {"ok", "runtime_error", "compile_error", "output_limit"}
+
+# Python modules whose use makes a run depend on randomness, the clock, the filesystem or the network
+NONDETERMINISTIC_MODULES = {
+    "random", "secrets", "uuid", "time", "datetime", "calendar", "os", "pathlib", "shutil",
+    "glob", "tempfile", "socket", "urllib", "http", "requests", "subprocess",
+    "threading", "multiprocessing", "asyncio", "numpy.random",
+}
+NONDETERMINISTIC_CALLS = {"open", "id"}  # hash() is stable: workers run with a fixed PYTHONHASHSEED
+NONDETERMINISTIC_ATTRIBUTES = {"random", "now", "today", "utcnow", "time", "perf_counter", "read_csv"}
+
+CPP_NONDETERMINISTIC_HEADERS = {"random", "chrono", "ctime", "time.h", "fstream", "filesystem", "thread", "future"}
+CPP_NONDETERMINISTIC_API = re.compile(
+    r"\b(rand|srand|random_device|mt19937(_64)?|default_random_engine|time|clock|chrono|"
+    r"fopen|freopen|ifstream|ofstream|fstream|filesystem|system|getenv|thread|async)\b"
+)
+
+JAVA_NONDETERMINISTIC_API = re.compile(
+    r"\b(java\.util\.Random|Random|SecureRandom|ThreadLocalRandom|Math\.random|UUID|"
+    r"java\.time|LocalDate|LocalDateTime|Instant|System\.currentTimeMillis|System\.nanoTime|"
+    r"java\.io\.File\w*|File\w*(Reader|Writer|InputStream|OutputStream)|new\s+File|java\.nio\.file|Files|Paths|"
+    r"Thread|Executor\w*|System\.getenv|identityHashCode)\b"
+)
+
+SQL_NONDETERMINISTIC_API = re.compile(
+    r"\b(random|randomblob|current_timestamp|current_date|current_time)\b|'now'",
+    re.IGNORECASE,
+)
+
+
+def _python_is_deterministic(code):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True  # The syntax error itself is deterministic
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module or ""] + [f"{node.module}.{alias.name}" for alias in node.names]
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in NONDETERMINISTIC_CALLS or node.func.id == "__import__":
+                return False
+            continue
+        elif isinstance(node, ast.Attribute):
+            if node.attr in NONDETERMINISTIC_ATTRIBUTES:
+                return False
+            continue
+        else:
+            continue
+        for name in names:
+            if name in NONDETERMINISTIC_MODULES or name.split(".")[0] in NONDETERMINISTIC_MODULES:
+                return False
+    return True
+
+
+def _cpp_is_deterministic(code):
+    for header in re.findall(r"#\s*include\s*[<\"]([^>\"]+)[>\"]", code):
+        if header in CPP_NONDETERMINISTIC_HEADERS:
+            return False
+    # <bits/stdc++.h> pulls in everything, so the API scan is what really decides
+    return not CPP_NONDETERMINISTIC_API.search(code)
+
+
+def is_deterministic(language, code):
+    """
+    Cheap static scan for randomness, clock, filesystem and thread use.
+    """
+    if language == "Python":
+        return _python_is_deterministic(code)
+    if language == "C++":
+        return _cpp_is_deterministic(code)
+    if language == "Java":
+        return not JAVA_NONDETERMINISTIC_API.search(code)
+    if language == "SQL":
+        return not SQL_NONDETERMINISTIC_API.search(code)
+    return False
+
+
+def result_key(language, code, custom_input, **options):
+    digest = hashlib.sha256()
+    for part in (language, code, str(custom_input or ""), repr(sorted(options.items()))):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _size_of(value):
+    if hasattr(value, "memory_usage"):  # pandas DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, str):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate size in bytes.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+result_cache = ResultCache()
+
+
+def cached_run(language, code, custom_input, execute, **options):
+    """
+    Memoize execute() -> (output, metrics) for deterministic programs.
+    """
+    if not is_deterministic(language, code):
+        return execute()
+    if isinstance(custom_input, StdinFile):
+        try:
+            custom_input.refresh()  # The key must describe the file as this run will read it
+        except OSError:
+            return execute()  # Gone since it was chosen; the runner reports that
+    key = result_key(language, code, custom_input, **options)
+    hit = result_cache.get(key)
+    if hit is not None:
+        output, metrics = hit
+        if hasattr(output, "copy"):  # Don't hand the cached DataFrame itself to a session
+            output = output.copy()
+        return output, dict(metrics, cached=True)
+    output, metrics = execute()
+    if metrics.get("status") in CACHEABLE_STATUSES:
+        result_cache.put(key, (output, metrics), _size_of(output) + len(metrics.get("raw_stdout") or ""))
+    return output, metrics
+
+
+class CompileCache:
+    """
+    Content-addressed store of build artifacts on disk, evicted least-recently-used by total size.
+    Entries are published with an atomic rename, so concurrent sessions never see a partial binary.
+    """
+
+    PINNED_DIRS = {"pch"}  # Precompiled headers: one per flag set, rebuilt only when they go missing
+
+    def __init__(self, directory=COMPILE_CACHE_DIR, max_bytes=COMPILE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}  # {key: [lock, sessions holding or waiting for it]}
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key, suffix=""):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    @contextlib.contextmanager
+    def key_lock(self, key):
+        # Two sessions compiling the same source wait for one build instead of racing.
+        # A key's lock is dropped once nobody holds or waits for it, so only keys being built take memory
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def get(self, key, suffix=""):
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)  # Refresh the LRU position
+        except OSError:
+            return None
+        return path
+
+    def store(self, key, built_path, suffix=""):
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copy2(built_path, staging)
+        os.replace(staging, path)
+        os.utime(path)
+        self.evict()
+        return path
+
+    def checkout(self, key, destination, suffix=""):
+        # Hard-link (or copy) the cached file out so eviction can't pull it from under a running program
+        path = self.get(key, suffix)
+        if path is None:
+            return None
+        try:
+            os.link(path, destination)
+        except OSError:
+            try:
+                shutil.copy2(path, destination)
+            except OSError:
+                return None
+        return destination
+
+    def evict(self):
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            if root == self.directory:
+                dirs[:] = [name for name in dirs if name not in self.PINNED_DIRS]
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+_compile_cache = None
+_compile_cache_lock = threading.Lock()
+
+
+def get_compile_cache():
+    global _compile_cache
+    with _compile_cache_lock:
+        if _compile_cache is None:
+            _compile_cache = CompileCache()
+    return _compile_cache
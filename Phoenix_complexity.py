@@ -0,0 +1,82 @@
+import math
+
+COMPLEXITY_CLASSES = {
+    "O(1)": lambda n: 1.0,
+    "O(log n)": lambda n: math.log2(n),
+    "O(n)": lambda n: float(n),
+    "O(n log n)": lambda n: n * math.log2(n),
+    "O(n^2)": lambda n: float(n) ** 2,
+    "O(n^3)": lambda n: float(n) ** 3,
+    "O(2^n)": lambda n: 2.0 ** n if n < 1000 else math.inf,
+}
+
+
+def _least_squares(xs, ys):
+    # y = a + b * x, with b >= 0: a cost never shrinks as the input grows
+    count = len(xs)
+    mean_x, mean_y = sum(xs) / count, sum(ys) / count
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if spread == 0:
+        return mean_y, 0.0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+    if slope < 0:
+        return mean_y, 0.0
+    return mean_y - slope * mean_x, slope
+
+
+def _relative_error(ys, predicted):
+    # RMS of the relative residuals, so the largest sizes don't drown out the rest
+    return math.sqrt(sum(((y - p) / y) ** 2 for y, p in zip(ys, predicted)) / len(ys))
+
+
+def growth_exponent(sizes, values, intercept=0.0):
+    # Slope of log(value - fixed cost) against log(n): about 1 for linear, 2 for quadratic and so on
+    points = [(math.log(n), math.log(v - intercept)) for n, v in zip(sizes, values) if n > 0 and v > intercept]
+    if len(points) < 2:
+        return None
+    return _least_squares([x for x, _ in points], [y for _, y in points])[1]
+
+
+def fit_complexity(sizes, values, tolerance=1.25):
+    """
+    Fit value = a + b * f(n) for every class in COMPLEXITY_CLASSES and pick the simplest one whose relative
+    error is within tolerance of the best fit. Confidence (0..1) is how much worse the closest real alternative
+    fits, scaled down when there are only a few sizes.
+    """
+    points = [(n, v) for n, v in zip(sizes, values) if n and n > 1 and v is not None and v > 0]
+    if len(points) < 3:
+        return {"class": None, "confidence": 0.0, "errors": {}, "exponent": None}
+    ns, ys = [n for n, _ in points], [v for _, v in points]
+    mean = sum(ys) / len(ys)
+
+    fits = {}
+    for name, f in COMPLEXITY_CLASSES.items():
+        xs = [f(n) for n in ns]
+        if any(math.isinf(x) for x in xs):
+            continue
+        intercept, slope = _least_squares(xs, ys)
+        fits[name] = {
+            "error": _relative_error(ys, [intercept + slope * x for x in xs]),
+            "intercept": intercept,
+            # A fit whose growth term barely moves over the measured sizes is just O(1) in disguise
+            "flat": slope * (max(xs) - min(xs)) < 0.1 * mean,
+        }
+
+    # Classes are listed from the slowest-growing up, so the first one within tolerance is the simplest
+    best_error = min(fit["error"] for fit in fits.values())
+    chosen = next(name for name, fit in fits.items() if fit["error"] <= best_error * tolerance + 0.005)
+    if fits[chosen]["flat"]:
+        chosen = "O(1)"
+    alternatives = [fit["error"] for name, fit in fits.items() if name != chosen and not fit["flat"]]
+    if not alternatives:
+        separation = 1.0
+    else:
+        closest = min(alternatives)
+        separation = (closest - fits[chosen]["error"]) / closest if closest > 0 else 0.0
+    confidence = max(0.0, min(1.0, separation * min(1.0, (len(points) - 2) / 4)))
+    return {
+        "class": chosen,
+        "confidence": confidence,
+        "errors": {name: fit["error"] for name, fit in fits.items()},
+        "exponent": growth_exponent(ns, ys, min(fits[chosen]["intercept"], min(ys) * 0.99)),
+    }
@@ -0,0 +1,309 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+import posixpath
+import subprocess
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+from Phoenix_cache import get_compile_cache
+from Phoenix_sandbox import compile_slots
+from Phoenix_workspace import CPP_UNIT_EXTENSIONS, workspace_file
+
+EXE_SUFFIX = ".exe"
+OBJ_SUFFIX = ".o"
+PCH_NAME = "phoenix_pch.h"
+
+# Headers <bits/stdc++.h> already includes, so a PCH of it covers submissions that list them one by one
+STANDARD_HEADERS = {
+    "algorithm", "array", "bitset", "cassert", "cctype", "cfloat", "chrono", "climits", "cmath",
+    "complex", "cstdio", "cstdlib", "cstring", "ctime", "cstdint", "deque", "exception", "functional",
+    "iomanip", "ios", "iosfwd", "iostream", "istream", "iterator", "limits", "list", "map", "memory",
+    "numeric", "ostream", "queue", "random", "ratio", "set", "sstream", "stack", "stdexcept", "string",
+    "tuple", "type_traits", "unordered_map", "unordered_set", "utility", "valarray", "vector",
+    "bits/stdc++.h",
+}
+
+
+@lru_cache(maxsize=None)
+def compiler_identity(compiler=CPP_COMPILER):
+    # Path plus size/mtime of the compiler binary, so an upgraded g++ never reuses old builds
+    path = shutil.which(compiler) or compiler
+    try:
+        stat = os.stat(path)
+        return f"{os.path.realpath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return path
+
+
+def build_key(code, flags, compiler=CPP_COMPILER):
+    digest = hashlib.sha256()
+    for part in (compiler_identity(compiler), " ".join(flags), code):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _includes(code):
+    return set(re.findall(r'^\s*#\s*include\s*[<"]([^>"]+)[>"]', code, re.MULTILINE))
+
+
+def pch_covered_headers(headers=None):
+    headers = set(CPP_PCH_HEADERS if headers is None else headers)
+    if "bits/stdc++.h" in headers:
+        return headers | STANDARD_HEADERS
+    return headers
+
+
+def pch_matches(code, headers=None):
+    # Only use the PCH when every include of the submission is already in it
+    includes = _includes(code)
+    return bool(includes) and includes <= pch_covered_headers(headers)
+
+
+def ensure_pch(flags, compiler=CPP_COMPILER, headers=None):
+    """
+    Build (once per compiler + flags + header set) a precompiled header and return its directory.
+    """
+    headers = list(CPP_PCH_HEADERS if headers is None else headers)
+    key = build_key("\n".join(headers), flags, compiler)
+    root = os.path.join(get_compile_cache().directory, "pch")
+    pch_dir = os.path.join(root, key)
+    gch_path = os.path.join(pch_dir, PCH_NAME + ".gch")
+    if os.path.exists(gch_path):
+        return pch_dir
+
+    with get_compile_cache().key_lock("pch-" + key):
+        if os.path.exists(gch_path):
+            return pch_dir
+        # A directory without its .gch (deleted by hand, or by an older eviction) would block the rename below
+        shutil.rmtree(pch_dir, ignore_errors=True)
+        os.makedirs(root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=root, prefix=".build-")
+        header_path = os.path.join(staging, PCH_NAME)
+        with open(header_path, "w") as f:
+            f.writelines(f"#include <{header}>\n" for header in headers)
+        try:
+            with compile_slots:
+                result = subprocess.run(
+                    [compiler, *flags, "-x", "c++-header", header_path, "-o", header_path + ".gch"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    timeout=EXEC_COMPILE_TIMEOUT * 4,
+                )
+            ok = result.returncode == 0
+        except (subprocess.TimeoutExpired, OSError):
+            ok = False
+        if not ok:
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+        try:
+            os.rename(staging, pch_dir)  # Atomic publish; another process may have won the race
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+    return pch_dir if os.path.exists(gch_path) else None
+
+
+def build_binary(code, exe_file_path, flags=None, compiler=CPP_COMPILER, use_pch=CPP_PCH_ENABLED):
+    """
+    Compile code to exe_file_path without going through the compile cache.
+    Returns (returncode, stderr, seconds); returncode is None on timeout.
+    """
+    flags = list(CPP_COMPILE_FLAGS if flags is None else flags)
+    temp_dir = os.path.dirname(exe_file_path)
+    cpp_file_path = os.path.join(temp_dir, "temp_code.cpp")
+
+    # Write the C++ code to a temporary file
+    with open(cpp_file_path, "w") as f:
+        f.write(code)
+
+    pch_dir = ensure_pch(flags, compiler) if use_pch and pch_matches(code) else None
+    attempts = [["-include", PCH_NAME, "-I", pch_dir, "-Winvalid-pch"], []] if pch_dir else [[]]
+    with compile_slots:
+        started = time.perf_counter()  # Time spent waiting for a slot isn't compile time
+        for extra in attempts:
+            try:
+                compile_result = subprocess.run(
+                    [compiler, *flags, *extra, cpp_file_path, "-o", exe_file_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    timeout=EXEC_COMPILE_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                return None, "The compiler took too long.", time.perf_counter() - started
+            # The PCH pulls in every standard header, which can clash with user names;
+            # on failure the build is retried exactly as the user wrote it
+            if compile_result.returncode == 0:
+                break
+        return compile_result.returncode, compile_result.stderr, time.perf_counter() - started
+
+
+def compile_cpp(code, flags=None, compiler=CPP_COMPILER):
+    """
+    Compile a C++ source through the on-disk compile cache.
+    Returns a dict with the cache key, the compiler error (if any), compile time and whether it was a cache hit.
+    """
+    flags = list(CPP_COMPILE_FLAGS if flags is None else flags)
+    cache = get_compile_cache()
+    key = build_key(code, flags, compiler)
+    build = {"key": key, "error": None, "status": "ok", "compile_time": 0.0, "cached": True}
+
+    with cache.key_lock(key):
+        if cache.get(key, EXE_SUFFIX) is not None:
+            return build
+
+        build["cached"] = False
+        with tempfile.TemporaryDirectory() as temp_dir:
+            exe_file_path = os.path.join(temp_dir, "temp_code" + EXE_SUFFIX)
+            try:
+                returncode, stderr, elapsed = build_binary(code, exe_file_path, flags, compiler)
+            except OSError as e:
+                build.update(error=str(e), status="compile_error")
+                return build
+            build["compile_time"] = elapsed
+            if returncode is None:
+                build.update(error=stderr, status="compile_timeout")
+                return build
+
+            # Check for compilation errors
+            if returncode != 0:
+                build.update(error=stderr, status="compile_error")
+                return build
+            cache.store(key, exe_file_path, EXE_SUFFIX)
+    return build
+
+
+def checkout_binary(build, destination):
+    # Private copy of the cached binary for one run
+    return get_compile_cache().checkout(build["key"], destination, EXE_SUFFIX)
+
+
+def local_headers(path, files, found=None):
+    # Workspace headers a file includes, directly or through other headers. Units compile with -I .,
+    # so "..." looks next to the file and then at the workspace root, and <...> at the root before the system
+    found = set() if found is None else found
+    for quoted, angled in re.findall(r'^\s*#\s*include\s*(?:"([^"]+)"|<([^>]+)>)', files[path], re.MULTILINE):
+        if quoted:
+            candidates = (posixpath.normpath(posixpath.join(posixpath.dirname(path), quoted)), posixpath.normpath(quoted))
+        else:
+            candidates = (posixpath.normpath(angled),)
+        for candidate in candidates:
+            if candidate in files:
+                if candidate not in found:
+                    found.add(candidate)
+                    local_headers(candidate, files, found)
+                break
+    return found
+
+
+def unit_key(path, files, flags, compiler=CPP_COMPILER):
+    # A translation unit's object depends on its own text and every workspace header it pulls in
+    parts = [path, files[path]] + [f"{header}\n{files[header]}" for header in sorted(local_headers(path, files))]
+    return build_key("\0".join(parts), flags + ["-c"], compiler)
+
+
+def _compile_unit(path, key, temp_dir, flags, compiler):
+    # Compile one translation unit into the cache; returns (error, status, compiled)
+    cache = get_compile_cache()
+    with cache.key_lock(key):
+        if cache.get(key, OBJ_SUFFIX) is not None:
+            return None, "ok", False
+        obj_path = os.path.join(temp_dir, key + OBJ_SUFFIX)
+        with compile_slots:
+            try:
+                result = subprocess.run(
+                    [compiler, *flags, "-I", ".", "-c", path, "-o", obj_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    cwd=os.path.join(temp_dir, "src"),
+                    timeout=EXEC_COMPILE_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                return f"{path}: the compiler took too long.", "compile_timeout", True
+        if result.returncode != 0:
+            return result.stderr, "compile_error", True
+        cache.store(key, obj_path, OBJ_SUFFIX)
+    return None, "ok", True
+
+
+def compile_cpp_project(files, flags=None, compiler=CPP_COMPILER):
+    """
+    Compile a multi-file C++ workspace through the compile cache, one object per translation unit.
+    After an edit only the .cpp files whose text (or included headers) changed are recompiled before relinking.
+    Returns a dict like compile_cpp's plus "units" and "compiled_units".
+    """
+    flags = list(CPP_COMPILE_FLAGS if flags is None else flags)
+    cache = get_compile_cache()
+    units = sorted(path for path in files if path.lower().endswith(CPP_UNIT_EXTENSIONS))
+    build = {"key": None, "error": None, "status": "ok", "compile_time": 0.0, "cached": True,
+             "units": len(units), "compiled_units": 0}
+    if not units:
+        build.update(error="No .cpp files in the workspace.", status="compile_error")
+        return build
+
+    keys = {path: unit_key(path, files, flags, compiler) for path in units}
+    build["key"] = build_key("\n".join(keys[path] for path in units), flags + ["-link"], compiler)
+    if cache.get(build["key"], EXE_SUFFIX) is not None:
+        return build
+
+    build["cached"] = False
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Headers are found relative to the sources, so the whole tree is laid out on disk
+        for path, code in files.items():
+            full_path = workspace_file(os.path.join(temp_dir, "src"), path)
+            if full_path is None:
+                build.update(error=f"{path}: the path is outside the workspace.", status="compile_error",
+                             compile_time=time.perf_counter() - started)
+                return build
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as f:
+                f.write(code)
+        with ThreadPoolExecutor(max_workers=EXEC_MAX_COMPILES) as executor:
+            outcomes = list(executor.map(lambda path: _compile_unit(path, keys[path], temp_dir, flags, compiler), units))
+        build["compiled_units"] = sum(compiled for _, _, compiled in outcomes)
+        failed = [(error, status) for error, status, _ in outcomes if error]
+        if failed:
+            build.update(error="\n".join(error for error, _ in failed), status=failed[0][1],
+                         compile_time=time.perf_counter() - started)
+            return build
+
+        # Link private copies, so eviction can't pull an object out from under the linker
+        objects = []
+        for index, path in enumerate(units):
+            destination = os.path.join(temp_dir, f"unit{index}{OBJ_SUFFIX}")
+            obj_path = cache.checkout(keys[path], destination, OBJ_SUFFIX)
+            if obj_path is None:  # Evicted since it was compiled
+                _compile_unit(path, keys[path], temp_dir, flags, compiler)
+                obj_path = cache.checkout(keys[path], destination, OBJ_SUFFIX)
+            if obj_path is None:
+                build.update(error=f"{path}: the object file was evicted from the compile cache.",
+                             status="compile_error", compile_time=time.perf_counter() - started)
+                return build
+            objects.append(obj_path)
+        exe_file_path = os.path.join(temp_dir, "program" + EXE_SUFFIX)
+        with cache.key_lock(build["key"]), compile_slots:
+            try:
+                result = subprocess.run(
+                    [compiler, *flags, *objects, "-o", exe_file_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    timeout=EXEC_COMPILE_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                build.update(error="The linker took too long.", status="compile_timeout",
+                             compile_time=time.perf_counter() - started)
+                return build
+            build["compile_time"] = time.perf_counter() - started
+            if result.returncode != 0:
+                build.update(error=result.stderr, status="compile_error")
+                return build
+            cache.store(build["key"], exe_file_path, EXE_SUFFIX)
+    return build
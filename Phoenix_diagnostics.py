@@ -0,0 +1,220 @@
+import re
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import sqlparse
+from config import *
+
+OPENERS = {"(": ")", "[": "]", "{": "}"}
+CLOSERS = {")": "(", "]": "[", "}": "{"}
+SQL_NEAR = re.compile(r'(?:near|unrecognized token:) "(.*)"', re.DOTALL)
+SQL_SYNTAX = ("syntax error", "incomplete input", "unrecognized token")
+CPP_RAW_PREFIXES = ("R", "u8R", "uR", "UR", "LR")
+CPP_MACROS = re.compile(r"^\s*#\s*(?:define|if|ifdef|ifndef)\b", re.MULTILINE)
+
+
+def _diagnostic(code, offset, text, kind="error"):
+    # st_ace annotation: 0-based row and column of a character offset
+    offset = max(0, min(offset, len(code)))
+    row = code.count("\n", 0, offset)
+    return {"row": row, "column": offset - (code.rfind("\n", 0, offset) + 1), "text": text, "type": kind}
+
+
+def _python_diagnostics(code):
+    # The same compile() exec would do first, without running anything or touching stdout
+    try:
+        compile(code, "<editor>", "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return [{"row": max((e.lineno or 1) - 1, 0), "column": max((e.offset or 1) - 1, 0),
+                 "text": f"{type(e).__name__}: {e.msg}", "type": "error"}]
+    except ValueError as e:  # e.g. null bytes in the source
+        return [{"row": 0, "column": 0, "text": str(e), "type": "error"}]
+    return []
+
+
+def _sql_diagnostics(code):
+    """
+    Each statement is compiled by SQLite with EXPLAIN, which prepares it without running it.
+    Only syntax errors count: the tables the code refers to don't exist in an empty database.
+    """
+    diagnostics = []
+    connection = sqlite3.connect(":memory:")
+    try:
+        start = 0
+        for statement in sqlparse.split(code):
+            offset = code.find(statement, start)
+            offset = start if offset < 0 else offset
+            start = offset + len(statement)
+            clean = sqlparse.format(statement, strip_comments=True).strip()
+            if not clean:
+                continue
+            if not sqlite3.complete_statement(clean if clean.endswith(";") else clean + ";"):
+                diagnostics.append(_diagnostic(code, offset, "Incomplete statement: a quote or comment is never closed."))
+                continue
+            try:
+                connection.execute(clean if clean.lower().startswith("explain") else "EXPLAIN " + clean)
+            except sqlite3.Warning:
+                continue  # More than one statement left after splitting; SQLite will say so when it runs
+            except sqlite3.Error as e:
+                message = str(e)
+                if not any(marker in message for marker in SQL_SYNTAX):
+                    continue
+                near = SQL_NEAR.search(message)
+                token = re.search(rf"(?<!\w){re.escape(near.group(1))}(?!\w)", statement) if near and near.group(1) else None
+                if token is not None:
+                    position = token.start()
+                else:
+                    position = len(statement.rstrip()) if "incomplete input" in message else 0
+                diagnostics.append(_diagnostic(code, offset + position, message))
+    finally:
+        connection.close()
+    return diagnostics
+
+
+def _number_before(code, index):
+    # True when code[index] continues a numeric literal (a C++14 digit separator like 1'000'000)
+    start = index
+    while start > 0 and (code[start - 1].isalnum() or code[start - 1] in "_.'"):
+        start -= 1
+    return start < index and code[start].isdigit()
+
+
+def _word_before(code, index):
+    start = index
+    while start > 0 and (code[start - 1].isalnum() or code[start - 1] == "_"):
+        start -= 1
+    return code[start:index]
+
+
+def _skip_quoted(code, index, quote):
+    # Index just past a "..." or '...' literal starting at index, or None when the line ends first
+    index += 1
+    while index < len(code):
+        char = code[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == quote:
+            return index + 1
+        if char == "\n":
+            return None
+        index += 1
+    return None
+
+
+def _delimiter_diagnostics(code, language):
+    """
+    A lexer that only knows comments, literals and brackets: enough to find unbalanced (), [], {},
+    unterminated strings and comments in C++ or Java instantly. Stops at the first problem, like a compiler would.
+    """
+    # Macros and conditional blocks (#if, #ifdef, #ifndef; #elif and #else only follow one) can legitimately
+    # hide half of a bracket pair, and this lexer doesn't preprocess, so mismatches only warn when there are any
+    bracket_kind = "warning" if language == "C++" and CPP_MACROS.search(code) else "error"
+    stack = []
+    index, length = 0, len(code)
+    line_start = True
+    while index < length:
+        char = code[index]
+        if char == "\n":
+            line_start = True
+            index += 1
+            continue
+        if char in " \t\r\f\v":
+            index += 1
+            continue
+        if language == "C++" and line_start and char == "#":
+            # Preprocessor line, with backslash continuations
+            while index < length and code[index] != "\n":
+                index += 2 if code[index] == "\\" else 1
+            continue
+        line_start = False
+        if code.startswith("//", index):
+            end = code.find("\n", index)
+            index = length if end < 0 else end
+            continue
+        if code.startswith("/*", index):
+            end = code.find("*/", index + 2)
+            if end < 0:
+                return [_diagnostic(code, index, "Unterminated comment: '/*' is never closed.")]
+            index = end + 2
+            continue
+        if language == "Java" and code.startswith('"""', index):
+            end = index + 3
+            while True:
+                end = code.find('"""', end)
+                if end < 0:
+                    return [_diagnostic(code, index, 'Unterminated text block: \'"""\' is never closed.')]
+                if code[end - 1] != "\\":
+                    break
+                end += 1
+            index = end + 3
+            continue
+        if char == '"' and language == "C++" and _word_before(code, index) in CPP_RAW_PREFIXES:
+            opening = code.find("(", index)
+            delimiter = code[index + 1:opening] if opening >= 0 else ""
+            end = code.find(f"){delimiter}\"", opening) if opening >= 0 and len(delimiter) <= 16 else -1
+            if end < 0:
+                return [_diagnostic(code, index, "Unterminated raw string literal.")]
+            index = end + len(delimiter) + 2
+            continue
+        if char == '"' or (char == "'" and not (language == "C++" and _number_before(code, index))):
+            end = _skip_quoted(code, index, char)
+            if end is None:
+                kind = "string" if char == '"' else "character"
+                return [_diagnostic(code, index, f"Unterminated {kind} literal.")]
+            index = end
+            continue
+        if char in OPENERS:
+            stack.append((char, index))
+        elif char in CLOSERS:
+            if not stack:
+                return [_diagnostic(code, index, f"Unexpected '{char}': nothing to close.", bracket_kind)]
+            opener, opened = stack.pop()
+            if opener != CLOSERS[char]:
+                line = code.count("\n", 0, opened) + 1
+                return [_diagnostic(code, index, f"'{char}' does not match '{opener}' opened on line {line}; "
+                                                 f"expected '{OPENERS[opener]}'.", bracket_kind)]
+        index += 1
+    if stack:
+        opener, opened = stack[-1]
+        return [_diagnostic(code, opened, f"'{opener}' is never closed.", bracket_kind)]
+    return []
+
+
+_preflight_cache = OrderedDict()
+_preflight_lock = threading.Lock()
+
+
+def preflight(language, code):
+    """
+    Cheap syntax check of one source, cached by source hash so it can run on every edit.
+    Returns st_ace annotations: [{"row", "column", "text", "type": "error" or "warning"}], rows and columns 0-based.
+    """
+    if not code or not code.strip():
+        return []
+    key = hashlib.sha256(f"{language}\0{code}".encode()).hexdigest()
+    with _preflight_lock:
+        if key in _preflight_cache:
+            _preflight_cache.move_to_end(key)
+            return _preflight_cache[key]
+
+    if language == "Python":
+        diagnostics = _python_diagnostics(code)
+    elif language == "SQL":
+        diagnostics = _sql_diagnostics(code)
+    elif language in ("C++", "Java"):
+        diagnostics = _delimiter_diagnostics(code, language)
+    else:
+        diagnostics = []
+
+    with _preflight_lock:
+        _preflight_cache[key] = diagnostics
+        while len(_preflight_cache) > PREFLIGHT_CACHE_ENTRIES:
+            _preflight_cache.popitem(last=False)
+    return diagnostics
+
+
+def preflight_errors(diagnostics):
+    # The blocking diagnostics as "Line 3, column 7: ..." lines
+    return [f"Line {d['row'] + 1}, column {d['column'] + 1}: {d['text']}" for d in diagnostics if d["type"] == "error"]
@@ -0,0 +1,324 @@
+import os
+import re
+import time
+import atexit
+import shutil
+import socket
+import struct
+import hashlib
+import zipfile
+import threading
+import subprocess
+from config import *
+from Phoenix_cache import get_compile_cache
+from Phoenix_sandbox import resolve_limits, capture_text, compile_slots
+from Phoenix_workspace import java_types, workspace_file
+
+CLASSES_SUFFIX = ".classes.zip"
+
+# JDK 18-23 only allow the daemon's security manager when asked; older JDKs don't know the flag
+JAVA_SERVER_OPTIONS = [["-Djava.security.manager=allow"], []]
+# No common-pool workers: parallel streams and async tasks run on the submission's own threads,
+# where their CPU time is counted and they can be stopped with the run
+JAVA_SERVER_PROPERTIES = ["-Djava.util.concurrent.ForkJoinPool.common.parallelism=0"]
+# Outcomes the shared JVM can't vouch for; the run is repeated in its own JVM
+JAVA_SERVER_RETRY_STATUSES = {"unsupported", "memory_limit"}
+
+
+def _server_classes():
+    # Compile PhoenixJavaServer once per version of its source
+    with open(JAVA_SERVER_SOURCE, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    directory = os.path.join(JAVA_SERVER_DIR, digest)
+    if os.path.exists(os.path.join(directory, "PhoenixJavaServer.class")):
+        return directory
+    staging = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(staging, exist_ok=True)
+    subprocess.run(["javac", "-d", staging, JAVA_SERVER_SOURCE],
+                   check=True, capture_output=True, timeout=JAVA_SERVER_START_TIMEOUT)
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)  # Another process published it first
+    return directory
+
+
+def _read_port(process, timeout):
+    # The daemon announces its loopback port as the first line of stdout
+    line = []
+    reader = threading.Thread(target=lambda: line.append(process.stdout.readline()), daemon=True)
+    reader.start()
+    reader.join(timeout)
+    if not line or not line[0].startswith(b"PORT "):
+        return None
+    return int(line[0].split()[1])
+
+
+def _discard(stream):
+    # Keep the pipe drained so stray writes from the daemon never block it
+    for _ in iter(lambda: stream.read(65536), b""):
+        pass
+
+
+def _field(data):
+    return struct.pack("!i", len(data)) + data
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("Java server closed the connection")
+    return data
+
+
+def _read_field(stream):
+    (size,) = struct.unpack("!i", _read_exact(stream, 4))
+    return _read_exact(stream, size)
+
+
+def _read_capture(stream):
+    # Head and tail of the stream, its full size and the spill file holding all of it (if any)
+    head, tail = _read_field(stream), _read_field(stream)
+    (size,) = struct.unpack("!q", _read_exact(stream, 8))
+    spill = _read_field(stream).decode()
+    return capture_text(head, tail, size), size, spill or None
+
+
+class JavaServer:
+    """
+    Client for PhoenixJavaServer: starts the daemon on first use and restarts it when it dies.
+    """
+
+    def __init__(self, workers=JAVA_SERVER_WORKERS, heap_mb=JAVA_SERVER_HEAP_MB):
+        self.workers = workers
+        self.heap_mb = heap_mb
+        self.process = None
+        self.port = None
+        self.unavailable = None  # Why the daemon can't run here (e.g. no JDK); callers fall back to javac/java
+        self._lock = threading.Lock()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        with self._lock:
+            if self.alive():
+                return True
+            if self.unavailable:
+                return False
+            for options in JAVA_SERVER_OPTIONS:
+                try:
+                    process = subprocess.Popen(
+                        ["java", f"-Xmx{self.heap_mb}m", *options, *JAVA_SERVER_PROPERTIES,
+                         "-cp", _server_classes(), "PhoenixJavaServer", str(self.workers)],
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL,
+                    )
+                except (OSError, subprocess.SubprocessError) as e:
+                    self.unavailable = str(e)
+                    return False
+                port = _read_port(process, JAVA_SERVER_START_TIMEOUT)
+                if port is not None:
+                    break
+                process.kill()
+                process.wait()
+            else:
+                # Without its security manager the daemon can't keep runs apart (JDK 24+ has none)
+                self.unavailable = "Java server did not start"
+                return False
+            threading.Thread(target=_discard, args=(process.stdout,), daemon=True).start()
+            self.process, self.port = process, port
+            return True
+
+    def stop(self):
+        with self._lock:
+            if self.process is not None:
+                if self.process.poll() is None:
+                    self.process.kill()
+                self.process.wait()
+            self.process, self.port = None, None
+
+    def _connect(self, timeout):
+        # A refused connection means the daemon is gone: restart it once and try again
+        for attempt in range(2):
+            if not self.start():
+                return None
+            try:
+                return socket.create_connection(("127.0.0.1", self.port), timeout=timeout)
+            except OSError:
+                self.stop()
+        return None
+
+    def run(self, class_name, code, stdin="", limits=None, main_class=None):
+        """
+        Compile and run one submission inside the daemon; None when the daemon can't be used,
+        or can't hold this run to its limits, so the caller runs it in a JVM of its own.
+        class_name names the source file, main_class (default: the same) the class whose main() runs.
+        """
+        limits = resolve_limits(limits)
+        # Runs share one heap: a run can't use more than all of it, but anything below that isn't enforced
+        if limits["memory_mb"] and self.heap_mb > limits["memory_mb"]:
+            return None
+        conn = self._connect(limits["wall_time"] + EXEC_COMPILE_TIMEOUT)
+        if conn is None:
+            return None
+        started = time.perf_counter()
+        try:
+            with conn:
+                conn.sendall(_field(class_name.encode()) + _field((main_class or class_name).encode())
+                             + _field(code.encode()) + _field((stdin or "").encode())
+                             + struct.pack("!qqqii", int(limits["wall_time"] * 1000),
+                                           int((limits["cpu_time"] or 0) * 1000), limits["output_bytes"],
+                                           CAPTURE_HEAD_BYTES, CAPTURE_TAIL_BYTES)
+                             + _field(CAPTURE_SPILL_DIR.encode()))
+                stream = conn.makefile("rb")
+                status = _read_field(stream).decode()
+                stdout, stdout_bytes, stdout_spill = _read_capture(stream)
+                stderr, _, _ = _read_capture(stream)
+                wall_ns, cpu_ns, cached = struct.unpack("!qq?", _read_exact(stream, 17))
+        except (OSError, EOFError):
+            # The daemon died mid-run (a crash, or System.exit with no security manager to stop it);
+            # the next run gets a fresh one and this one is retried the slow way
+            self.stop()
+            return None
+        if status in JAVA_SERVER_RETRY_STATUSES:
+            # Touched state every run shares, or ran out of a heap other runs were using too
+            return None
+
+        return {
+            "stdout": stdout,
+            "stdout_bytes": stdout_bytes,
+            "stdout_spill": stdout_spill,
+            "stderr": stderr,
+            "error": None,
+            "status": status,
+            "returncode": 0 if status == "ok" else 1,
+            "wall_time": wall_ns / 1e9 if wall_ns else time.perf_counter() - started,
+            "cpu_time": cpu_ns / 1e9 if cpu_ns >= 0 else None,
+            "peak_rss_kb": None,  # One shared heap, so there is no per-run RSS
+            "build_cached": cached,
+        }
+
+
+def java_source_keys(files):
+    """
+    Cache key of every .java file in a workspace: its own text plus the text of each file declaring
+    a type it names, so a file is rebuilt when it or a class it uses directly changes.
+    """
+    sources = {path: code for path, code in files.items() if path.endswith(".java")}
+    declared = {path: set(java_types(code)["names"]) for path, code in sources.items()}
+    keys = {}
+    for path, code in sources.items():
+        words = set(re.findall(r"\w+", code))
+        used = sorted(other for other, names in declared.items() if other != path and words & names)
+        digest = hashlib.sha256()
+        for part in [shutil.which("javac") or "javac", path, code] + [f"{other}\n{sources[other]}" for other in used]:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        keys[path] = digest.hexdigest()
+    return keys
+
+
+def _owned_classes(classes_dir, code):
+    # Class files compiled from one source: its types plus their nested/anonymous classes (Outer$Inner)
+    types = java_types(code)
+    package_dir = os.path.join(classes_dir, *types["package"].split(".")) if types["package"] else classes_dir
+    if not os.path.isdir(package_dir):
+        return []
+    names = set(types["names"])
+    return [os.path.join(package_dir, name) for name in sorted(os.listdir(package_dir))
+            if name.endswith(".class") and name[:-len(".class")].split("$", 1)[0] in names]
+
+
+def _javac(paths, source_dir, classes_dir):
+    with compile_slots:
+        try:
+            result = subprocess.run(
+                ["javac", "-encoding", "UTF-8", "-d", classes_dir, "-cp", classes_dir, *paths],
+                capture_output=True,
+                text=True,
+                cwd=source_dir,  # Relative paths keep the temp directory out of error messages
+                timeout=EXEC_COMPILE_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            return "compile_timeout", "The compiler took too long."
+    return ("ok", "") if result.returncode == 0 else ("compile_error", result.stderr)
+
+
+def compile_java_project(files, work_dir):
+    """
+    Compile the .java files of a workspace into work_dir/classes, recompiling only the sources whose
+    cache key changed; the classes of every other source come from the compile cache.
+    Returns a dict like compile_cpp's plus "classes" (the class directory), "units" and "compiled_units".
+    """
+    cache = get_compile_cache()
+    sources = {path: code for path, code in files.items() if path.endswith(".java")}
+    source_dir, classes_dir = os.path.join(work_dir, "src"), os.path.join(work_dir, "classes")
+    build = {"error": None, "status": "ok", "compile_time": 0.0, "cached": True, "classes": classes_dir,
+             "units": len(sources), "compiled_units": 0}
+    if not sources:
+        build.update(error="No .java files in the workspace.", status="compile_error")
+        return build
+
+    for path, code in sources.items():
+        full_path = workspace_file(source_dir, path)
+        if full_path is None:
+            build.update(error=f"{path}: the path is outside the workspace.", status="compile_error")
+            return build
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(code)
+    os.makedirs(classes_dir, exist_ok=True)
+
+    keys = java_source_keys(sources)
+    changed = []
+    for path in sorted(sources):
+        archive = cache.get(keys[path], CLASSES_SUFFIX)
+        try:
+            if archive is None:
+                raise FileNotFoundError(path)
+            with zipfile.ZipFile(archive) as z:
+                z.extractall(classes_dir)
+        except (OSError, zipfile.BadZipFile):
+            changed.append(path)  # Never built, or evicted since get()
+    if not changed:
+        return build
+
+    build["cached"] = False
+    started = time.perf_counter()
+    status, error = _javac(changed, source_dir, classes_dir)
+    if status == "compile_error" and len(changed) < len(sources):
+        # Cached classes can go stale through a change further down the dependency chain;
+        # a clean build of everything settles it
+        shutil.rmtree(classes_dir)
+        os.makedirs(classes_dir)
+        changed = sorted(sources)
+        status, error = _javac(changed, source_dir, classes_dir)
+    build["compile_time"] = time.perf_counter() - started
+    if status != "ok":
+        build.update(error=error, status=status)
+        return build
+
+    build["compiled_units"] = len(changed)
+    for path in changed:
+        archive = os.path.join(work_dir, f"{keys[path]}{CLASSES_SUFFIX}")
+        with zipfile.ZipFile(archive, "w") as z:
+            for class_file in _owned_classes(classes_dir, sources[path]):
+                z.write(class_file, os.path.relpath(class_file, classes_dir))
+        cache.store(keys[path], archive, CLASSES_SUFFIX)
+    return build
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_java_server():
+    # One daemon per Streamlit server process, shared by every session
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = JavaServer()
+            atexit.register(_server.stop)
+    return _server
@@ -0,0 +1,165 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+
+FINISHED = {"done", "failed", "cancelled"}
+
+
+class Job:
+    def __init__(self, language, func, args, kwargs, owner=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.language = language
+        self.owner = owner
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def info(self):
+        now = time.time()
+        return {
+            "id": self.id,
+            "language": self.language,
+            "status": self.status,
+            "queued_s": (self.started or self.finished or now) - self.submitted,
+            "run_s": (self.finished or now) - self.started if self.started else None,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """
+    Runs executor calls in the background. submit() returns a job ID right away; jobs start as soon as
+    their language is under its concurrency limit, taking turns across owners (one job per owner per round,
+    in submission order within an owner), so one user's batch doesn't hold everyone else up.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, language_limits=None, history=JOB_HISTORY):
+        self.workers = workers
+        self.language_limits = dict(JOB_LANGUAGE_LIMITS if language_limits is None else language_limits)
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="phoenix-job")
+        self._jobs = OrderedDict()
+        self._pending = []
+        self._running = {}
+        self._served = {}  # {owner: turn they last started a job}, only for owners with jobs queued or running
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    def submit(self, language, func, *args, owner=None, **kwargs):
+        job = Job(language, func, args, kwargs, owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._prune()
+        self._dispatch()
+        return job.id
+
+    def _order(self):
+        # Pending jobs in the order they get to start: round-robin across owners, the owner served
+        # least recently first (owners new to the queue before everyone else)
+        queues = OrderedDict()
+        for job in self._pending:
+            queues.setdefault(job.owner, []).append(job)
+        owners = sorted(queues, key=lambda owner: self._served.get(owner, 0))
+        order = []
+        for turn in range(max((len(queue) for queue in queues.values()), default=0)):
+            order.extend(queues[owner][turn] for owner in owners if turn < len(queues[owner]))
+        return order
+
+    def _dispatch(self):
+        # Jobs wait here rather than in the executor, so a full language never holds threads
+        # that another language could use
+        with self._lock:
+            started = True
+            while started and sum(self._running.values()) < self.workers:
+                started = False
+                for job in self._order():
+                    running = self._running.get(job.language, 0)
+                    if running >= self.language_limits.get(job.language, self.workers):
+                        continue
+                    self._pending.remove(job)
+                    self._running[job.language] = running + 1
+                    self._turn += 1
+                    self._served[job.owner] = self._turn
+                    job.status = "running"
+                    job.started = time.time()
+                    self._executor.submit(self._run, job)
+                    started = True
+                    break  # The order changed: this owner goes to the back
+            active = {job.owner for job in self._jobs.values() if job.status in ("queued", "running")}
+            self._served = {owner: turn for owner, turn in self._served.items() if owner in active}
+
+    def _run(self, job):
+        try:
+            job.result = job.func(*job.args, **job.kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            job.func = job.args = job.kwargs = None
+            with self._lock:
+                self._running[job.language] -= 1
+                self._prune()
+            self._dispatch()
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond the history size
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        info = job.info()
+        if job.status == "queued":
+            with self._lock:
+                order = self._order()
+                info["position"] = order.index(job) + 1 if job in order else None
+        return info
+
+    def result(self, job_id):
+        # The job's return value once it is done, otherwise None
+        job = self._jobs.get(job_id)
+        return job.result if job is not None and job.status == "done" else None
+
+    def cancel(self, job_id):
+        # Only queued jobs can be cancelled; a running one finishes under its own limits
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job not in self._pending:
+                return False
+            self._pending.remove(job)
+            job.status = "cancelled"
+            job.finished = time.time()
+            job.func = job.args = job.kwargs = None
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {"running": dict(self._running), "queued": len(self._pending)}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    # One scheduler per server process, shared by every Streamlit session
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+    return _scheduler
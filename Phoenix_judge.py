@@ -0,0 +1,197 @@
+import io
+import os
+import re
+import gzip
+import math
+import hashlib
+from collections import Counter
+from config import *
+
+JUDGE_MODES = ("exact", "whitespace", "float", "unordered")
+TOKEN = re.compile(r"\S+")
+
+
+def text_lines(text):
+    # Lines of an in-memory string, without building a list of them
+    return (line.rstrip("\r\n") for line in io.StringIO(text or ""))
+
+
+def file_lines(source):
+    """
+    Lines of a path (gzip spill files included) or a binary/text file object, read lazily.
+    """
+    if isinstance(source, str):
+        opener = gzip.open if source.endswith(".gz") else open
+        with opener(source, "rt", encoding="utf-8", errors="replace", newline="") as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+        return
+    if isinstance(source.read(0), bytes):
+        source = io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline="")
+    for line in source:
+        yield line.rstrip("\r\n")
+
+
+def output_lines(output, metrics):
+    # A run's full stdout: the spill file when the output outgrew memory, otherwise what the program printed
+    # (raw_stdout when the displayed output has the inputs folded into its prompts)
+    if metrics.get("stdout_spill") and os.path.exists(metrics["stdout_spill"]):
+        return file_lines(metrics["stdout_spill"])
+    if metrics.get("raw_stdout") is not None:
+        return text_lines(metrics["raw_stdout"])
+    return text_lines(output if isinstance(output, str) else str(output))
+
+
+def _shorten(text, limit=200):
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
+def _verdict(passed, line=None, column=None, expected=None, actual=None, message="", lines=0):
+    return {"passed": passed, "line": line, "column": column, "expected": _shorten(expected),
+            "actual": _shorten(actual), "message": message, "lines": lines}
+
+
+def _numbers_match(actual, expected, tolerance):
+    try:
+        a, b = float(actual), float(expected)
+    except ValueError:
+        return actual == expected
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    # Absolute error for small values, relative error for large ones
+    return abs(a - b) <= tolerance * max(1.0, abs(b))
+
+
+def _content_lines(lines):
+    # (line number, line) of the non-blank lines; token-based modes don't care about blank lines
+    return ((number, line) for number, line in enumerate(lines, start=1) if line.strip())
+
+
+def _ordered(actual, expected, same_tokens, tokenize):
+    # Walks both streams in step; only the current pair of lines is ever held in memory
+    compared = 0
+    while True:
+        a = next(actual, None)
+        e = next(expected, None)
+        if a is None and e is None:
+            return _verdict(True, message=f"Accepted: {compared} lines match.", lines=compared)
+        if a is None:
+            return _verdict(False, e[0], 1, e[1], None,
+                            f"Line {e[0]}: output ended early, expected '{_shorten(e[1], 60)}'.", compared)
+        if e is None:
+            return _verdict(False, a[0], 1, None, a[1],
+                            f"Line {a[0]}: extra output '{_shorten(a[1], 60)}'.", compared)
+        if not tokenize:
+            if a[1] != e[1]:
+                column = next((i for i, (x, y) in enumerate(zip(a[1], e[1])) if x != y), min(len(a[1]), len(e[1])))
+                return _verdict(False, a[0], column + 1, e[1], a[1],
+                                f"Line {a[0]}, column {column + 1}: expected '{_shorten(e[1], 60)}', "
+                                f"got '{_shorten(a[1], 60)}'.", compared)
+        else:
+            actual_tokens = list(TOKEN.finditer(a[1]))
+            expected_tokens = TOKEN.findall(e[1])
+            for index in range(max(len(actual_tokens), len(expected_tokens))):
+                got = actual_tokens[index].group() if index < len(actual_tokens) else None
+                want = expected_tokens[index] if index < len(expected_tokens) else None
+                if got is None or want is None or not same_tokens(got, want):
+                    column = actual_tokens[index].start() + 1 if got is not None else len(a[1].rstrip()) + 1
+                    return _verdict(False, a[0], column, e[1], a[1],
+                                    f"Line {a[0]}, token {index + 1}: expected '{_shorten(want, 60) or '(end of line)'}', "
+                                    f"got '{_shorten(got, 60) or '(end of line)'}'.", compared)
+        compared += 1
+
+
+def _digest(line):
+    return hashlib.blake2b(" ".join(line.split()).encode(), digest_size=16).digest()
+
+
+def _unordered(actual, expected):
+    # Only a 16-byte digest per distinct expected line is kept, never the lines themselves
+    remaining = Counter()
+    first_seen = {}
+    for number, line in _content_lines(expected):
+        digest = _digest(line)
+        remaining[digest] += 1
+        first_seen.setdefault(digest, number)
+    compared = 0
+    for number, line in _content_lines(actual):
+        digest = _digest(line)
+        if remaining[digest] <= 0:
+            return _verdict(False, number, 1, None, line,
+                            f"Line {number}: '{_shorten(line, 60)}' is not in the expected output "
+                            "(or appears too often).", compared)
+        remaining[digest] -= 1
+        compared += 1
+    missing = [first_seen[digest] for digest, count in remaining.items() if count > 0]
+    if missing:
+        return _verdict(False, min(missing), 1, None, None,
+                        f"Expected line {min(missing)} is missing from the output.", compared)
+    return _verdict(True, message=f"Accepted: {compared} lines match in some order.", lines=compared)
+
+
+def judge_output(actual, expected, mode=JUDGE_DEFAULT_MODE, tolerance=JUDGE_FLOAT_TOLERANCE):
+    """
+    Compare two streams of lines (e.g. output_lines() against file_lines()) one line at a time.
+    Modes: exact, whitespace (token-wise, blank lines ignored), float (whitespace plus numeric tolerance)
+    and unordered (the same lines in any order). Returns a verdict dict with the first differing position.
+    """
+    if mode not in JUDGE_MODES:
+        raise ValueError(f"Unknown judge mode: {mode}")
+    actual, expected = iter(actual), iter(expected)
+    if mode == "unordered":
+        return _unordered(actual, expected)
+    if mode == "exact":
+        # A missing newline at the very end is the only difference exact mode forgives
+        return _ordered(enumerate(actual, start=1), enumerate(expected, start=1), None, tokenize=False)
+    if mode == "float":
+        same = lambda got, want: _numbers_match(got, want, tolerance)
+    else:
+        same = lambda got, want: got == want
+    return _ordered(_content_lines(actual), _content_lines(expected), same, tokenize=True)
+
+
+AC_HEADING = re.compile(r"^[\s>#*_`-]*(?:sample\s+|example\s+|expected\s+)?(input|output)s?(?:\s*\d+)?"
+                        r"[\s*_]*(?::|$)[\s*_]*(.*)$", re.IGNORECASE)
+FENCE = re.compile(r"^\s*```")
+
+
+def samples_from_ac(text):
+    """
+    Pull sample (input, expected output) pairs out of generate_task_ac's free-form acceptance criteria.
+    A heading like "Sample Input:" is followed by the value on the same line, a fenced block or a run of lines.
+    """
+    lines = (text or "").splitlines()
+    sections = []
+    index = 0
+    while index < len(lines):
+        match = AC_HEADING.match(lines[index])
+        if not match:
+            index += 1
+            continue
+        kind, rest = match.group(1).lower(), match.group(2).strip().strip("`*_ ")
+        index += 1
+        if rest:
+            body = [rest]
+        elif index < len(lines) and FENCE.match(lines[index]):
+            body, index = [], index + 1
+            while index < len(lines) and not FENCE.match(lines[index]):
+                body.append(lines[index])
+                index += 1
+            index += 1
+        else:
+            body = []
+            while index < len(lines) and lines[index].strip() and not AC_HEADING.match(lines[index]):
+                body.append(lines[index].strip().strip("`"))
+                index += 1
+        sections.append((kind, "\n".join(body).strip("\n")))
+
+    samples, pending_input = [], None
+    for kind, body in sections:
+        if kind == "input":
+            pending_input = body
+        elif pending_input is not None or not samples:
+            samples.append({"input": pending_input or "", "output": body})
+            pending_input = None
+    return samples
@@ -1,18 +1,34 @@
 import streamlit as st
 from streamlit_ace import st_ace
 import tempfile
+import os
+import uuid
+import functools
 import ollama
 import pandas as pd
 import subprocess
 from phoenix_utils import (
-    run_python_code, run_sql_code, format_python_code, format_sql_code,
-    optimize_python_code, optimize_code, run_cpp_code, run_java_code,
+    format_python_code, format_sql_code, profile_python_code,
+    optimize_python_code, optimize_code,
     format_cpp_code, format_java_code, optimize_cpp_code, optimize_java_code,
+    split_test_cases, run_test_cases, LiveRun, run_code, execution_capacity, run_workspace, submit_code,
+    estimate_complexity, compare_languages, store_input_file, list_input_files, preview_input_file,
     store_feedback,store_ticket,fetch_jira_data
 )
+from Phoenix_sandbox import format_metrics, output_page_count, read_output_page, StdinFile
+from Phoenix_jobs import get_scheduler
+from Phoenix_workspace import load_workspace_zip, workspace_language, _clean_path
+from Phoenix_analysis import analyze_python_code
+from Phoenix_diagnostics import preflight, preflight_errors
+from Phoenix_judge import JUDGE_MODES, JUDGE_DEFAULT_MODE, JUDGE_FLOAT_TOLERANCE, samples_from_ac
+from Phoenix_warmup import get_warmup, WARMUP_KEEP_ALIVE
+from Phoenix_admission import get_admission, AdmissionRejected
 
 st.set_page_config(layout="wide",page_icon='🐦')
 
+# Compilers, the JVM, sandbox workers and the LLM models load in the background once per server process
+warmup = get_warmup()
+
 if 'task' not in st.session_state:
     st.session_state['task'] = 'No task Specified'
 
@@ -25,8 +41,40 @@ if 'task_description' not in st.session_state:
 if 'task_ac' not in st.session_state:
     st.session_state['task_ac'] = 'No task Specified'
 
+def session_user():
+    # Limits are per browser session; there is no login to key them on
+    if "user_id" not in st.session_state:
+        st.session_state["user_id"] = uuid.uuid4().hex[:12]
+    return st.session_state["user_id"]
+
+def admitted(action, rejected=None, wait=True):
+    """
+    Run the wrapped call once this user's execute/format/llm limits allow it, showing the queue position meanwhile.
+    Returns rejected when the request waited too long; with wait=False, right away and silently when it can't start now.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            notice = st.empty()
+            def on_wait(position, retry_in):
+                limit = f" · your rate limit allows the next one in {retry_in:.0f}s" if retry_in >= 1 else ""
+                notice.info(f"Queued, position {position}{limit}")
+            try:
+                with get_admission().admit(session_user(), action, on_wait=on_wait, timeout=None if wait else 0):
+                    notice.empty()
+                    return func(*args, **kwargs)
+            except AdmissionRejected as e:
+                if wait:
+                    st.toast(str(e), icon="⚠️")
+                return rejected
+            finally:
+                notice.empty()
+        return wrapper
+    return decorate
+
+@admitted("llm", "")
 def generate_task_title(code):
-    response = ollama.chat(model='llama3.2:1b', stream=True, messages=[
+    response = ollama.chat(model='llama3.2:1b', stream=True, keep_alive=WARMUP_KEEP_ALIVE, messages=[
         {"role": "user", "content": f"Provide one best title without any explanation or description for the task :\n{code}"}
     ])
     description = ""
@@ -35,8 +83,9 @@ def generate_task_title(code):
         description += token
     return description
 
+@admitted("llm", "")
 def generate_task_description(code):
-    response = ollama.chat(model='llama3.2:1b', stream=True, messages=[
+    response = ollama.chat(model='llama3.2:1b', stream=True, keep_alive=WARMUP_KEEP_ALIVE, messages=[
         {"role": "user", "content": f"Provide a description of the following task in short:\n{code}"}
     ])
     description = ""
@@ -45,8 +94,9 @@ def generate_task_description(code):
         description += token
     return description
 
+@admitted("llm", "")
 def generate_task_ac(code):
-    response = ollama.chat(model='llama3.2:1b', stream=True, messages=[
+    response = ollama.chat(model='llama3.2:1b', stream=True, keep_alive=WARMUP_KEEP_ALIVE, messages=[
         {"role": "user", "content": f"Provide an acceptance criteria with sample input and output without any code for the following task :\n{code}"}
     ])
     description = ""
@@ -73,13 +123,18 @@ def display_jira_data(status):
     except Exception as e:
         st.error(f"Error fetching data: {e}")
 
+@admitted("llm")
 def run_ollama(prompt):
+    return ollama_cli(prompt)
+
+def ollama_cli(prompt):
     """
     Use the Ollama CLI to generate a response from the model.
+    Touches no Streamlit state, so worker threads can call it; admission is up to the caller.
     """
     try:
         process = subprocess.Popen(
-            ["ollama", "run", "codegemma:7b"],
+            ["ollama", "run", "codegemma:7b", "--keepalive", WARMUP_KEEP_ALIVE],  # Stay loaded like the warm-up left it
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -97,6 +152,16 @@ def run_ollama(prompt):
         print(f"An error occurred: {e}")
         return None      
 
+def show_warmup():
+    # Readiness of the warm-up steps; collapsed once everything is done
+    if warmup.started is None:
+        return
+    steps = warmup.status()
+    done = sum(step["state"] in ("ready", "failed") for step in steps)
+    label = "Ready" if warmup.ready() else f"Warming up: {done}/{len(steps)} done"
+    with st.sidebar.expander(f"Status: {label}"):
+        st.dataframe(pd.DataFrame(steps), use_container_width=True, hide_index=True)
+
 def display_output(result):
     if isinstance(result, pd.DataFrame):
         if result.empty:
@@ -167,6 +232,8 @@ def first_page():
         st.session_state["code"] = ""
     if "custom_input" not in st.session_state:
         st.session_state["custom_input"] = ""
+    if "input_file" not in st.session_state:
+        st.session_state["input_file"] = None  # Path of a large input file on the server, used instead of custom_input
     if "output" not in st.session_state:
         st.session_state["output"] = ""
     if "selected_language" not in st.session_state:
@@ -175,32 +242,179 @@ def first_page():
         st.session_state["code_description_response"] = ""
     if "conversion_language" not in st.session_state:
         st.session_state["conversion_language"] = ""
+    if "workspace" not in st.session_state:
+        st.session_state["workspace"] = {}  # {relative path: source} of a multi-file project
+        st.session_state["workspace_file"] = None
+
+    def sync_workspace():
+        # The editor shows one workspace file at a time: keep its edits and follow the file tree
+        workspace = st.session_state["workspace"]
+        current = st.session_state["workspace_file"]
+        if current in workspace:
+            workspace[current] = st.session_state["code"]
+        chosen = st.session_state.get("workspace_tree")
+        if chosen not in workspace:
+            chosen = next(iter(workspace), None)  # The selected file was removed
+        if chosen is not None and chosen != current:
+            st.session_state["workspace_file"] = chosen
+            st.session_state["code"] = workspace[chosen]
+
+    sync_workspace()
+
+    def current_input():
+        # The selected input file (streamed from disk as stdin) takes precedence over the text box
+        path = st.session_state["input_file"]
+        if path and os.path.isfile(path):
+            return StdinFile(path)
+        return st.session_state["custom_input"]
+
+    def preflight_passed():
+        # Code that can't build is reported straight from the editor's check, without a compiler or sandbox round trip
+        errors = preflight_errors(preflight(st.session_state["selected_language"], st.session_state["code"]))
+        if not errors:
+            return True
+        st.session_state["profile"] = None
+        st.session_state["test_results"] = None
+        st.session_state["run_metrics"] = ""
+        st.session_state["output_spill"] = None
+        display_output("Pre-flight check failed:\n" + "\n".join(errors))
+        return False
         
     def call_run(name):
-        result = None
+        # Queued on the job scheduler so the page stays responsive; returns the job ID.
+        # The scheduler takes turns across sessions, so one user's queued runs don't hold up everyone else's
+        if name == 'run_button' and st.session_state["workspace"]:
+            return get_scheduler().submit(
+                st.session_state["selected_language"], run_workspace, st.session_state["selected_language"],
+                dict(st.session_state["workspace"]), current_input(), st.session_state["workspace_file"],
+                with_metrics=True, owner=session_user(),
+            )
         if name == 'run_button':
-            if st.session_state["selected_language"] == "SQL":
-                result = run_sql_code(st.session_state["code"])
-            elif st.session_state["selected_language"] == "Python":
-                result = run_python_code(st.session_state["code"], st.session_state["custom_input"])
-            elif st.session_state["selected_language"] == "C++":
-                result = run_cpp_code(st.session_state["code"], st.session_state["custom_input"])
-            elif st.session_state["selected_language"] == "Java":
-                result = run_java_code(st.session_state["code"], st.session_state["custom_input"])
-        return result
+            return get_scheduler().submit(
+                st.session_state["selected_language"], run_code, st.session_state["selected_language"],
+                st.session_state["code"], current_input(), st.session_state.get("count_ops", False),
+                owner=session_user(),
+            )
+
+    def remember_spill(metrics):
+        # Outputs bigger than the in-memory head + tail can be paged through in full
+        if metrics.get("stdout_spill"):
+            st.session_state["output_spill"] = {"path": metrics["stdout_spill"], "bytes": metrics["stdout_bytes"]}
+        else:
+            st.session_state["output_spill"] = None
 
+    @admitted("execute")
     def run_func():
-        r = call_run('run_button')
+        if st.session_state.get("live_output") and st.session_state["selected_language"] != "SQL":
+            # Started here, streamed into the Output area below
+            st.session_state["live_run"] = LiveRun(st.session_state["selected_language"], st.session_state["code"],
+                                                   current_input(), st.session_state.get("count_ops", False))
+            st.session_state["profile"] = None
+            st.session_state["test_results"] = None
+            return
+        st.session_state["job_id"] = call_run('run_button')
         # st.session_state["output"] = str(r) if r else "No output produced or an error occurred."
-        display_output(r)
+        st.session_state["profile"] = None
+        st.session_state["test_results"] = None
+        st.session_state["run_metrics"] = ""
+        st.session_state["output_spill"] = None
+        st.session_state["output"] = ""
+
+    def job_status():
+        # Polls the running job without rerunning the whole page; a full rerun shows the result
+        job_id = st.session_state.get("job_id")
+        info = get_scheduler().status(job_id)
+        if info is not None and info["status"] == "queued":
+            st.caption(f"Job {job_id} queued (position {info['position']})")
+            if st.button("Cancel", key="cancel_job_button"):
+                get_scheduler().cancel(job_id)
+            return
+        if info is not None and info["status"] == "running":
+            st.caption(f"Job {job_id} running ({info['run_s']:.1f}s)")
+            return
+        st.session_state["job_id"] = None
+        if info is None:
+            result, metrics = "The job is no longer available.", {}
+        elif info["status"] == "done":
+            result, metrics = get_scheduler().result(job_id)
+        elif info["status"] == "failed":
+            result, metrics = f"Unexpected error: {info['error']}", {}
+        else:
+            result, metrics = "Run cancelled.", {}
+        st.session_state["run_metrics"] = format_metrics(metrics)
+        remember_spill(metrics)
+        display_output(result)
+        st.rerun()
+
+    @admitted("execute")
+    def test_func():
+        cases = split_test_cases(st.session_state["test_cases"])
+        r = run_test_cases(st.session_state["selected_language"], st.session_state["code"], cases)
+        st.session_state["profile"] = None
+        st.session_state["run_metrics"] = ""
+        st.session_state["output_spill"] = None
+        if isinstance(r, pd.DataFrame):
+            st.session_state["test_results"] = r
+            display_output(f"{(r['status'] == 'ok').sum()} of {len(r)} test cases ran successfully.")
+        else:
+            st.session_state["test_results"] = None
+            display_output(r)
+
+    @admitted("execute")
+    def submit_func():
+        # Judge the code against the expected output: typed in, uploaded, or the ticket's sample cases
+        source = st.session_state.get("expected_source", "Text")
+        if source == "Acceptance criteria":
+            cases = [{"input": sample["input"], "expected": sample["output"]}
+                     for sample in samples_from_ac(st.session_state["task_ac"])]
+        elif source == "File":
+            expected_file = st.session_state.get("expected_file")
+            cases = [{"input": current_input(), "expected": expected_file}] if expected_file else []
+        else:
+            expected = st.session_state.get("expected_output", "")
+            cases = [{"input": current_input(), "expected": expected}] if expected.strip() else []
+        r = submit_code(st.session_state["selected_language"], st.session_state["code"], cases,
+                        st.session_state.get("judge_mode", JUDGE_DEFAULT_MODE),
+                        st.session_state.get("judge_tolerance", JUDGE_FLOAT_TOLERANCE))
+        st.session_state["profile"] = None
+        st.session_state["run_metrics"] = ""
+        st.session_state["output_spill"] = None
+        if isinstance(r, pd.DataFrame):
+            st.session_state["test_results"] = r
+            accepted = (r["verdict"] == "accepted").sum()
+            if accepted == len(r):
+                st.toast("Success!", icon="✅")
+                display_output(f"Accepted: {accepted} of {len(r)} cases match the expected output.")
+            else:
+                failed = r[r["verdict"] != "accepted"].iloc[0]
+                display_output(f"{accepted} of {len(r)} cases accepted. Case {failed['case']}: {failed['message']}")
+        else:
+            st.session_state["test_results"] = None
+            st.toast(r, icon="⚠️")
+
+    @admitted("execute")
+    def profile_func():
+        r, metrics = profile_python_code(st.session_state["code"], current_input(), with_metrics=True)
+        st.session_state["run_metrics"] = format_metrics(metrics)
+        remember_spill(metrics)
+        st.session_state["test_results"] = None
+        if isinstance(r, dict):
+            st.session_state["profile"] = r
+            display_output(r["output"])
+        else:
+            st.session_state["profile"] = None
+            display_output(r)
     
     editor_col, buttons_col = st.columns([3, 1])
 
     with editor_col:
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3, col4, col5 = st.columns(5)
         with col2:
-            if st.button("Run", key='run_button'):
+            if st.button("Run", key='run_button') and preflight_passed():
                 run_func()
+        with col5:
+            if st.button("Profile", key='profile_button', disabled=st.session_state["selected_language"] != "Python") and preflight_passed():
+                profile_func()
         with col1:
             if st.button("Help! "):
                 st.session_state["current_page"] = "chat"  # Change page to chat page
@@ -230,26 +444,143 @@ def first_page():
                     f.write(st.session_state['code'])
 
         with col4:
-            if st.button("Submit"):
-                st.toast("Success!", icon="✅")
+            if st.button("Submit") and preflight_passed():
+                with st.spinner("Checking against the expected output..."):
+                    submit_func()
 
+        # Cached by source hash; errors become editor annotations and stop Run before any compile
+        diagnostics = preflight(st.session_state["selected_language"], st.session_state["code"])
         st.session_state["code"] = st_ace(
             value=st.session_state["code"],
+            annotations=diagnostics,
             language=st.session_state["selected_language"].lower() if st.session_state["selected_language"] in ["Python", "SQL"] else "c_cpp" if st.session_state["selected_language"] == "C++" else "java",
             theme="github", #theme="monokai"
             height=250,
             placeholder="Write your code here...",
             key="editor"
         )
+        if preflight(st.session_state["selected_language"], st.session_state["code"]) != diagnostics:
+            st.rerun()  # The edit changed the annotations; show them now rather than on the next interaction
+        if st.session_state["selected_language"] == "Python" and st.session_state["code"]:
+            # Cached by source hash, so this costs nothing on reruns that didn't change the code
+            analysis = analyze_python_code(st.session_state["code"])
+            if analysis["findings"]:
+                with st.expander(f"Complexity hints: {analysis['complexity']} ({len(analysis['findings'])})"):
+                    st.dataframe(pd.DataFrame(analysis["findings"]), use_container_width=True, hide_index=True)
 
     with buttons_col:
         st.session_state["selected_language"] = st.selectbox("Language", languages, index=languages.index(st.session_state["selected_language"]))
         st.session_state["custom_input"]=st.text_input("Custom Input", placeholder="Enter your test cases here...")
+        with st.expander("Input file"):
+            # Large inputs stay on disk and are streamed to the program; only the path is kept in the session
+            upload = st.file_uploader("Input file", type=["txt", "in", "csv"], key="input_upload", label_visibility="collapsed")
+            if upload is not None and st.session_state.get("input_upload_id") != upload.file_id:
+                st.session_state["input_file"] = store_input_file(upload, upload.name, session_user()).path
+                st.session_state["input_upload_id"] = upload.file_id  # Reruns don't copy the same upload again
+            stored = list_input_files(session_user())
+            if stored:
+                options = [None] + stored
+                current = st.session_state["input_file"] if st.session_state["input_file"] in stored else None
+                st.session_state["input_file"] = st.selectbox(
+                    "Use as stdin", options, index=options.index(current),
+                    format_func=lambda path: "None (use Custom Input)" if path is None else os.path.basename(path),
+                )
+            if st.session_state["input_file"] and os.path.isfile(st.session_state["input_file"]):
+                selected = StdinFile(st.session_state["input_file"])
+                st.caption(f"{selected.size:,} bytes; the first lines:")
+                st.code(preview_input_file(selected), language=None)
+        if st.session_state["selected_language"] == "Python":
+            st.session_state["count_ops"] = st.checkbox("Count operations", help="Report deterministic bytecode op, loop iteration and call counts (slower run)")
+        if st.session_state["selected_language"] != "SQL":
+            st.session_state["live_output"] = st.checkbox("Live output", help="Show output while the program runs, with a Cancel button")
+        with st.expander("Test cases"):
+            st.session_state["test_cases"] = st.text_area("Test cases", placeholder="One input per case, cases separated by a --- line", label_visibility="collapsed")
+            cases_file = st.file_uploader("Test cases file", type=["txt", "in"], label_visibility="collapsed")
+            if cases_file is not None:
+                st.session_state["test_cases"] = cases_file.read().decode("utf-8")
+            if st.button("Run tests", key="tests_button", disabled=st.session_state["selected_language"] == "SQL") and preflight_passed():
+                test_func()
+        with st.expander("Expected output"):
+            # What Submit checks the output against
+            source = st.radio("Source", ["Text", "File", "Acceptance criteria"], key="expected_source", horizontal=True)
+            if source == "Text":
+                st.text_area("Expected output", key="expected_output", label_visibility="collapsed")
+            elif source == "File":
+                st.file_uploader("Expected output file", type=["txt", "out", "ans"], key="expected_file", label_visibility="collapsed")
+            else:
+                st.caption(f"{len(samples_from_ac(st.session_state['task_ac']))} sample cases found in the ticket")
+            mode = st.selectbox("Comparison", JUDGE_MODES, index=JUDGE_MODES.index(JUDGE_DEFAULT_MODE), key="judge_mode")
+            if mode == "float":
+                st.number_input("Tolerance", value=JUDGE_FLOAT_TOLERANCE, format="%g", key="judge_tolerance")
+        with st.expander("Complexity"):
+            # Times the code at growing input sizes and fits the curve
+            st.text_area("Input generator", key="complexity_generator", height=100,
+                         placeholder="print(SIZE)\nprint(*[random.randint(1, 10**9) for _ in range(SIZE)])",
+                         help="Python that prints one input of size SIZE; `random` is imported and seeded")
+            if st.button("Estimate", key="complexity_button", disabled=st.session_state["selected_language"] == "SQL") and preflight_passed():
+                with st.spinner("Timing the code at growing input sizes..."):
+                    report = admitted("execute")(estimate_complexity)(st.session_state["selected_language"], st.session_state["code"],
+                                                                      st.session_state.get("complexity_generator", ""))
+                if report is None:
+                    pass  # Not admitted; the toast says why
+                elif report["error"]:
+                    st.session_state["complexity"] = None
+                    display_output(report["error"])
+                else:
+                    st.session_state["complexity"] = report
         # st.text_area("Output", st.session_state["output"], placeholder="Run the code to see output...")
     
     st.write("Output:")
-    if "output" in st.session_state:
+    if st.session_state.get("live_run") is not None:
+        live_run = st.session_state["live_run"]
+        st.session_state["live_run"] = None
+        # Any click stops this script run; the stream is closed and the program killed in finally
+        st.button("Cancel", key="cancel_button")
+        try:
+            st.write_stream(live_run)
+        finally:
+            live_run.cancel()
+        st.session_state["run_metrics"] = format_metrics(live_run.metrics)
+        remember_spill(live_run.metrics)
+        display_output(live_run.output)
+        if live_run.metrics.get("status") != "ok":
+            st.write(st.session_state["output"])
+    elif "output" in st.session_state:
+        if st.session_state.get("job_id"):
+            st.fragment(run_every=0.5)(job_status)()
         st.write(st.session_state["output"])
+    if st.session_state.get("run_metrics"):
+        st.caption(st.session_state["run_metrics"])
+    if st.session_state.get("output_spill"):
+        spill = st.session_state["output_spill"]
+        with st.expander(f"Full output ({spill['bytes'] / (1024 * 1024):.1f} MB)"):
+            page = st.number_input("Page", min_value=1, max_value=output_page_count(spill["bytes"]), value=1)
+            text = read_output_page(spill["path"], page - 1)  # Only this page is decompressed
+            st.code(text if text is not None else "The full output is no longer available.", language=None)
+    if st.session_state.get("profile"):
+        # st.dataframe columns are sortable by clicking the header
+        st.write("Top functions by cumulative time")
+        st.dataframe(st.session_state["profile"]["functions"], use_container_width=True, hide_index=True)
+        st.write("Top allocation sites by size")
+        st.dataframe(st.session_state["profile"]["allocations"], use_container_width=True, hide_index=True)
+    if st.session_state.get("test_results") is not None:
+        st.dataframe(st.session_state["test_results"], use_container_width=True, hide_index=True)
+    if st.session_state.get("comparison"):
+        st.write("Cross-language comparison")
+        st.dataframe(st.session_state["comparison"]["table"], use_container_width=True, hide_index=True)
+        sources = st.session_state["comparison"]["sources"]
+        for tab, language in zip(st.tabs(list(sources)), sources):
+            with tab:
+                st.code(sources[language], language="cpp" if language == "C++" else language.lower())
+    if st.session_state.get("complexity"):
+        report = st.session_state["complexity"]
+        for label, fit in (("Time", report["time"]), ("Memory", report["memory"])):
+            if fit["class"]:
+                exponent = f", grows like n^{fit['exponent']:.2f}" if fit["exponent"] is not None else ""
+                st.write(f"{label}: **{fit['class']}** (confidence {fit['confidence']:.0%}{exponent})")
+        sizes = pd.DataFrame(report["sizes"])
+        st.line_chart(sizes[sizes["status"] == "ok"], x="n", y="time_s")
+        st.dataframe(sizes, use_container_width=True, hide_index=True)
        
     with st.sidebar.expander("Ticket"):
         st.write(st.session_state['task_title'])
@@ -261,6 +592,57 @@ def first_page():
     uploaded_file = st.sidebar.file_uploader("Browse file", type=["py", "sql", "cpp", "java"], label_visibility='collapsed')
     if uploaded_file is not None:
         st.session_state["code"] = uploaded_file.read().decode("utf-8")
+
+    with st.sidebar.expander("Workspace", expanded=bool(st.session_state["workspace"])):
+        # Multi-file projects: Run builds every file, recompiling only the ones that changed
+        archive = st.file_uploader("Project zip", type=["zip"], key="workspace_zip")
+        if archive is not None and st.session_state.get("workspace_zip_name") != archive.name:
+            st.session_state["workspace_zip_name"] = archive.name
+            try:
+                files = load_workspace_zip(archive.read())
+            except Exception as e:
+                files = {}
+                st.error(f"Could not read the zip: {e}")
+            if files:
+                st.session_state["workspace"] = files
+                st.session_state["workspace_file"] = None
+                st.session_state["workspace_tree"] = next(iter(files))
+                st.session_state["selected_language"] = workspace_language(files) or st.session_state["selected_language"]
+                st.rerun()
+
+        col_name, col_add = st.columns([3, 1])
+        new_file = col_name.text_input("New file", placeholder="src/util.cpp", label_visibility="collapsed")
+        if col_add.button("Add", key="workspace_add_button") and new_file.strip():
+            # Same rules as the paths of an uploaded zip: relative, and never outside the workspace
+            new_path = _clean_path(new_file.strip())
+            if new_path is None:
+                st.error(f"Not a path inside the workspace: {new_file.strip()}")
+            else:
+                workspace = st.session_state["workspace"]
+                if not workspace:
+                    # The code already in the editor becomes the first file of the project
+                    main_file = f"main{get_file_extension(st.session_state['selected_language'])}"
+                    workspace[main_file] = st.session_state["code"]
+                    st.session_state["workspace_file"] = main_file
+                workspace.setdefault(new_path, "")
+                st.session_state["workspace_tree"] = new_path
+                st.rerun()
+
+        if st.session_state["workspace"]:
+            st.radio("Files", list(st.session_state["workspace"]), key="workspace_tree",
+                     format_func=lambda path: "\u2003" * path.count("/") + path)
+            col_remove, col_close = st.columns(2)
+            if col_remove.button("Remove file", key="workspace_remove_button"):
+                st.session_state["workspace"].pop(st.session_state["workspace_file"], None)
+                st.session_state["workspace_file"] = None
+                st.session_state.pop("workspace_tree", None)
+                st.rerun()
+            if col_close.button("Close", key="workspace_close_button"):
+                st.session_state["workspace"] = {}
+                st.session_state["workspace_file"] = None
+                st.session_state.pop("workspace_tree", None)
+                st.rerun()
+    @admitted("format")
     def format_code():
         if st.session_state["selected_language"] == "SQL":
             st.session_state["code"] = format_sql_code(st.session_state['code'])
@@ -278,11 +660,19 @@ def first_page():
         optimize_button = col2.button("Optimized")
         
     if optimize_button:
+        if st.session_state["selected_language"] == "C++":
+            # Compare -O levels on the current custom input
+            with st.spinner("Building and timing the code at each optimization level..."):
+                display_output(admitted("execute", "")(optimize_cpp_code)(st.session_state["code"], current_input()))
+            st.session_state["run_metrics"] = ""
+            st.session_state["profile"] = None
         st.toast("Success!", icon="✅")
 
     with st.sidebar.expander("Code Description"):
+        # Runs on every code change: only when an llm token is free right now, never queued behind the user's own requests
+        @admitted("llm", "", wait=False)
         def generate_description(code):
-            response = ollama.chat(model='llama3.2:1b', stream=True, messages=[
+            response = ollama.chat(model='llama3.2:1b', stream=True, keep_alive=WARMUP_KEEP_ALIVE, messages=[
                 {"role": "user", "content": f"Provide a description of the following code in short:\n{code}"}
             ])
             description = ""
@@ -290,9 +680,12 @@ def first_page():
                 token = partial_resp["message"]["content"]
                 description += token
             return description
-        # Generate code description and update in session state
-        description = generate_description(st.session_state["code"])
-        st.session_state["code_description_response"] = description
+        # Generate code description and update in session state; only when the code changed, not on every rerun
+        if st.session_state.get("described_code") != st.session_state["code"]:
+            description = generate_description(st.session_state["code"])
+            if description:  # Skipped for now otherwise; a later rerun tries again
+                st.session_state["code_description_response"] = description
+                st.session_state["described_code"] = st.session_state["code"]
         st.write(st.session_state["code_description_response"])
     st.session_state["converted_code"] = ''    
     col3, col4 = st.sidebar.columns(2)
@@ -315,6 +708,23 @@ def first_page():
                     prompt = f"Convert the following {st.session_state['selected_language']} code to sql:\n{st.session_state['code']}"
                     converted_code = run_ollama(prompt)
                     st.session_state["converted_code"] = converted_code
+                if st.button("Compare", help="Convert to the other languages and time every version on the custom input",
+                             disabled=st.session_state["selected_language"] == "SQL"):
+                    # convert runs in compare_languages' worker threads, which can't see st.session_state;
+                    # the LLM and execute admissions are taken once, here on the script thread
+                    language, code = st.session_state["selected_language"], st.session_state["code"]
+                    def convert(target):
+                        prompt = (f"Convert the following {language} code to {target} which can executable. "
+                                  f"It must read the same input from stdin and print exactly the same output:\n{code}")
+                        return ollama_cli(prompt)
+                    with st.spinner("Converting and timing every version..."):
+                        table, sources = admitted("llm", ("", {}))(admitted("execute", ("", {}))(compare_languages))(
+                            language, code, current_input(), convert)
+                    if isinstance(table, pd.DataFrame):
+                        st.session_state["comparison"] = {"table": table, "sources": sources}
+                    else:
+                        st.session_state["comparison"] = None
+                        display_output(table)
             else:
                 st.warning("Please enter some code to convert.")       
     with col4:    
@@ -329,6 +739,12 @@ def first_page():
             with st.sidebar.expander("Converted Code", expanded=True):
                 st.code(st.session_state["converted_code"], language=("Python").lower())
               
+    capacity = execution_capacity()
+    if capacity is not None:
+        st.sidebar.caption(f"Execution workers: {capacity['workers']} · {capacity['busy']}/{capacity['slots']} slots busy · "
+                           f"{capacity['queued']} queued")
+    show_warmup()
+
     with st.sidebar.popover("feedback"):
         feedback_received_2 = 0
         st.markdown("👋 Hello, Please enter your Feedback here")
@@ -354,7 +770,7 @@ def chat_page():
             st.chat_message(msg["role"], avatar="🤖").write(msg["content"])
 
     def generate_response():
-        response = ollama.chat(model='llama3.2:1b', stream=True, messages=st.session_state.messages)
+        response = ollama.chat(model='llama3.2:1b', stream=True, keep_alive=WARMUP_KEEP_ALIVE, messages=st.session_state.messages)
         for partial_resp in response:
             token = partial_resp["message"]["content"]
             st.session_state["full_message"] += token
@@ -364,12 +780,14 @@ def chat_page():
         st.session_state.messages.append({"role": "user", "content": prompt})
         st.chat_message("user", avatar="🧑‍💻").write(prompt)
         st.session_state["full_message"] = ""
-        st.chat_message("Phoenix", avatar="🤖").write_stream(generate_response)
+        # The whole streamed reply holds one LLM slot
+        admitted("llm")(st.chat_message("Phoenix", avatar="🤖").write_stream)(generate_response)
         st.session_state.messages.append({"role": "Phoenix", "content": st.session_state["full_message"]})
 
     if st.sidebar.button("Back"):
         st.session_state["current_page"] = "first"  # Change page to home
         st.rerun()  # Trigger rerun to reload the app and navigate to the home page
+    show_warmup()
 
 def gen_jira_page():
     st.title("Generate Jira Tickets")
@@ -0,0 +1,1144 @@
+import io
+import gzip
+import codecs
+import os
+import sys
+import time
+import math
+import queue
+import collections
+import atexit
+import signal
+import threading
+import pickle
+import struct
+import shutil
+import tempfile
+import subprocess
+import dis
+import cProfile
+import pstats
+import tracemalloc
+import builtins
+from config import *
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits, only the wall timeout applies there
+    resource = None
+
+
+DEFAULT_LIMITS = {
+    "wall_time": EXEC_WALL_TIMEOUT,
+    "cpu_time": EXEC_CPU_LIMIT,
+    "memory_mb": EXEC_MEMORY_LIMIT_MB,
+    "output_bytes": EXEC_OUTPUT_LIMIT,
+}
+
+# Compilers are the heaviest thing a run starts; every g++/javac call takes a slot
+compile_slots = threading.BoundedSemaphore(EXEC_MAX_COMPILES)
+
+STATUS_MESSAGES = {
+    "timeout": "Runtime Error: The program took too long to execute.",
+    "cpu_limit": "Runtime Error: CPU time limit exceeded.",
+    "memory_limit": "Runtime Error: Memory limit exceeded.",
+    "output_limit": "Runtime Error: Output limit exceeded.",
+    "cancelled": "Run cancelled.",
+}
+
+
+class StdinFile:
+    """
+    Custom input kept in a file: the program reads the file itself as stdin instead of a copy in memory.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.refresh()
+
+    def refresh(self):
+        # Re-read the file's size and time, e.g. when a queued run starts after the file was replaced
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        # Stands in for the input text in result-cache keys; changes whenever the file does
+        self.fingerprint = f"file:{self.path}:{stat.st_size}:{stat.st_mtime_ns}"
+        return self
+
+    def __str__(self):
+        return self.fingerprint
+
+    def __repr__(self):
+        return f"StdinFile({self.path!r})"
+
+    def open(self, mode="rb"):
+        if "b" in mode:
+            return open(self.path, mode)
+        return open(self.path, mode, encoding="utf-8", errors="replace")
+
+
+def resolve_limits(limits=None):
+    merged = dict(DEFAULT_LIMITS)
+    if limits:
+        merged.update({key: value for key, value in limits.items() if value is not None})
+    return merged
+
+
+def format_metrics(result):
+    # Short one-line summary of what a run cost, for the Output panel
+    parts = []
+    if result.get("wall_time") is not None:
+        parts.append(f"wall {result['wall_time']:.3f}s")
+    if result.get("cpu_time") is not None:
+        parts.append(f"CPU {result['cpu_time']:.3f}s")
+    if result.get("peak_rss_kb"):
+        parts.append(f"peak RSS {result['peak_rss_kb'] / 1024:.1f} MB")
+    if result.get("ops") is not None:
+        parts.append(f"{result['ops']:,} ops · {result['loop_iterations']:,} loop iterations · "
+                     f"{result['function_calls']:,} calls · {result['builtin_calls']:,} builtin calls")
+    if result.get("build_cached"):
+        parts.append("compile skipped (cached build)")
+    elif result.get("compile_time"):
+        parts.append(f"compile {result['compile_time']:.2f}s")
+    if result.get("units"):
+        parts.append(f"rebuilt {result['compiled_units']}/{result['units']} files")
+    if result.get("cached"):
+        parts.append("cached result")
+    return " · ".join(parts)
+
+
+def _preload_modules(modules):
+    # Import the common modules once so every submission starts warm
+    for name in modules:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+
+class OutputLimitExceeded(BaseException):
+    # BaseException so a bare `except Exception` in user code can't swallow it
+    pass
+
+
+def capture_text(head, tail, size):
+    # What the Output panel shows of a captured stream: all of it, or its head and tail
+    head, tail = bytes(head), bytes(tail)
+    omitted = size - len(head) - len(tail)
+    if omitted <= 0:
+        return (head + tail).decode(errors="replace")
+    return (f"{head.decode(errors='replace')}\n... {omitted:,} bytes omitted ...\n"
+            f"{tail.decode(errors='replace')}")
+
+
+def _prune_spills(directory, max_age):
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class BoundedCapture:
+    """
+    Keeps the first head_bytes and last tail_bytes of a stream in memory. Once the stream
+    outgrows them, all of it is also written to a gzip spill file that can be paged later.
+    """
+
+    def __init__(self, head_bytes=CAPTURE_HEAD_BYTES, tail_bytes=CAPTURE_TAIL_BYTES, spill=True):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = collections.deque()
+        self.tail_size = 0
+        self.size = 0  # Bytes written so far, including the still-buffered ones
+        self._stored = 0
+        self._buffer = bytearray()  # Small writes are batched; print() alone is two writes per line
+        self.spill_enabled = spill
+        self.spill = None
+        self.spill_path = None
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        if len(self._buffer) >= 65536:
+            self._flush()
+
+    def _flush(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        if not data:
+            return
+        # Nothing has been dropped yet while the stream still fits in head + tail
+        if self.spill is None and self.spill_enabled and self._stored + len(data) > self.head_bytes + self.tail_bytes:
+            self._start_spill()
+        if self.spill is not None:
+            self.spill.write(data)
+        self._stored += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail.append(bytes(data))
+            self.tail_size += len(data)
+        while self.tail_size > self.tail_bytes:
+            excess = self.tail_size - self.tail_bytes
+            if len(self.tail[0]) <= excess:
+                self.tail_size -= len(self.tail.popleft())
+            else:
+                self.tail[0] = self.tail[0][excess:]
+                self.tail_size -= excess
+
+    def _start_spill(self):
+        try:
+            os.makedirs(CAPTURE_SPILL_DIR, exist_ok=True)
+            _prune_spills(CAPTURE_SPILL_DIR, CAPTURE_SPILL_MAX_AGE)
+            fd, self.spill_path = tempfile.mkstemp(suffix=".gz", dir=CAPTURE_SPILL_DIR)
+            self.spill = gzip.GzipFile(fileobj=os.fdopen(fd, "wb"), mode="wb", compresslevel=1)
+        except OSError:
+            self.spill_enabled, self.spill_path = False, None
+            return
+        self.spill.write(bytes(self.head))
+        for chunk in self.tail:
+            self.spill.write(chunk)
+
+    def text(self):
+        self._flush()
+        return capture_text(self.head, b"".join(self.tail), self.size)
+
+    def close(self):
+        # Returns the spill file's path, or None when everything fit in memory
+        self._flush()
+        if self.spill is not None:
+            fileobj = self.spill.fileobj
+            self.spill.close()
+            fileobj.close()
+            self.spill = None
+        return self.spill_path
+
+
+def output_page_count(size, page_bytes=CAPTURE_PAGE_BYTES):
+    return max(1, -(-(size or 0) // page_bytes))
+
+
+def read_output_page(path, page, page_bytes=CAPTURE_PAGE_BYTES):
+    # Decompresses only up to the requested page; None once the spill file has been pruned
+    try:
+        with gzip.open(path, "rb") as f:
+            f.seek(page * page_bytes)
+            return f.read(page_bytes).decode(errors="replace")
+    except (OSError, EOFError):
+        return None
+
+
+def read_full_output(path):
+    # The whole spilled stream, e.g. a generated test input; None once the spill file has been pruned
+    try:
+        with gzip.open(path, "rb") as f:
+            return f.read().decode(errors="replace")
+    except (OSError, EOFError):
+        return None
+
+
+class _BoundedWriter(io.TextIOBase):
+    # sys.stdout for a submission: bounded capture in memory, OutputLimitExceeded past the limit.
+    # Text is encoded in batches, so the limit can be overshot by one batch before it trips
+    def __init__(self, limit, spill=True):
+        super().__init__()
+        self.limit = limit
+        self.capture = BoundedCapture(spill=spill)
+        self._pending = []
+        self._pending_chars = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= 16384:
+            self._encode_pending()
+        return len(text)
+
+    def _encode_pending(self):
+        data = "".join(self._pending).encode(errors="replace")
+        self._pending, self._pending_chars = [], 0
+        if self.capture.size + len(data) > self.limit:
+            self.capture.write(data[:max(0, self.limit - self.capture.size)])
+            raise OutputLimitExceeded()
+        self.capture.write(data)
+
+    def getvalue(self):
+        try:
+            self._encode_pending()
+        except OutputLimitExceeded:
+            pass  # Already truncated at the limit
+        return self.capture.text()
+
+
+class _StreamingWriter(_BoundedWriter):
+    # Also forwards what is printed to on_output, batched at most every `interval` seconds
+    # so a tight print loop isn't one message per line
+    def __init__(self, limit, on_output, interval=0.05):
+        super().__init__(limit)
+        self.on_output = on_output
+        self.interval = interval
+        self._unsent = collections.deque()  # Appended by the submission, drained by the flusher thread
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def write(self, text):
+        written = super().write(text)
+        self._unsent.append(text)
+        return written
+
+    def flush(self):
+        with self._lock:
+            chunks = []
+            while self._unsent:
+                chunks.append(self._unsent.popleft())
+            if chunks:
+                self.on_output("".join(chunks))
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def close_stream(self):
+        self._stopped.set()
+        self._flusher.join()
+        self.flush()
+
+
+def _vm_size_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _reset_peak_rss():
+    # Linux lets a process reset its own high-water mark, giving per-run peak RSS
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _apply_worker_limits(limits):
+    # Only soft limits are lowered so the next job can raise them again
+    if resource is None:
+        return
+    if limits.get("cpu_time"):
+        used = time.process_time()
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(math.ceil(used + limits["cpu_time"]))
+        if hard == resource.RLIM_INFINITY or soft <= hard:
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    vm_size = _vm_size_bytes()
+    if limits.get("memory_mb") and vm_size:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = vm_size + limits["memory_mb"] * 1024 * 1024
+        if hard == resource.RLIM_INFINITY or soft <= hard:
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _profile_tables(profiler, snapshot, top_n):
+    stats = pstats.Stats(profiler)
+    functions = []
+    for (filename, lineno, name), (_, calls, total, cumulative, callers) in stats.stats.items():
+        if filename == __file__ or filename == "~" and name in PROFILE_HIDDEN_BUILTINS:
+            continue  # The sandbox's own bookkeeping, as in the allocation table below
+        # Calls made from sandbox frames (e.g. len() in the stdout writer) don't count either
+        own = [cost for caller, cost in callers.items() if caller[0] == __file__]
+        if own:
+            calls -= sum(cost[0] for cost in own)  # (calls, primitive calls, total, cumulative)
+            total -= sum(cost[2] for cost in own)
+            cumulative -= sum(cost[3] for cost in own)
+            if calls <= 0:
+                continue
+        if filename == "~":  # Built-ins like exec() and len()
+            location = name
+        else:
+            location = f"{name} ({os.path.basename(filename)}:{lineno})"
+        functions.append({
+            "function": location,
+            "calls": calls,
+            "total_time": total,
+            "cumulative_time": cumulative,
+            "per_call": cumulative / calls if calls else 0.0,
+        })
+    functions.sort(key=lambda row: row["cumulative_time"], reverse=True)
+    if snapshot is None:
+        return functions[:top_n], []
+
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),  # The sandbox's own bookkeeping
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ])
+    allocations = []
+    for stat in snapshot.statistics("lineno")[:top_n]:
+        frame = stat.traceback[0]
+        allocations.append({
+            "location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            "size_kb": stat.size / 1024,
+            "count": stat.count,
+        })
+    return functions[:top_n], allocations
+
+
+# Calls the sandbox itself makes around the submission
+PROFILE_HIDDEN_BUILTINS = {"<built-in method builtins.exec>", "<method 'disable' of '_lsprof.Profiler' objects>"}
+
+
+class _OperationCounter:
+    """
+    Counts bytecode ops, loop iterations and calls executed by the submission itself.
+    """
+
+    def __init__(self, filename="<submission>"):
+        self.filename = filename
+        self.counts = {"ops": 0, "loop_iterations": 0, "function_calls": 0, "builtin_calls": 0}
+        self._instructions = {}
+        self._last_offset = {}
+
+    def _instruction_map(self, code):
+        instructions = self._instructions.get(code)
+        if instructions is None:
+            instructions = {ins.offset: (ins.opname, ins.arg) for ins in dis.get_instructions(code)}
+            self._instructions[code] = instructions
+        return instructions
+
+    def _is_fresh_call(self, frame):
+        # Generator resumptions also raise 'call'; only a frame's first entry counts
+        if frame.f_lasti < 0:
+            return True
+        opname, arg = self._instruction_map(frame.f_code).get(frame.f_lasti, (None, None))
+        return opname == "RESUME" and arg == 0
+
+    def trace(self, frame, event, arg):
+        if frame.f_code.co_filename != self.filename:
+            return None
+        if event == "call":
+            if self._is_fresh_call(frame):
+                self.counts["function_calls"] += 1
+            frame.f_trace_opcodes = True
+            frame.f_trace_lines = False
+            self._last_offset[id(frame)] = -1
+            return self._trace_frame
+        return None
+
+    def _trace_frame(self, frame, event, arg):
+        if event == "opcode":
+            self.counts["ops"] += 1
+            key = id(frame)
+            # A backward jump between two consecutive ops is one more loop iteration
+            if frame.f_lasti < self._last_offset.get(key, -1):
+                self.counts["loop_iterations"] += 1
+            self._last_offset[key] = frame.f_lasti
+        elif event == "return":
+            self._last_offset.pop(id(frame), None)
+        return self._trace_frame
+
+    def profile(self, frame, event, arg):
+        if event == "c_call" and frame.f_code.co_filename == self.filename:
+            self.counts["builtin_calls"] += 1
+
+    def start(self):
+        sys.settrace(self.trace)
+        sys.setprofile(self.profile)
+
+    def stop(self):
+        sys.settrace(None)
+        sys.setprofile(None)
+
+
+def _open_stdin(stdin):
+    """
+    Put the custom input on file descriptor 0 and return a text sys.stdin over it, so input(),
+    sys.stdin.buffer, open(0) and os.read(0, ...) all read the same input, as in a real process.
+    """
+    if isinstance(stdin, StdinFile):
+        source = stdin.open("rb")
+    else:
+        source = tempfile.TemporaryFile()
+        source.write((stdin or "").encode())
+        source.seek(0)
+    os.dup2(source.fileno(), 0)
+    source.close()
+    return open(0, "r", encoding="utf-8", errors="replace", closefd=False)
+
+
+def _close_stdin(stream):
+    # fd 0 goes back to /dev/null until the next job
+    stream.close()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+
+def _snapshot_interpreter():
+    # Process-wide state a submission can change with plain Python
+    return {
+        "builtins": dict(builtins.__dict__),
+        "modules": dict(sys.modules),
+        "path": list(sys.path),
+        "recursion_limit": sys.getrecursionlimit(),
+        "switch_interval": sys.getswitchinterval(),
+        "int_max_str_digits": sys.get_int_max_str_digits() if hasattr(sys, "get_int_max_str_digits") else None,
+        "environ": dict(os.environ),
+        "cwd": os.getcwd(),
+    }
+
+
+def _restore_interpreter(state):
+    # Undoes what _snapshot_interpreter saw change; attributes patched on a shared module are only undone
+    # by running the job in a forked child, which is how workers run jobs wherever fork exists
+    sys.settrace(None)
+    sys.setprofile(None)
+    builtins.__dict__.clear()
+    builtins.__dict__.update(state["builtins"])
+    for name in set(sys.modules) - set(state["modules"]):
+        del sys.modules[name]
+    sys.modules.update(state["modules"])
+    sys.path[:] = state["path"]
+    sys.setrecursionlimit(state["recursion_limit"])
+    sys.setswitchinterval(state["switch_interval"])
+    if state["int_max_str_digits"] is not None:
+        sys.set_int_max_str_digits(state["int_max_str_digits"])
+    os.environ.clear()
+    os.environ.update(state["environ"])
+    try:
+        os.chdir(state["cwd"])
+    except OSError:
+        pass
+
+
+def _execute_python(code, stdin="", limits=None, mode="run", top_n=PROFILE_TOP_N, on_output=None):
+    # Runs inside a worker process, so swapping sys.stdout only affects this submission
+    limits = resolve_limits(limits)
+    interpreter = _snapshot_interpreter()
+    if on_output is not None:
+        stdout = _StreamingWriter(limits["output_bytes"], on_output)
+    else:
+        stdout = _BoundedWriter(limits["output_bytes"])
+    stderr = _BoundedWriter(limits["output_bytes"], spill=False)
+    # An input file is read straight from disk; text input goes through a temporary file
+    sys.stdin = _open_stdin(stdin)
+    sys.stdout, sys.stderr = stdout, stderr
+    exec_globals = {"__name__": "__main__"}
+    error = None
+    status = "ok"
+    _reset_peak_rss()
+    _apply_worker_limits(limits)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    profiler = counter = snapshot = None
+    try:
+        compiled = compile(code, "<submission>", "exec")
+        if mode == "profile":
+            profiler = cProfile.Profile()
+            tracemalloc.start()
+            profiler.enable()
+        elif mode == "opcount":
+            counter = _OperationCounter()
+            counter.start()
+        try:
+            exec(compiled, exec_globals)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                # Taken before the restore below, whose environment copy would otherwise top the allocations
+                try:
+                    snapshot = tracemalloc.take_snapshot()
+                except BaseException:
+                    pass  # The submission broke something take_snapshot needs; the table stays empty
+                tracemalloc.stop()
+            if counter is not None:
+                counter.stop()
+            _restore_interpreter(interpreter)  # Before anything below relies on builtins again
+        stdout._encode_pending()  # A last batch over the limit still counts as output_limit
+    except SystemExit:
+        pass
+    except OutputLimitExceeded:
+        status = "output_limit"
+    except MemoryError:
+        status = "memory_limit"
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+        status = "runtime_error"
+    finally:
+        _close_stdin(sys.stdin)
+        sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+        if on_output is not None:
+            stdout.close_stream()  # The last chunk goes out before the result
+    result = {
+        "stdout": stdout.getvalue(),
+        "stdout_bytes": stdout.capture.size,
+        "stdout_spill": stdout.capture.close(),
+        "stderr": stderr.getvalue(),
+        "error": error,
+        "status": status,
+        "wall_time": time.perf_counter() - started,
+        "cpu_time": time.process_time() - cpu_started,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+    if profiler is not None:
+        result["functions"], result["allocations"] = _profile_tables(profiler, snapshot, top_n)
+    if counter is not None:
+        result.update(counter.counts)
+    return result
+
+
+def _execute_sql(code, limits=None):
+    # SQL runs in the sandbox too, so it gets the same limits and metrics as Python
+    import sqlite3
+    import sqlparse
+
+    limits = resolve_limits(limits)
+    _reset_peak_rss()
+    _apply_worker_limits(limits)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    deadline = started + limits["wall_time"]
+    columns, rows, error, status = [], [], None, "ok"
+    connection = sqlite3.connect(":memory:")  # Create an in-memory database
+    # Abort long-running statements from inside SQLite's VM
+    connection.set_progress_handler(lambda: int(time.perf_counter() > deadline), 10000)
+    try:
+        cursor = connection.cursor()
+        for statement in sqlparse.split(code):
+            statement = statement.strip()  # Clean up whitespace
+            if not statement:  # Skip empty statements
+                continue
+            cursor.execute(statement)
+            connection.commit()  # Commit changes if it's an INSERT/UPDATE/DELETE
+            if statement.lower().startswith("select"):
+                columns = [desc[0] for desc in cursor.description]  # Extract column names
+                rows, size = [], 0
+                for row in cursor:
+                    size += len(repr(row))
+                    if size > min(limits["output_bytes"], SQL_RESULT_MAX_BYTES):
+                        status = "output_limit"
+                        break
+                    rows.append(row)
+    except sqlite3.OperationalError as e:
+        status = "timeout" if time.perf_counter() > deadline else "runtime_error"
+        error = str(e)
+    except MemoryError:
+        status = "memory_limit"
+    except Exception as e:
+        status = "runtime_error"
+        error = str(e)
+    finally:
+        connection.close()  # Ensure the connection is closed
+    return {
+        "columns": columns,
+        "rows": rows,
+        "error": error,
+        "status": status,
+        "wall_time": time.perf_counter() - started,
+        "cpu_time": time.process_time() - cpu_started,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _send(stream, message):
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(struct.pack("!I", len(payload)) + payload)  # One write, so a frame is never left half-sent
+    stream.flush()
+
+
+def _recv(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        raise EOFError("sandbox channel closed")
+    (size,) = struct.unpack("!I", header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError("sandbox channel closed")
+    return pickle.loads(payload)
+
+
+def _run_job(job, channel_out):
+    if job.get("kind") == "sql":
+        return _execute_sql(job["code"], job.get("limits"))
+    # Streaming jobs send {"chunk": text} messages ahead of the result
+    on_output = (lambda text: _send(channel_out, {"chunk": text})) if job.get("stream") else None
+    stdin = StdinFile(job["stdin_path"]) if job.get("stdin_path") else job.get("stdin", "")
+    return _execute_python(job["code"], stdin, job.get("limits"), job.get("mode", "run"), on_output=on_output)
+
+
+def _fork_job(job, channel_out):
+    """
+    Run one job in a child forked from this warm worker: the child starts with every preloaded module
+    imported, and whatever the submission changes (patched modules, builtins, sys settings) dies with it.
+    """
+    read_fd, write_fd = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            os.close(read_fd)
+            with os.fdopen(write_fd, "wb") as messages:
+                _send(messages, _run_job(job, messages))
+            exit_code = 0
+        finally:
+            os._exit(exit_code)
+
+    os.close(write_fd)
+    result = None
+    # The child's messages are relayed, so a child dying mid-message can't corrupt the job channel
+    with os.fdopen(read_fd, "rb") as messages:
+        while True:
+            try:
+                message = _recv(messages)
+            except (EOFError, pickle.UnpicklingError):
+                break
+            if "chunk" in message:
+                _send(channel_out, message)
+            else:
+                result = message
+    _, status, _ = os.wait4(pid, 0)
+    if result is not None:
+        return result
+    returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - started  # The child's own measurement died with it
+    if resource is not None and -returncode in (signal.SIGXCPU, signal.SIGKILL):
+        return _failure("cpu_limit", None, elapsed)
+    return _failure("runtime_error", f"The program exited before finishing (exit status {returncode}).", elapsed)
+
+
+def _worker_main(preload):
+    # Keep the real stdin/stdout for the job channel and point fds 0/1 elsewhere,
+    # so code writing straight to the file descriptors can't corrupt the protocol
+    channel_in = os.fdopen(os.dup(0), "rb")
+    channel_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+    _preload_modules(preload)
+    while True:
+        try:
+            job = _recv(channel_in)
+        except EOFError:
+            break
+        if job is None:  # Shutdown request from the pool
+            break
+        if hasattr(os, "fork"):
+            result = _fork_job(job, channel_out)
+        else:
+            result = _run_job(job, channel_out)  # No fork (Windows): only _restore_interpreter isolates jobs
+        _send(channel_out, result)
+
+
+class SandboxWorker:
+    def __init__(self, preload):
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", os.path.abspath(__file__), "--worker", ",".join(preload)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=tempfile.gettempdir(),
+            # Fixed hash seed so set/dict iteration order, and with it the op counts, is reproducible
+            env=dict(os.environ, PYTHONHASHSEED="0"),
+            # Its own process group, so a kill also reaches the child running the current job
+            start_new_session=hasattr(os, "killpg"),
+        )
+        self.runs = 0
+        self.started = time.monotonic()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def send(self, message):
+        _send(self.process.stdin, message)
+
+    def recv(self):
+        return _recv(self.process.stdout)
+
+    def stop(self):
+        try:
+            self.send(None)
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+    def kill(self):
+        if hasattr(os, "killpg") and self.process.returncode is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        elif self.is_alive():
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def _join(thread, timeout, cancel=None):
+    # Wait for a thread; returns None when it finished, otherwise "timeout" or "cancelled"
+    if cancel is None:
+        thread.join(timeout)
+    else:
+        deadline = time.monotonic() + timeout
+        while thread.is_alive() and not cancel.is_set() and time.monotonic() < deadline:
+            thread.join(min(0.05, max(0, deadline - time.monotonic())))
+    if not thread.is_alive():
+        return None
+    return "cancelled" if cancel is not None and cancel.is_set() else "timeout"
+
+
+def _failure(status, error, wall_time=None):
+    return {"stdout": "", "stderr": "", "columns": [], "rows": [], "error": error,
+            "status": status, "wall_time": wall_time, "cpu_time": None, "peak_rss_kb": None}
+
+
+class SandboxPool:
+    def __init__(self, size=SANDBOX_POOL_SIZE, max_runs=SANDBOX_MAX_RUNS_PER_WORKER,
+                 max_age=SANDBOX_MAX_WORKER_AGE, preload=SANDBOX_PRELOAD_MODULES):
+        self.size = size
+        self.max_runs = max_runs
+        self.max_age = max_age
+        self.preload = preload
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._closed = False
+
+    def start(self):
+        # Pre-fork the whole pool so the first runs don't pay interpreter startup
+        with self._lock:
+            while self._workers < self.size:
+                self._idle.put(SandboxWorker(self.preload))
+                self._workers += 1
+
+    def _acquire(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._workers < self.size:
+                        self._workers += 1
+                        return SandboxWorker(self.preload)
+                worker = self._idle.get()
+            if worker.is_alive() and time.monotonic() - worker.started < self.max_age:
+                return worker
+            self._retire(worker)
+
+    def _retire(self, worker):
+        worker.stop()
+        with self._lock:
+            self._workers -= 1
+
+    def _release(self, worker, healthy=True):
+        worker.runs += 1
+        if not healthy:
+            worker.kill()
+            with self._lock:
+                self._workers -= 1
+        elif worker.runs >= self.max_runs or self._closed:
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+            return
+        # Replace the recycled worker right away so the pool stays warm
+        if not self._closed:
+            with self._lock:
+                if self._workers < self.size:
+                    self._workers += 1
+                    self._idle.put(SandboxWorker(self.preload))
+
+    def submit(self, job, on_output=None, cancel=None):
+        """
+        Run a job on an idle worker; on_output receives stdout chunks as they are printed
+        and setting the cancel event kills the run.
+        """
+        limits = resolve_limits(job.get("limits"))
+        job = dict(job, limits=limits, stream=on_output is not None)
+        worker = self._acquire()
+        healthy = True
+        box = {}
+
+        def receive():
+            try:
+                while True:
+                    message = worker.recv()
+                    if "chunk" in message:
+                        on_output(message["chunk"])
+                        continue
+                    box["result"] = message
+                    break
+            except (EOFError, OSError):
+                pass
+
+        started = time.perf_counter()
+        try:
+            worker.send(job)
+            reader = threading.Thread(target=receive, daemon=True)
+            reader.start()
+            stopped = _join(reader, limits["wall_time"], cancel)
+            if stopped:
+                # Wall timeout or cancel: the worker is killed and replaced
+                healthy = False
+                worker.kill()
+                reader.join()
+                return _failure(stopped, None, time.perf_counter() - started)
+            if "result" not in box:
+                healthy = False
+                returncode = worker.process.wait()
+                if resource is not None and -returncode in (signal.SIGXCPU, signal.SIGKILL):
+                    return _failure("cpu_limit", None, time.perf_counter() - started)
+                return _failure("internal_error", "The sandbox worker exited unexpectedly.",
+                                time.perf_counter() - started)
+            return box["result"]
+        except (BrokenPipeError, OSError):
+            healthy = False
+            return _failure("internal_error", "The sandbox worker exited unexpectedly.", time.perf_counter() - started)
+        finally:
+            self._release(worker, healthy)
+
+    def run(self, code, stdin="", limits=None, mode="run", on_output=None, cancel=None):
+        job = {"kind": "python", "code": code, "stdin": stdin, "limits": limits, "mode": mode}
+        if isinstance(stdin, StdinFile):
+            # Only the path crosses the pipe; the worker opens the file itself
+            job.update(stdin="", stdin_path=stdin.path)
+        return self.submit(job, on_output=on_output, cancel=cancel)
+
+    def run_sql(self, code, limits=None):
+        return self.submit({"kind": "sql", "code": code, "limits": limits})
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # One pool per server process, shared by every Streamlit session
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            _pool.start()
+            atexit.register(_pool.shutdown)
+    return _pool
+
+
+# util-linux's prlimit sets the limits on itself and execs the program
+_PRLIMIT = shutil.which("prlimit")
+
+# The same in Python, where there is no prlimit binary (e.g. macOS)
+_LIMIT_WRAPPER = (
+    "import os, sys, resource\n"
+    "cpu, memory = int(sys.argv[1]), int(sys.argv[2])\n"
+    "if cpu: resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))\n"
+    "if memory: resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "os.execvp(sys.argv[3], sys.argv[3:])\n"
+)
+
+
+def _rlimits(limits, limit_memory):
+    cpu = int(math.ceil(limits["cpu_time"])) if limits.get("cpu_time") else 0
+    memory = limits["memory_mb"] * 1024 * 1024 if limit_memory and limits.get("memory_mb") else 0
+    return cpu, memory
+
+
+def _limited(cmd, cpu, memory):
+    # The limits are in place before the program execs, so it never runs a moment without them;
+    # set by a wrapper process because a preexec_fn can deadlock a threaded server
+    if not (cpu or memory):
+        return cmd
+    if _PRLIMIT:
+        return [_PRLIMIT, *([f"--cpu={cpu}:{cpu + 1}"] if cpu else []),
+                *([f"--as={memory}:{memory}"] if memory else []), "--", *cmd]
+    return [sys.executable, "-c", _LIMIT_WRAPPER, str(cpu), str(memory), *cmd]
+
+
+def _feed(stream, data):
+    try:
+        if data:
+            stream.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def _drain(stream, capture, limit, on_overflow, on_output=None):
+    # Incremental so a UTF-8 character split across two reads still decodes
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace") if on_output else None
+    while True:
+        chunk = stream.read1(65536)
+        if not chunk:
+            break
+        room = limit - capture.size
+        if room > 0:
+            capture.write(chunk[:room])
+            if decoder is not None:
+                on_output(decoder.decode(chunk[:room]))
+        if len(chunk) > room:
+            on_overflow()
+            break
+    stream.close()
+
+
+def _kill(process):
+    # os.kill instead of Popen.kill so Popen doesn't try to reap the child itself
+    try:
+        os.kill(process.pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+    except OSError:
+        pass
+
+
+def _wait(process, timeout, cancel=None):
+    # Returns (returncode, rusage, stopped); rusage gives per-child CPU time and peak RSS,
+    # stopped is None, "timeout" or "cancelled"
+    if not hasattr(os, "wait4"):
+        waiter = threading.Thread(target=process.wait, daemon=True)
+        waiter.start()
+        stopped = _join(waiter, timeout, cancel)
+        if stopped:
+            process.kill()
+        return process.wait(), None, stopped
+
+    box = {}
+
+    def reap():
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+            box["returncode"] = os.waitstatus_to_exitcode(status)
+            box["usage"] = usage
+        except ChildProcessError:
+            box["returncode"] = process.poll()
+
+    reaper = threading.Thread(target=reap, daemon=True)
+    reaper.start()
+    stopped = _join(reaper, timeout, cancel)
+    if stopped:
+        _kill(process)
+        reaper.join()
+    process.returncode = box["returncode"]
+    return box["returncode"], box.get("usage"), stopped
+
+
+def run_process(cmd, stdin="", cwd=None, limits=None, limit_memory=True, on_output=None, cancel=None):
+    """
+    Run a compiled program with wall/CPU/memory/output limits and measure its cost.
+    on_output receives decoded stdout as it arrives; setting the cancel event kills the program.
+    """
+    limits = resolve_limits(limits)
+    cpu, memory = _rlimits(limits, limit_memory) if resource is not None else (0, 0)
+    cmd = _limited(cmd, cpu, memory)
+    started = time.perf_counter()
+    # An input file becomes the child's stdin descriptor, so nothing is copied through this process
+    stdin_file = stdin.open("rb") if isinstance(stdin, StdinFile) else None
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdin=stdin_file or subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=cwd,
+        )
+    except OSError as e:
+        return dict(_failure("internal_error", str(e)), returncode=None)
+    finally:
+        if stdin_file is not None:
+            stdin_file.close()  # The child holds its own copy of the descriptor
+
+    overflow = threading.Event()
+
+    def on_overflow():
+        overflow.set()
+        _kill(process)
+
+    # Memory per run stays at head + tail however much the program prints
+    stdout, stderr = BoundedCapture(), BoundedCapture(spill=False)
+    threads = [
+        threading.Thread(target=_drain, args=(process.stdout, stdout, limits["output_bytes"], on_overflow, on_output),
+                         daemon=True),
+        threading.Thread(target=_drain, args=(process.stderr, stderr, limits["output_bytes"], on_overflow), daemon=True),
+    ]
+    if stdin_file is None:
+        threads.append(threading.Thread(target=_feed, args=(process.stdin, (stdin or "").encode()), daemon=True))
+    for thread in threads:
+        thread.start()
+    returncode, usage, stopped = _wait(process, limits["wall_time"], cancel)
+    for thread in threads:
+        thread.join()
+
+    result = {
+        "stdout": stdout.text(),
+        "stdout_bytes": stdout.size,
+        "stdout_spill": stdout.close(),
+        "stderr": stderr.text(),
+        "returncode": returncode,
+        "error": None,
+        "wall_time": time.perf_counter() - started,
+        "cpu_time": usage.ru_utime + usage.ru_stime if usage else None,
+        "peak_rss_kb": (usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss) if usage else None,
+    }
+    if stopped:
+        result["status"] = stopped
+    elif overflow.is_set():
+        result["status"] = "output_limit"
+    elif returncode == 0:
+        result["status"] = "ok"
+    elif resource is not None and -returncode in (signal.SIGXCPU, signal.SIGKILL) \
+            and result["cpu_time"] is not None and result["cpu_time"] >= limits["cpu_time"] - 0.05:
+        result["status"] = "cpu_limit"
+    elif any(marker in result["stderr"] for marker in ("bad_alloc", "MemoryError", "OutOfMemoryError")):
+        result["status"] = "memory_limit"
+    else:
+        result["status"] = "runtime_error"
+    return result
+
+
+if __name__ == "__main__" and len(sys.argv) >= 2 and sys.argv[1] == "--worker":
+    _worker_main([name for name in sys.argv[2].split(",") if name] if len(sys.argv) > 2 else [])
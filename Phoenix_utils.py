@@ -1,8 +1,5 @@
-import io
-import sys
 import subprocess
 import ast
-import textwrap
 import re
 import sqlparse
 import sqlite3
@@ -12,7 +9,21 @@ import os
 import tempfile
 import snowflake.connector
 from config import *
+from Phoenix_sandbox import get_pool, run_process, compile_slots, read_full_output, StdinFile, STATUS_MESSAGES
+from Phoenix_cache import cached_run
+from Phoenix_cpp import compile_cpp, compile_cpp_project, checkout_binary
+from Phoenix_java import get_java_server, compile_java_project
+from Phoenix_workspace import java_types, detect_java_main
+from Phoenix_judge import judge_output, output_lines, text_lines, file_lines
+from Phoenix_complexity import fit_complexity
+from Phoenix_broker import get_broker
 import pandas as pd
+import queue
+import threading
+import statistics
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 
 
@@ -60,42 +71,78 @@ def fetch_jira_data(j_status):
     cursor.close()
     return pd.DataFrame(rows, columns=columns)
     
-def replace_inputs(code, inputs):
-    # Extract variable names and optional cast types for input statements in code
-    input_vars = extract_inputs(code)
-    input_values = [val.strip() for val in inputs.split(",")]
-
-    if len(input_vars) != len(input_values):
-        raise ValueError("Number of input variables does not match the number of provided values.")
-
-    # Replace each input() in the code with the corresponding custom input value
-    for (var, cast_type), val in zip(input_vars, input_values):
-        # Determine the converted value based on the cast type
+def format_custom_input(custom_input):
+    # Custom input is either comma separated values or already one value per line; an input file is used as is
+    if not custom_input:
+        return ""
+    if isinstance(custom_input, StdinFile):
+        return custom_input
+    if "\n" in custom_input:
+        return custom_input if custom_input.endswith("\n") else custom_input + "\n"
+    return "\n".join(val.strip() for val in custom_input.split(",")) + "\n"
+
+
+def _input_dir(owner):
+    # One directory per session, so users neither see nor overwrite each other's uploads
+    return os.path.join(INPUT_FILES_DIR, re.sub(r"[^\w-]", "_", str(owner)))
+
+
+def prune_input_files(max_age=INPUT_FILE_MAX_AGE):
+    # Uploads older than max_age, then the session directories they leave empty
+    cutoff = time.time() - max_age
+    for root, _, names in os.walk(INPUT_FILES_DIR, topdown=False):
         try:
-            if cast_type == "int":
-                converted_val = int(val)
-            elif cast_type == "float":
-                converted_val = float(val)
-            else:
-                converted_val = val  # Default to string if no cast is specified
-        except ValueError:
-            return f"Error: could not convert {val} to {cast_type}"
-
-        # If cast_type is present (like int or float), match with the cast; otherwise, match plain input()
-        if cast_type:
-            pattern = rf"{re.escape(var)}\s*=\s*{re.escape(cast_type)}\s*\(\s*input\(\s*.*?\)\s*\)"
-        else:
-            pattern = rf"{re.escape(var)}\s*=\s*input\(\s*.*?\)"
-
-        # Replace matched input with converted value
-        code = re.sub(pattern, f"{var} = {repr(converted_val)}", code)
-
-    return code
-
-# Example of the extract_inputs function
-def extract_inputs(code):
-    # This captures variable names and optional cast types with input()
-    return re.findall(r"(\w+)\s*=\s*(\w*)\s*\(?\s*input\(", code)
+            idle = os.stat(root).st_mtime < cutoff  # Before the removals below touch it
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+        if idle and root != INPUT_FILES_DIR:
+            try:
+                os.rmdir(root)  # Fails unless it is empty
+            except OSError:
+                pass
+
+
+def store_input_file(fileobj, name, owner):
+    """
+    Copy an uploaded input file to owner's directory under INPUT_FILES_DIR in chunks and return it
+    as a StdinFile for the runners.
+    """
+    prune_input_files()
+    directory = _input_dir(owner)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(name) or "input.txt")
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    fileobj.seek(0)
+    with open(partial, "wb") as out:
+        while True:
+            chunk = fileobj.read(INPUT_FILE_CHUNK_BYTES)
+            if not chunk:
+                break
+            out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    # Runs reading the old file keep their descriptor; new runs see the whole new file
+    os.replace(partial, path)
+    return StdinFile(path)
+
+
+def list_input_files(owner):
+    # The owner's input files still on the server, newest first
+    directory = _input_dir(owner)
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if not name.endswith(".part")]
+    return sorted((path for path in paths if os.path.isfile(path)), key=os.path.getmtime, reverse=True)
+
+
+def preview_input_file(stdin_file, limit=INPUT_FILE_PREVIEW_BYTES):
+    with stdin_file.open("rb") as f:
+        return f.read(limit).decode("utf-8", errors="replace")
 
 
 class CodeOptimizer(ast.NodeTransformer):
@@ -128,24 +175,50 @@ def optimize_code(source_code):
     
     return optimized_code
 
-def run_python_code(code, custom_inputs):
-    if extract_inputs(code) and custom_inputs:
-        try:
-            code = replace_inputs(code, custom_inputs)  # Replace inputs with custom values
-        except ValueError as ve:
-            return f"Error: {ve}"
-
-    output = io.StringIO()
-    sys.stdout = output
-    exec_globals = {}
-    try:
-        exec(code, exec_globals)  # Execute the Python code
-        result = output.getvalue()
-        return result[:2000]  # Limit output to prevent excessively long responses
-    except Exception as e:
-        return f"Error during execution: {e}"
-    finally:
-        sys.stdout = sys.__stdout__
+def _outcome(output, result):
+    # Every runner reports (output, metrics); metrics carry the status and run cost
+    keys = ("status", "wall_time", "cpu_time", "peak_rss_kb", "ops", "loop_iterations", "function_calls", "builtin_calls",
+            "compile_time", "build_cached", "stdout_bytes", "stdout_spill", "units", "compiled_units", "raw_stdout")
+    metrics = {key: result.get(key) for key in keys if key in result}
+    return output, metrics
+
+def run_python_code(code, custom_inputs, with_metrics=False, count_ops=False):
+    # Deterministic programs are served from the result cache when the code and input are unchanged
+    output, metrics = cached_run("Python", code, custom_inputs, lambda: _run_python_code(code, custom_inputs, count_ops),
+                                 count_ops=count_ops)
+    return (output, metrics) if with_metrics else output
+
+def _run_python_code(code, custom_inputs, count_ops=False, on_output=None, cancel=None):
+    # Execute in a pre-forked sandbox worker so sessions don't share sys.stdout;
+    # the custom input is streamed to the program's stdin like the C++/Java runners.
+    # count_ops traces the run and adds deterministic op/loop/call counts to the metrics
+    mode = "opcount" if count_ops else "run"
+    result = get_pool().run(code, format_custom_input(custom_inputs), mode=mode, on_output=on_output, cancel=cancel)
+    if result["status"] in STATUS_MESSAGES:
+        return _outcome(STATUS_MESSAGES[result["status"]], result)
+    if result["error"]:
+        return _outcome(f"Error during execution: {result['error']}", result)
+    return _outcome(result["stdout"], result)  # Already bounded to its head and tail by the sandbox
+
+def profile_python_code(code, custom_inputs, with_metrics=False):
+    output, metrics = _profile_python_code(code, custom_inputs)
+    return (output, metrics) if with_metrics else output
+
+def _profile_python_code(code, custom_inputs):
+    # Same sandbox path as run_python_code, with cProfile and tracemalloc switched on.
+    # Not memoized: the timings are the point of a profile
+    result = get_pool().run(code, format_custom_input(custom_inputs), mode="profile")
+    if result["status"] in STATUS_MESSAGES:
+        return _outcome(STATUS_MESSAGES[result["status"]], result)
+    if result["error"]:
+        return _outcome(f"Error during execution: {result['error']}", result)
+
+    profile = {
+        "output": result["stdout"],
+        "functions": pd.DataFrame(result["functions"], columns=["function", "calls", "total_time", "cumulative_time", "per_call"]),
+        "allocations": pd.DataFrame(result["allocations"], columns=["location", "size_kb", "count"]),
+    }
+    return _outcome(profile, result)
 
 def execute_sql_query(query):
     try:
@@ -160,32 +233,46 @@ def execute_sql_query(query):
     finally:
         connection.close()  # Ensure the connection is closed
 
-def run_sql_code(code):
-    output_df = pd.DataFrame()  # Initialize an empty DataFrame
-    # Split the input code into individual SQL statements
-    statements = sqlparse.split(code)
-    
-    try:
-        connection = sqlite3.connect(":memory:")  # Create an in-memory database
-        cursor = connection.cursor()
-        
-        for statement in statements:
-            statement = statement.strip()  # Clean up whitespace
-            if statement:  # Skip empty statements
-                cursor.execute(statement)
-                connection.commit()  # Commit changes if it's an INSERT/UPDATE/DELETE
-
-                # For SELECT queries, fetch and return results as a DataFrame
-                if statement.lower().startswith("select"):
-                    columns = [desc[0] for desc in cursor.description]  # Extract column names
-                    rows = cursor.fetchall()  # Fetch all rows
-                    output_df = pd.DataFrame(rows, columns=columns)  # Convert to DataFrame
-
-        return output_df if not output_df.empty else "No data to display or an error occurred."
-    except Exception as e:
-        return f"Error: {e}"
-    finally:
-        connection.close()  # Ensure the connection is closed
+def run_code(language, code, custom_input=None, count_ops=False, local=False):
+    """
+    Run code in any language and return (output, metrics).
+    With BROKER_ENABLED the job goes to the execution workers while any are alive for the language.
+    """
+    if BROKER_ENABLED and not local:
+        broker = get_broker()
+        if broker.capacity(language)["workers"]:
+            outcome = broker.run(language, code, custom_input, count_ops=count_ops)
+            if outcome is not None:
+                return outcome
+    if language == "SQL":
+        return run_sql_code(code, with_metrics=True)
+    elif language == "Python":
+        return run_python_code(code, custom_input, with_metrics=True, count_ops=count_ops)
+    elif language == "C++":
+        return run_cpp_code(code, custom_input, with_metrics=True)
+    elif language == "Java":
+        return run_java_code(code, custom_input, with_metrics=True)
+    return f"Unsupported language: {language}", {}
+
+def execution_capacity():
+    # Worker capacity summary for the sidebar, or None when runs stay on this server
+    return get_broker().capacity() if BROKER_ENABLED else None
+
+def run_sql_code(code, with_metrics=False):
+    output, metrics = cached_run("SQL", code, None, lambda: _run_sql_code(code))
+    return (output, metrics) if with_metrics else output
+
+def _run_sql_code(code):
+    # Statements run in a sandbox worker against an in-memory database, under the same limits as Python
+    result = get_pool().run_sql(code)
+    if result["status"] in STATUS_MESSAGES:
+        return _outcome(STATUS_MESSAGES[result["status"]], result)
+    if result["error"]:
+        return _outcome(f"Error: {result['error']}", result)
+
+    output_df = pd.DataFrame(result["rows"], columns=result["columns"])  # Result of the last SELECT
+    output = output_df if not output_df.empty else "No data to display or an error occurred."
+    return _outcome(output, result)
 
 
 def format_python_code(code):
@@ -223,84 +310,116 @@ def optimize_python_code(code):
 
 # Existing classes and functions...
 
-def run_cpp_code(code, custom_input=None):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        cpp_file_path = os.path.join(temp_dir, "temp_code.cpp")
-        exe_file_path = os.path.join(temp_dir, "temp_code.exe")
-
-        # Write the C++ code to a temporary file
-        with open(cpp_file_path, "w") as f:
-            f.write(code)
+def run_cpp_code(code, custom_input=None, with_metrics=False):
+    output, metrics = cached_run("C++", code, custom_input, lambda: _run_cpp_code(code, custom_input),
+                                 flags=" ".join(CPP_COMPILE_FLAGS))
+    return (output, metrics) if with_metrics else output
 
-        # Compile the C++ code
-        compile_result = subprocess.run(
-            [
-                r"C:\Program Files\Dev-Cpp\MinGW64\bin\g++.exe",
-                cpp_file_path,
-                "-o",
-                exe_file_path,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+def _run_cpp_code(code, custom_input=None, on_output=None, cancel=None):
+    # Compile through the content-addressed cache: unchanged code skips g++ entirely
+    build = compile_cpp(code)
+    if build["error"]:
+        return _outcome(f"Compilation Error:\n{build['error']}", build)
 
-        # Check for compilation errors
-        if compile_result.returncode != 0:
-            return f"Compilation Error:\n{compile_result.stderr}"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        exe_file_path = checkout_binary(build, os.path.join(temp_dir, "temp_code.exe"))
+        if exe_file_path is None:
+            return _outcome("Unexpected error: the compiled program is no longer in the compile cache.", {"status": "internal_error"})
 
         # Prepare the custom input as newline-separated values
-        input_str = "\n".join(custom_input.split(",")) if custom_input else ""
-
-        try:
-            # Run the compiled executable
-            run_result = subprocess.run(
-                [exe_file_path],
-                input=input_str,  # Pass inputs as newline-separated values
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=10,
-            )
+        input_str = format_custom_input(custom_input)
+
+        # Run the compiled executable under the configured wall/CPU/memory/output limits
+        run_result = run_process([exe_file_path], stdin=input_str, cwd=temp_dir, on_output=on_output, cancel=cancel)
+        run_result.update(compile_time=build["compile_time"], build_cached=build["cached"])
+
+        if run_result["status"] in STATUS_MESSAGES:
+            return _outcome(STATUS_MESSAGES[run_result["status"]], run_result)
+        # Check for runtime errors
+        if run_result["status"] != "ok":
+            return _outcome(f"Runtime Error:\n{run_result['stderr'] or run_result['error']}", run_result)
+
+        # Parse and format the output to include inputs inline with prompts
+        lines = run_result["stdout"].splitlines()
+        if custom_input and not isinstance(input_str, StdinFile):
+            inputs = input_str.splitlines()
+            formatted_output = []
+            input_index = 0
 
-            # Check for runtime errors
-            if run_result.returncode != 0:
-                return f"Runtime Error:\n{run_result.stderr}"
-
-            # Parse and format the output to include inputs inline with prompts
-            lines = run_result.stdout.splitlines()
-            if custom_input:
-                inputs = custom_input.split(",")
-                formatted_output = []
-                input_index = 0
-
-                for line in lines:
-                    # Add input values to the prompts
-                    if "Enter number" in line and input_index < len(inputs):
-                        formatted_output.append(f"{line} {inputs[input_index]}")
-                        input_index += 1
-                    else:
-                        formatted_output.append(line)
-
-                return "\n\n".join(formatted_output)
-            else:
-                # If no custom input, return raw output
-                return run_result.stdout
+            for line in lines:
+                # Add input values to the prompts
+                if "Enter number" in line and input_index < len(inputs):
+                    formatted_output.append(f"{line} {inputs[input_index]}")
+                    input_index += 1
+                else:
+                    formatted_output.append(line)
 
-        except subprocess.TimeoutExpired:
-            return "Runtime Error: The program took too long to execute."
-        except Exception as e:
-            return f"Unexpected error: {e}"
+            # The program's own stdout stays in the metrics for the judge
+            return _outcome("\n\n".join(formatted_output), dict(run_result, raw_stdout=run_result["stdout"]))
+        else:
+            # If no custom input, return raw output
+            return _outcome(run_result["stdout"], run_result)
         
         
-def run_java_code(code, custom_input=None):
-    # Extract the class name from the Java code
-    class_match = re.search(r'class\s+(\w+)', code)
-    if not class_match:
-        return "Error: No class definition found in the code."
+def run_java_code(code, custom_input=None, with_metrics=False):
+    output, metrics = cached_run("Java", code, custom_input, lambda: _run_java_code(code, custom_input))
+    return (output, metrics) if with_metrics else output
+
+def _run_java_code(code, custom_input=None, on_output=None, cancel=None):
+    # The file is named after the public class; the class declaring main() is the one that runs
+    types = java_types(code)
+    if not types["names"]:
+        return _outcome("Error: No class definition found in the code.", {"status": "compile_error"})
+
+    main_class = types["main"] or types["names"][0]
+    class_name = types["public"] or main_class
+
+    # Format custom input as line-separated values
+    formatted_input = format_custom_input(custom_input)
+
+    # The persistent JVM compiles in memory and skips JVM startup; javac/java is the fallback.
+    # The server only answers once the run is over, so live runs always use a child process,
+    # and so do input files, which the child reads straight from disk
+    run_result = None
+    if JAVA_SERVER_ENABLED and on_output is None and not isinstance(formatted_input, StdinFile):
+        run_result = get_java_server().run(class_name, code, formatted_input, main_class=main_class)
+    if run_result is None:
+        run_result = _run_java_subprocess(code, class_name, formatted_input, on_output, cancel, main_class)
+
+    if run_result["status"] == "compile_timeout":
+        return _outcome("Compilation error:\nThe compiler took too long.", run_result)
+    # Check for compilation errors
+    if run_result["status"] == "compile_error":
+        return _outcome(f"Compilation error:\n{run_result['stderr']}", run_result)
+
+    if run_result["status"] in STATUS_MESSAGES:
+        return _outcome(STATUS_MESSAGES[run_result["status"]], run_result)
+    # Check for runtime errors
+    if run_result["status"] != "ok":
+        return _outcome(f"Runtime error:\n{run_result['stderr'] or run_result['error']}", run_result)
+
+    # Ensure line-by-line output
+    output_lines = run_result["stdout"].splitlines()  # Split by lines
+    # Separate input values by lines; prompts can't be matched up with a file's lines
+    input_values = [] if isinstance(formatted_input, StdinFile) else formatted_input.split("\n")
+
+    formatted_output = []
+    input_index = 0
+
+    # Inject inputs into the prompts line by line
+    for line in output_lines:
+        if "Enter" in line and ":" in line:  # Detect prompts
+            if input_index < len(input_values):
+                formatted_output.append(f"{line} {input_values[input_index]}")
+                input_index += 1
+            else:
+                formatted_output.append(line)
+        else:
+            formatted_output.append(line)
 
-    class_name = class_match.group(1)  # Get the class name
+    return _outcome("\n\n".join(formatted_output), dict(run_result, raw_stdout=run_result["stdout"]))
 
+def _run_java_subprocess(code, class_name, formatted_input, on_output=None, cancel=None, main_class=None):
     # Create a temporary directory
     with tempfile.TemporaryDirectory() as temp_dir:
         # Path to save the Java file
@@ -311,58 +430,434 @@ def run_java_code(code, custom_input=None):
             f.write(code)
         
         # Compile the Java code
-        compile_result = subprocess.run(
-            ["javac", java_file_path],
-            capture_output=True,
-            text=True,
-            cwd=temp_dir  # Set the working directory to temp_dir
-        )
+        try:
+            with compile_slots:
+                compile_result = subprocess.run(
+                    ["javac", java_file_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=temp_dir,  # Set the working directory to temp_dir
+                    timeout=EXEC_COMPILE_TIMEOUT,
+                )
+        except subprocess.TimeoutExpired:
+            return {"status": "compile_timeout", "stderr": ""}
         
         # Check for compilation errors
         if compile_result.returncode != 0:
-            return f"Compilation error:\n{compile_result.stderr}"
+            return {"status": "compile_error", "stderr": compile_result.stderr}
+
+        # Run the compiled Java code; the JVM reserves far more address space than it uses,
+        # so the memory limit is applied as the maximum heap size instead of an rlimit
+        return run_process(
+            ["java", f"-Xmx{EXEC_MEMORY_LIMIT_MB}m", main_class or class_name],
+            stdin=formatted_input,  # Pass the formatted custom input
+            cwd=temp_dir,  # Run in the directory where the class file is located
+            limit_memory=False,
+            on_output=on_output,
+            cancel=cancel,
+        )
         
-        # Format custom input as line-separated values
-        formatted_input = custom_input.replace(",", "\n") if custom_input else ""
 
-        # Run the compiled Java code
-        try:
-            run_result = subprocess.run(
-                ["java", class_name],
-                input=formatted_input,  # Pass the formatted custom input
-                capture_output=True,
-                text=True,
-                cwd=temp_dir  # Run in the directory where the class file is located
-            )
-            
-            # Check for runtime errors
-            if run_result.returncode != 0:
-                return f"Runtime error:\n{run_result.stderr}"
-            
-            # Ensure line-by-line output
-            output_lines = run_result.stdout.splitlines()  # Split by lines
-            input_values = formatted_input.split("\n")    # Separate input values by lines
+def run_workspace(language, files, custom_input=None, entry=None, with_metrics=False):
+    """
+    Build and run a multi-file workspace ({relative path: source}).
+    C++ and Java rebuild only the files that changed since the last build; other languages run the entry file.
+    """
+    if language == "C++":
+        output, metrics = _run_cpp_workspace(files, custom_input)
+    elif language == "Java":
+        output, metrics = _run_java_workspace(files, custom_input, entry)
+    elif entry in files:
+        output, metrics = run_code(language, files[entry], custom_input)
+    else:
+        output, metrics = "Error: Select the workspace file to run.", {"status": "runtime_error"}
+    return (output, metrics) if with_metrics else output
 
-            formatted_output = []
-            input_index = 0
+def _run_cpp_workspace(files, custom_input=None):
+    build = compile_cpp_project(files)
+    if build["error"]:
+        return _outcome(f"Compilation Error:\n{build['error']}", build)
 
-            # Inject inputs into the prompts line by line
-            for line in output_lines:
-                if "Enter" in line and ":" in line:  # Detect prompts
-                    if input_index < len(input_values):
-                        formatted_output.append(f"{line} {input_values[input_index]}")
-                        input_index += 1
-                    else:
-                        formatted_output.append(line)
-                else:
-                    formatted_output.append(line)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        exe_file_path = checkout_binary(build, os.path.join(temp_dir, "program.exe"))
+        if exe_file_path is None:
+            return _outcome("Unexpected error: the compiled program is no longer in the compile cache.", {"status": "internal_error"})
+        run_result = run_process([exe_file_path], stdin=format_custom_input(custom_input), cwd=temp_dir)
+        run_result.update(compile_time=build["compile_time"], build_cached=build["cached"],
+                          units=build["units"], compiled_units=build["compiled_units"])
+
+    if run_result["status"] in STATUS_MESSAGES:
+        return _outcome(STATUS_MESSAGES[run_result["status"]], run_result)
+    if run_result["status"] != "ok":
+        return _outcome(f"Runtime Error:\n{run_result['stderr'] or run_result['error']}", run_result)
+    return _outcome(run_result["stdout"], run_result)
+
+def _run_java_workspace(files, custom_input=None, entry=None):
+    main_class = detect_java_main(files, preferred=entry)
+    if main_class is None:
+        return _outcome("Error: No class with a main method found in the workspace.", {"status": "compile_error"})
 
-            return "\n\n".join(formatted_output)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        build = compile_java_project(files, temp_dir)
+        if build["error"]:
+            return _outcome(f"Compilation error:\n{build['error']}", build)
+        run_result = run_process(
+            ["java", f"-Xmx{EXEC_MEMORY_LIMIT_MB}m", "-cp", build["classes"], main_class],
+            stdin=format_custom_input(custom_input),
+            cwd=temp_dir,
+            limit_memory=False,
+        )
+        run_result.update(compile_time=build["compile_time"], build_cached=build["cached"],
+                          units=build["units"], compiled_units=build["compiled_units"])
+
+    if run_result["status"] in STATUS_MESSAGES:
+        return _outcome(STATUS_MESSAGES[run_result["status"]], run_result)
+    if run_result["status"] != "ok":
+        return _outcome(f"Runtime error:\n{run_result['stderr'] or run_result['error']}", run_result)
+    return _outcome(run_result["stdout"], run_result)
+
+
+class LiveRun:
+    """
+    Runs code in the background; iterating yields its stdout as it is printed (for st.write_stream).
+    output and metrics hold the usual (output, metrics) pair once the iteration ends.
+    """
+
+    def __init__(self, language, code, custom_input=None, count_ops=False):
+        self.output, self.metrics = None, {}
+        self._chunks = queue.Queue()
+        self._cancel = threading.Event()
+        runners = {
+            "Python": lambda: _run_python_code(code, custom_input, count_ops, self._chunks.put, self._cancel),
+            "C++": lambda: _run_cpp_code(code, custom_input, self._chunks.put, self._cancel),
+            "Java": lambda: _run_java_code(code, custom_input, self._chunks.put, self._cancel),
+        }
+        self._thread = threading.Thread(target=self._run, args=(runners[language],), daemon=True)
+        self._thread.start()
+
+    def _run(self, execute):
+        try:
+            self.output, self.metrics = execute()
+        except Exception as e:
+            self.output, self.metrics = f"Unexpected error: {e}", {"status": "internal_error"}
+        finally:
+            self._chunks.put(None)
+
+    def __iter__(self):
+        # The page only gets the first CAPTURE_HEAD_BYTES live; the rest is in the full-output pager
+        shown = 0
+        while True:
+            try:
+                chunk = self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                yield ""  # Lets Streamlit stop the script (and with it this run) while the program is silent
+                continue
+            if chunk is None:
+                return
+            if shown < CAPTURE_HEAD_BYTES:
+                chunk = chunk[:CAPTURE_HEAD_BYTES - shown]
+                shown += len(chunk)
+                yield chunk + ("\n... output continues ...\n" if shown >= CAPTURE_HEAD_BYTES else "")
+            else:
+                yield ""
+
+    def cancel(self):
+        self._cancel.set()
+
+def split_test_cases(text, delimiter=TEST_CASE_DELIMITER):
+    # One case per block of lines; blocks are separated by a line holding only the delimiter
+    cases, current = [], []
+    for line in (text or "").splitlines():
+        if line.strip() == delimiter:
+            cases.append("\n".join(current))
+            current = []
+        else:
+            current.append(line)
+    cases.append("\n".join(current))
+    return [case for case in cases if case.strip()]
+
+def run_test_cases(language, code, cases, workers=TEST_CASE_WORKERS):
+    """
+    Run one program against many inputs in parallel and return a per-case table.
+    """
+    runners = {"Python": run_python_code, "C++": run_cpp_code, "Java": run_java_code}
+    if language not in runners:
+        return f"Test cases are not supported for {language}."
+    if not cases:
+        return "No test cases to run."
+
+    # Build once up front; every case then finds the binary in the compile cache
+    # (the Java server compiles concurrent runs of the same source only once)
+    if language == "C++":
+        build = compile_cpp(code)
+        if build["error"]:
+            return f"Compilation Error:\n{build['error']}"
+
+    def run_case(case):
+        return runners[language](code, case, with_metrics=True)
+
+    # Total time is about that of the slowest case rather than the sum of all of them
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(cases)))) as executor:
+        results = list(executor.map(run_case, cases))
+
+    rows = []
+    for index, (case, (output, metrics)) in enumerate(zip(cases, results), start=1):
+        rows.append({
+            "case": index,
+            "input": case,
+            "output": output if isinstance(output, str) else str(output),
+            "status": metrics.get("status"),
+            "wall_time_s": round(metrics["wall_time"], 4) if metrics.get("wall_time") is not None else None,
+            "cpu_time_s": round(metrics["cpu_time"], 4) if metrics.get("cpu_time") is not None else None,
+            "cached": bool(metrics.get("cached")),
+        })
+    return pd.DataFrame(rows)
+
+def submit_code(language, code, cases, mode=JUDGE_DEFAULT_MODE, tolerance=JUDGE_FLOAT_TOLERANCE, workers=TEST_CASE_WORKERS):
+    """
+    Run the code on each case's input and judge its output against the case's expected output.
+    cases is a list of {"input": custom input, "expected": text or file object}; returns a per-case table.
+    """
+    if not cases:
+        return "No expected output to check against."
+
+    def judge_case(case):
+        output, metrics = run_code(language, code, case["input"])
+        if isinstance(output, pd.DataFrame):
+            output = output.to_string(index=False)  # SQL results are judged as the table's text
+        if metrics.get("status") not in (None, "ok"):
+            return metrics, {"passed": False, "line": None, "column": None, "message": output}
+        expected = case["expected"]
+        if isinstance(expected, str):
+            expected_lines = text_lines(expected)
+        else:
+            expected.seek(0)  # Uploaded files are read again on every submit
+            expected_lines = file_lines(expected)
+        # Both sides are read a line at a time; a spilled output is judged from its file
+        return metrics, judge_output(output_lines(output, metrics), expected_lines, mode, tolerance)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(cases)))) as executor:
+        results = list(executor.map(judge_case, cases))
+
+    rows = []
+    for index, (case, (metrics, verdict)) in enumerate(zip(cases, results), start=1):
+        rows.append({
+            "case": index,
+            "input": case["input"],
+            "verdict": "accepted" if verdict["passed"] else metrics.get("status") if metrics.get("status") != "ok" else "wrong_answer",
+            "line": verdict["line"],
+            "column": verdict["column"],
+            "message": verdict["message"] if isinstance(verdict["message"], str) else str(verdict["message"]),
+            "wall_time_s": round(metrics["wall_time"], 4) if metrics.get("wall_time") is not None else None,
+        })
+    return pd.DataFrame(rows)
+
+class StressAbort(Exception):
+    # The generator or the reference broke, so no verdict about the submission is possible
+    pass
+
+def generate_input(generator, size, seed):
+    # One input from a Python generator that sees SIZE and a seeded random
+    case_input, metrics = _run_python_code(f"import random\nrandom.seed({seed})\nSIZE = {size}\n{generator}", None)
+    if metrics.get("status") != "ok":
+        raise StressAbort(f"The generator failed (SIZE={size}, seed={seed}):\n{case_input}")
+    if metrics.get("stdout_spill"):
+        # Large inputs outgrow the in-memory head and tail; the spill file has all of it
+        case_input = read_full_output(metrics["stdout_spill"]) or case_input
+    return case_input
+
+def stress_test(language, code, generator, reference, reference_language="Python", budget=STRESS_TIME_BUDGET,
+                max_cases=STRESS_MAX_CASES, workers=STRESS_WORKERS, mode=JUDGE_DEFAULT_MODE):
+    """
+    Run code and a slow but trusted reference on random inputs until their outputs differ.
+    generator is Python that prints one input; it sees SIZE (growing as the search goes on) and a seeded random.
+    After a mismatch, smaller sizes are searched again so the reported counterexample is as short as possible.
+    """
+    runners = {"Python": _run_python_code, "C++": _run_cpp_code, "Java": _run_java_code}
+    if language not in runners or reference_language not in runners:
+        return {"error": "Stress testing supports Python, C++ and Java.", "cases": 0, "failure": None, "elapsed_s": 0.0}
+    # Build both programs once up front; every case then finds them in the compile cache
+    for name, lang, source in (("submission", language, code), ("reference", reference_language, reference)):
+        if lang == "C++":
+            build = compile_cpp(source)
+            if build["error"]:
+                return {"error": f"Compilation Error in the {name}:\n{build['error']}", "cases": 0, "failure": None,
+                        "elapsed_s": 0.0}
+
+    seeds = itertools.count(1)
+    started = time.monotonic()
+
+    def check(size, seed):
+        # The private runners skip the result cache, which thousands of one-off inputs would only flush
+        case_input = generate_input(generator, size, seed)
+        expected, expected_metrics = runners[reference_language](reference, case_input)
+        if expected_metrics.get("status") != "ok":
+            raise StressAbort(f"The reference failed on this input:\n{case_input}\n{expected}")
+        actual, metrics = runners[language](code, case_input)
+        if metrics.get("status") != "ok":
+            verdict = {"passed": False, "message": f"{metrics.get('status')}: {actual}"}
+        else:
+            # What each program printed in full, not the display text with its prompts and truncation
+            verdict = judge_output(output_lines(actual, metrics), output_lines(expected, expected_metrics), mode)
+        return {"size": size, "seed": seed, "input": case_input, "expected": expected, "actual": actual,
+                "passed": verdict["passed"], "message": verdict["message"]}
+
+    def search(sizes, deadline, limit):
+        # Keeps every worker busy until a mismatch, the deadline or the case limit
+        failures, cases, in_flight = [], 0, set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    while (len(in_flight) < workers * 2 and not failures and cases + len(in_flight) < limit
+                           and time.monotonic() < deadline):
+                        in_flight.add(executor.submit(check, next(sizes), next(seeds)))
+                    if not in_flight:
+                        return failures, cases
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        cases += 1
+                        if not result["passed"]:
+                            failures.append(result)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    growing = (min(STRESS_MAX_SIZE, 1 + index // STRESS_CASES_PER_SIZE) for index in itertools.count())
+    try:
+        failures, cases = search(growing, started + budget, max_cases)
+        if failures and min(failure["size"] for failure in failures) > 1:
+            # Shrink: random inputs at every smaller size, round robin
+            smaller = itertools.cycle(range(1, min(failure["size"] for failure in failures)))
+            more, extra = search(smaller, time.monotonic() + STRESS_SHRINK_BUDGET, STRESS_MAX_CASES)
+            failures += more
+            cases += extra
+    except StressAbort as e:
+        return {"error": str(e), "cases": 0, "failure": None, "elapsed_s": time.monotonic() - started}
+
+    failure = min(failures, key=lambda failure: (len(str(failure["input"])), failure["size"])) if failures else None
+    return {"error": None, "cases": cases, "failure": failure, "elapsed_s": time.monotonic() - started}
+
+def estimate_complexity(language, code, generator, sizes=None, repeats=COMPLEXITY_REPEATS, budget=COMPLEXITY_TIME_BUDGET,
+                        workers=COMPLEXITY_WORKERS):
+    """
+    Time the code on generated inputs of geometrically growing SIZE and fit the runtime and peak-memory
+    curves against the common complexity classes. Returns the per-size measurements and both fits.
+    """
+    # Uncached runners: a timing served from the result cache would measure nothing
+    runners = {"Python": _run_python_code, "C++": _run_cpp_code, "Java": _run_java_code}
+    if language not in runners:
+        return {"error": f"Complexity estimates are not supported for {language}.", "sizes": [], "time": None, "memory": None}
+    if language == "C++":
+        build = compile_cpp(code)
+        if build["error"]:
+            return {"error": f"Compilation Error:\n{build['error']}", "sizes": [], "time": None, "memory": None}
+    sizes = sizes or [int(COMPLEXITY_START_SIZE * COMPLEXITY_GROWTH ** step) for step in range(COMPLEXITY_STEPS)]
+
+    def measure(size, seed):
+        output, metrics = runners[language](code, generate_input(generator, size, seed))
+        return metrics
+
+    rows = []
+    started = time.monotonic()
+    # Repeats of one size run side by side; sizes run one after another so a slow size ends the climb
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, repeats))) as executor:
+        for size in sizes:
+            if time.monotonic() - started > budget:
+                break
+            try:
+                results = list(executor.map(lambda seed: measure(size, seed), range(repeats)))
+            except StressAbort as e:
+                return {"error": str(e), "sizes": rows, "time": None, "memory": None}
+            failed = next((metrics.get("status") for metrics in results if metrics.get("status") != "ok"), None)
+            # CPU time is steadier than wall time while other runs share the machine
+            times = [metrics.get("cpu_time") or metrics.get("wall_time") for metrics in results]
+            memory = [metrics["peak_rss_kb"] / 1024 for metrics in results if metrics.get("peak_rss_kb")]
+            rows.append({
+                "n": size,
+                "time_s": statistics.median(t for t in times if t is not None) if any(t is not None for t in times) else None,
+                "peak_rss_mb": statistics.median(memory) if memory else None,
+                "status": failed or "ok",
+            })
+            # Stop before the next size is likely to hit the wall-clock limit
+            if failed or max(t or 0 for t in times) * COMPLEXITY_GROWTH ** 2 > EXEC_WALL_TIMEOUT:
+                break
+
+    measured = [row for row in rows if row["status"] == "ok"]
+    return {
+        "error": None,
+        "sizes": rows,
+        "time": fit_complexity([row["n"] for row in measured], [row["time_s"] for row in measured]),
+        "memory": fit_complexity([row["n"] for row in measured], [row["peak_rss_mb"] for row in measured]),
+    }
+
+def extract_code_block(text, language=None):
+    # The code inside an LLM reply: the first fenced block (preferring one tagged with the language), or all of it
+    blocks = re.findall(r"```([\w+#-]*)[^\n]*\n(.*?)```", text or "", re.DOTALL)
+    tags = {"Python": ("python", "py"), "C++": ("cpp", "c++", "cxx"), "Java": ("java",), "SQL": ("sql",)}.get(language, ())
+    for tag, body in blocks:
+        if tag.lower() in tags:
+            return body.strip()
+    return blocks[0][1].strip() if blocks else (text or "").strip()
+
+def compare_languages(language, code, custom_input, convert, repeats=COMPARE_REPEATS):
+    """
+    Convert code into the other executable languages with convert(target_language) -> source (e.g. via the LLM),
+    run every version on the same input and compare output and median cost against the original.
+    Returns (table, {language: source}).
+    """
+    runners = {"Python": _run_python_code, "C++": _run_cpp_code, "Java": _run_java_code}
+    if language not in runners:
+        return f"Comparison is not supported for {language}.", {}
+    targets = [target for target in runners if target != language]
+
+    # The LLM calls are the slow part; they run side by side
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        converted = dict(zip(targets, executor.map(lambda target: extract_code_block(convert(target), target), targets)))
+    sources = {language: code, **{target: source for target, source in converted.items() if source}}
+
+    def measure(lang):
+        # Private runners, so each repeat is a real run rather than a result-cache hit
+        runs = [runners[lang](sources[lang], custom_input) for _ in range(repeats)]
+        output, metrics = runs[0]
+        ok = [metrics for _, metrics in runs if metrics.get("status") == "ok"]
+
+        def median(key):
+            values = [m[key] for m in ok if m.get(key) is not None]
+            return statistics.median(values) if values else None
+
+        return output, metrics, median("wall_time"), median("cpu_time"), median("peak_rss_kb")
+
+    # Languages run in parallel, repeats of one language one after another
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        measured = dict(zip(sources, executor.map(measure, sources)))
+
+    base_output, base_metrics, base_wall, _, _ = measured[language]
+    rows = []
+    for lang, (output, metrics, wall, cpu, rss) in measured.items():
+        status = metrics.get("status")
+        if lang == language:
+            matches = True
+        elif status != "ok":
+            matches = False
+        else:
+            # What each version printed in full, not the display text with its prompts and truncation
+            matches = judge_output(output_lines(output, metrics), output_lines(base_output, base_metrics))["passed"]
+        rows.append({
+            "language": lang,
+            "version": "original" if lang == language else "converted",
+            "status": status,
+            "output_matches": matches,
+            "median_wall_s": round(wall, 4) if wall is not None else None,
+            "median_cpu_s": round(cpu, 4) if cpu is not None else None,
+            "peak_rss_mb": round(rss / 1024, 1) if rss else None,
+            "speedup": round(base_wall / wall, 2) if wall and base_wall else None,
+        })
+    for target in targets:
+        if target not in sources:
+            rows.append({"language": target, "version": "converted", "status": "conversion_failed", "output_matches": False})
+    return pd.DataFrame(rows), sources
 
-        except subprocess.TimeoutExpired:
-            return "Runtime Error: The program took too long to execute."
-        
-        
 # Placeholder for C++ formatting function
 def format_cpp_code(code):
     # Currently just returns the unmodified code; customize if you add formatting logic
@@ -373,10 +868,48 @@ def format_java_code(code):
     # Currently just returns the unmodified code; customize if you add formatting logic
     return code
 
-# Optional: You may also add optimizer placeholders if desired
-def optimize_cpp_code(code):
-    # Currently just returns the unmodified code; customize if you add optimization logic
-    return code
+def optimize_cpp_code(code, custom_input=None, repeats=CPP_OPT_REPEATS, native=CPP_OPT_NATIVE):
+    # Build the submission at each optimization level and time it on the current custom input
+    levels = [list(flags) for flags in CPP_OPT_LEVELS]
+    if native:
+        levels.append(["-O3", "-march=native"])
+    input_str = format_custom_input(custom_input)
+
+    # Compiles are independent, so they run in parallel
+    with ThreadPoolExecutor(max_workers=len(levels)) as executor:
+        builds = list(executor.map(lambda flags: compile_cpp(code, CPP_COMPILE_FLAGS + flags), levels))
+
+    rows = []
+    baseline = None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Runs stay sequential so the levels don't compete for the CPU while being timed
+        for flags, build in zip(levels, builds):
+            row = {"flags": " ".join(flags), "compile_time_s": round(build["compile_time"], 3),
+                   "build_cached": build["cached"], "binary_kb": None, "median_runtime_s": None,
+                   "speedup_vs_first": None, "status": build["status"]}
+            rows.append(row)
+            if build["error"]:
+                if build["status"] == "compile_error":
+                    return f"Compilation Error:\n{build['error']}"
+                continue
+            exe_file_path = checkout_binary(build, os.path.join(temp_dir, f"level{len(rows)}.exe"))
+            if exe_file_path is None:  # Evicted from the compile cache since it was built
+                row["status"] = "internal_error"
+                continue
+            row["binary_kb"] = round(os.path.getsize(exe_file_path) / 1024, 1)
+            timings = []
+            for _ in range(repeats):
+                run_result = run_process([exe_file_path], stdin=input_str, cwd=temp_dir)
+                if run_result["status"] != "ok":
+                    row["status"] = run_result["status"]
+                    break
+                timings.append(run_result["wall_time"])
+            if timings:
+                row["median_runtime_s"] = round(statistics.median(timings), 4)
+                if baseline is None:
+                    baseline = row["median_runtime_s"]
+                row["speedup_vs_first"] = round(baseline / row["median_runtime_s"], 2) if row["median_runtime_s"] else None
+    return pd.DataFrame(rows)
 
 def optimize_java_code(code):
     # Currently just returns the unmodified code; customize if you add optimization logic
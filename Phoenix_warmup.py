@@ -0,0 +1,129 @@
+import os
+import time
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+from Phoenix_sandbox import get_pool, compile_slots
+from Phoenix_cpp import compile_cpp
+from Phoenix_java import get_java_server
+from Phoenix_jobs import get_scheduler
+
+try:
+    import ollama
+except ImportError:  # The LLM features are optional; execution still warms up without them
+    ollama = None
+
+WARMUP_CPP = "#include <bits/stdc++.h>\nint main() { return 0; }\n"  # Matches the PCH, so it gets built too
+WARMUP_JAVA = "public class PhoenixWarmup {\n    public static void main(String[] args) {}\n}\n"
+
+
+def _warm_pool():
+    # Forks the sandbox workers and runs a no-op so the first submission finds one already waiting
+    result = get_pool().run("pass")
+    if result["status"] != "ok":
+        raise RuntimeError(result["error"] or result["status"])
+    return f"{SANDBOX_POOL_SIZE} workers"
+
+
+def _warm_scheduler():
+    get_scheduler()
+    return f"{JOB_WORKERS} slots"
+
+
+def _warm_cpp():
+    build = compile_cpp(WARMUP_CPP)
+    if build["error"]:
+        raise RuntimeError(build["error"])
+    return "cached" if build["cached"] else f"compiled in {build['compile_time']:.1f}s"
+
+
+def _warm_java():
+    # Starting the daemon and compiling once loads javac's classes into the JVM that serves every run
+    if JAVA_SERVER_ENABLED and get_java_server().run("PhoenixWarmup", WARMUP_JAVA) is not None:
+        return "daemon ready"
+    # No daemon: at least get the JDK off the disk before the first javac/java fallback
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "PhoenixWarmup.java")
+        with open(path, "w") as f:
+            f.write(WARMUP_JAVA)
+        with compile_slots:
+            result = subprocess.run(["javac", path], capture_output=True, text=True, timeout=EXEC_COMPILE_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "javac failed")
+    return "javac ready (no daemon)"
+
+
+def _warm_model(model):
+    # An empty prompt only loads the model; keep_alive keeps it in memory between requests
+    if ollama is None:
+        raise RuntimeError("The ollama package is not installed.")
+    ollama.generate(model=model, prompt="", keep_alive=WARMUP_KEEP_ALIVE)
+    return f"loaded, kept for {WARMUP_KEEP_ALIVE}"
+
+
+class Warmup:
+    """
+    Runs every warm-up step once, in the background, and keeps the state of each for the readiness display.
+    """
+
+    def __init__(self, models=None, workers=WARMUP_WORKERS):
+        self.steps = {"Sandbox pool": _warm_pool, "Job scheduler": _warm_scheduler}
+        if CPP_WARMUP_ENABLED:
+            self.steps["C++ compiler"] = _warm_cpp
+        if JAVA_WARMUP_ENABLED:
+            self.steps["Java"] = _warm_java
+        for model in WARMUP_MODELS if models is None else models:
+            self.steps[f"Model {model}"] = lambda model=model: _warm_model(model)
+        self.workers = workers
+        self.started = None
+        self._state = {name: {"state": "pending", "seconds": None, "detail": ""} for name in self.steps}
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.started is not None:
+                return
+            self.started = time.time()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="phoenix-warmup")
+        for name, step in self.steps.items():
+            executor.submit(self._run, name, step)
+        executor.shutdown(wait=False)
+
+    def _run(self, name, step):
+        with self._lock:
+            self._state[name]["state"] = "running"
+        started = time.perf_counter()
+        try:
+            detail, state = step(), "ready"
+        except Exception as e:
+            # A failed step only means that feature starts cold; nothing else waits on it
+            detail, state = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__, "failed"
+        with self._lock:
+            self._state[name].update(state=state, seconds=round(time.perf_counter() - started, 2), detail=detail)
+
+    def status(self):
+        # [{"step", "state", "seconds", "detail"}] in start order
+        with self._lock:
+            return [dict(step=name, **state) for name, state in self._state.items()]
+
+    def ready(self):
+        # Every step has finished, whether or not it succeeded; a warm-up that never started has nothing to wait for
+        with self._lock:
+            return self.started is None or all(state["state"] in ("ready", "failed") for state in self._state.values())
+
+
+_warmup = None
+_warmup_lock = threading.Lock()
+
+
+def get_warmup():
+    # One warm-up per server process; Streamlit reruns and new sessions find it already running or done
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = Warmup()
+            if WARMUP_ENABLED:
+                _warmup.start()
+    return _warmup
@@ -0,0 +1,98 @@
+import io
+import os
+import re
+import zipfile
+import posixpath
+from config import *
+
+SOURCE_EXTENSIONS = {
+    ".cpp": "C++", ".cc": "C++", ".cxx": "C++", ".h": "C++", ".hpp": "C++", ".hh": "C++",
+    ".java": "Java", ".py": "Python", ".sql": "SQL",
+}
+CPP_UNIT_EXTENSIONS = (".cpp", ".cc", ".cxx")
+
+JAVA_TYPE = re.compile(r"\b(?:(public)\s+)?(?:(?:abstract|final|static|sealed|strictfp)\s+)*"
+                       r"(class|interface|enum|record)\s+(\w+)")
+JAVA_MAIN = re.compile(r"\bpublic\s+static\s+void\s+main\s*\(|\bstatic\s+public\s+void\s+main\s*\(")
+JAVA_PACKAGE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+
+
+def _clean_path(name):
+    # Relative POSIX path inside the workspace, or None for anything that would escape it
+    path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if path.startswith("..") or path in ("", "."):
+        return None
+    return path
+
+
+def workspace_file(root, path):
+    # Where a workspace file goes under root, or None when the path would land outside it
+    root = os.path.realpath(root)
+    full_path = os.path.realpath(os.path.join(root, path))
+    return full_path if os.path.commonpath([root, full_path]) == root and full_path != root else None
+
+
+def load_workspace_zip(data, max_files=WORKSPACE_MAX_FILES, max_bytes=WORKSPACE_MAX_BYTES):
+    """
+    Read the source files of an uploaded zip into {relative path: text}.
+    """
+    files, total = {}, 0
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            path = _clean_path(info.filename)
+            if info.is_dir() or path is None or posixpath.splitext(path)[1].lower() not in SOURCE_EXTENSIONS:
+                continue
+            if "__MACOSX" in path.split("/") or len(files) >= max_files:
+                continue
+            total += info.file_size
+            if total > max_bytes:
+                break
+            files[path] = archive.read(info).decode("utf-8", errors="replace")
+    # Zips made from a folder put everything under one top-level directory; drop it
+    roots = {path.split("/", 1)[0] for path in files}
+    if len(roots) == 1 and all("/" in path for path in files):
+        files = {path.split("/", 1)[1]: text for path, text in files.items()}
+    return dict(sorted(files.items()))
+
+
+def workspace_language(files):
+    # The language most of the workspace's files are written in
+    counts = {}
+    for path in files:
+        language = SOURCE_EXTENSIONS.get(posixpath.splitext(path)[1].lower())
+        if language:
+            counts[language] = counts.get(language, 0) + 1
+    return max(counts, key=counts.get) if counts else None
+
+
+def java_types(code):
+    """
+    Package, top-level-ish type names, the public type and the type declaring main() of a Java source.
+    """
+    package = JAVA_PACKAGE.search(code)
+    declarations = [(m.start(), m.group(3), bool(m.group(1))) for m in JAVA_TYPE.finditer(code)]
+    public = next((name for _, name, is_public in declarations if is_public), None)
+    main = None
+    match = JAVA_MAIN.search(code)
+    if match:
+        # The closest type declared before main() is the one that declares it
+        before = [name for start, name, _ in declarations if start < match.start()]
+        main = before[-1] if before else None
+    return {
+        "package": package.group(1) if package else None,
+        "names": [name for _, name, _ in declarations],
+        "public": public,
+        "main": main,
+    }
+
+
+def detect_java_main(files, preferred=None):
+    # Fully qualified main class of a Java workspace; the preferred file wins when it has one
+    candidates = []
+    for path in sorted(files, key=lambda path: path != preferred):
+        if not path.endswith(".java"):
+            continue
+        types = java_types(files[path])
+        if types["main"]:
+            candidates.append(f"{types['package']}.{types['main']}" if types["package"] else types["main"])
+    return candidates[0] if candidates else None
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import tempfile
+import statistics
+from config import *
+from Phoenix_cpp import build_binary, ensure_pch
+
+# Cold compile time of a typical submission with and without the precompiled header.
+# Usage: python bench_pch.py [repeats] [extra g++ flags...]  (results also go to bench_output.txt)
+
+SAMPLE = """#include <bits/stdc++.h>
+using namespace std;
+
+int main() {
+    int n;
+    cin >> n;
+    vector<long long> a(n);
+    for (auto &x : a) cin >> x;
+    sort(a.begin(), a.end());
+    map<long long, int> freq;
+    for (auto x : a) freq[x]++;
+    cout << accumulate(a.begin(), a.end(), 0LL) << " " << freq.size() << endl;
+    return 0;
+}
+"""
+
+
+def time_builds(repeats, flags, use_pch):
+    timings = []
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            returncode, stderr, elapsed = build_binary(SAMPLE, os.path.join(temp_dir, "bench.exe"), flags, use_pch=use_pch)
+            if returncode != 0:
+                sys.exit(f"Compilation failed:\n{stderr}")
+            timings.append(elapsed)
+    return timings
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    flags = sys.argv[2:] or list(CPP_COMPILE_FLAGS)
+
+    started = time.perf_counter()
+    if ensure_pch(flags) is None:
+        sys.exit("Could not build the precompiled header.")
+    pch_build = time.perf_counter() - started
+
+    without_pch = time_builds(repeats, flags, use_pch=False)
+    with_pch = time_builds(repeats, flags, use_pch=True)
+    lines = [
+        f"compiler: {CPP_COMPILER} flags: {' '.join(flags) or '(none)'} repeats: {repeats}",
+        f"PCH build (one-time, or reused if already cached): {pch_build:.2f}s",
+        f"without PCH: median {statistics.median(without_pch):.3f}s",
+        f"with PCH:    median {statistics.median(with_pch):.3f}s",
+        f"reduction:   {100 * (1 - statistics.median(with_pch) / statistics.median(without_pch)):.1f}%",
+    ]
+    report = "\n".join(lines)
+    print(report)
+    with open("bench_output.txt", "w") as f:
+        f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import sys
+from Phoenix_analysis import analyze_python_code
+
+# Regression checks for the static complexity analysis of the Python editor.
+# Usage: python check_analysis.py  (exits non-zero and lists the failing snippets)
+
+CASES = [
+    # A loop's iterable is evaluated once, before the loop starts
+    ("for x in sorted(nums):\n    print(x)\n", [], "O(n)"),
+    ("out = [c for c in sorted(words)]\n", [], "O(n)"),
+    ("counts = {c: 1 for c in sorted(words)}\n", [], "O(n)"),
+    ("for x in [y for y in z]:\n    pass\n", [], "O(n)"),
+    # ... but everything evaluated per iteration is inside it
+    ("for x in nums:\n    for y in sorted(x):\n        pass\n", ["nested loops", "sort in loop"], "O(n^2)"),
+    ("out = [c for w in words for c in sorted(w)]\n", ["nested loops", "sort in loop"], "O(n^2)"),
+    ("while q:\n    q.sort()\n", ["sort in loop"], "O(n^2)"),
+    ("seen = []\nfor x in nums:\n    if x in seen:\n        pass\n", ["list membership"], "O(n^2)"),
+]
+
+
+def main():
+    failures = 0
+    for code, patterns, complexity in CASES:
+        analysis = analyze_python_code(code)
+        found = [finding["pattern"] for finding in analysis["findings"]]
+        if found != patterns or analysis["complexity"] != complexity:
+            failures += 1
+            print(f"FAIL {code!r}: expected {patterns} {complexity}, got {found} {analysis['complexity']}")
+    print(f"{len(CASES) - failures}/{len(CASES)} checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
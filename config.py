@@ -3,4 +3,145 @@ snowflake_password = "Phoenix@1"
 snowflake_account = "vd41067.central-india.azure"
 snowflake_warehouse = "COMPUTE_WH"
 snowflake_database = "PHOENIX_DB"
-snowflake_schema = "PHOENIX_SC"
\ No newline at end of file
+snowflake_schema = "PHOENIX_SC"
+
+import os
+import tempfile
+
+# Sandbox worker pool used by run_python_code
+SANDBOX_POOL_SIZE = os.cpu_count() or 2
+SANDBOX_MAX_RUNS_PER_WORKER = 50  # recycle a worker after this many submissions
+SANDBOX_MAX_WORKER_AGE = 600  # seconds before an idle worker is recycled
+SANDBOX_PRELOAD_MODULES = ["pandas", "numpy", "re", "math"]
+
+# Resource limits applied to every run_* executor
+EXEC_WALL_TIMEOUT = 10  # seconds of wall-clock time per run
+EXEC_CPU_LIMIT = 5  # seconds of CPU time per run
+EXEC_MEMORY_LIMIT_MB = 512  # address space per run (Java gets it as -Xmx instead)
+EXEC_OUTPUT_LIMIT = 64 * 1024 * 1024  # bytes a run may print before it is stopped
+EXEC_COMPILE_TIMEOUT = 30  # seconds for g++/javac
+EXEC_MAX_COMPILES = max(1, (os.cpu_count() or 2) // 2)  # g++/javac processes running at once on this host
+
+# C++ compiler used by run_cpp_code
+import platform
+if platform.system() == "Windows":
+    CPP_COMPILER = r"C:\Program Files\Dev-Cpp\MinGW64\bin\g++.exe"
+else:
+    CPP_COMPILER = "g++"
+CPP_COMPILE_FLAGS = []  # extra g++ flags for run_cpp_code, e.g. ["-O2", "-std=c++17"]
+CPP_PCH_ENABLED = True
+CPP_PCH_HEADERS = ["bits/stdc++.h"]  # precompiled once per flag set; bits/stdc++.h covers every standard header
+
+# optimize_cpp_code: optimization levels compared and runs per level
+CPP_OPT_LEVELS = [["-O0"], ["-O2"], ["-O3"]]
+CPP_OPT_NATIVE = False  # also try -O3 -march=native
+CPP_OPT_REPEATS = 5
+
+# Profile mode
+PROFILE_TOP_N = 20  # rows shown in the function and allocation tables
+
+# Memoized results of deterministic runs
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# On-disk cache of compiled C++ binaries
+COMPILE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".phoenix", "compile_cache")
+COMPILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Persistent JVM that compiles and runs Java submissions in memory (falls back to javac/java when unavailable)
+JAVA_SERVER_ENABLED = True
+JAVA_SERVER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PhoenixJavaServer.java")
+JAVA_SERVER_DIR = os.path.join(os.path.expanduser("~"), ".phoenix", "java_server")
+JAVA_SERVER_WORKERS = os.cpu_count() or 2  # submissions the daemon runs at once
+JAVA_SERVER_HEAP_MB = EXEC_MEMORY_LIMIT_MB  # shared by every concurrent run; above the per-run limit the daemon isn't used
+JAVA_SERVER_START_TIMEOUT = 30  # seconds to build and start the daemon
+
+# Multi-test-case runs: cases are separated by a line holding only the delimiter
+TEST_CASE_DELIMITER = "---"
+TEST_CASE_WORKERS = SANDBOX_POOL_SIZE  # cases run at once
+
+# Output capture: only the head and tail stay in memory, the rest is spilled to a gzip file for paging
+CAPTURE_HEAD_BYTES = 32 * 1024
+CAPTURE_TAIL_BYTES = 32 * 1024
+CAPTURE_PAGE_BYTES = 64 * 1024  # one page of the full-output viewer
+CAPTURE_SPILL_DIR = os.path.join(tempfile.gettempdir(), "phoenix_output")
+CAPTURE_SPILL_MAX_AGE = 3600  # seconds before a spill file is pruned
+SQL_RESULT_MAX_BYTES = 1024 * 1024  # rows kept from a SELECT
+
+# Background job scheduler for Run: total concurrent jobs and per-language caps
+JOB_WORKERS = (os.cpu_count() or 2) * 2
+JOB_LANGUAGE_LIMITS = {
+    "Python": SANDBOX_POOL_SIZE,
+    "SQL": SANDBOX_POOL_SIZE,
+    "C++": max(1, (os.cpu_count() or 2) // 2),
+    "Java": max(1, (os.cpu_count() or 2) // 2),
+}
+JOB_HISTORY = 500  # finished jobs kept for polling
+
+# Job broker: frontends queue runs in a shared SQLite file, `python Phoenix_broker.py` workers execute them
+BROKER_ENABLED = False
+BROKER_DB = os.path.join(os.path.expanduser("~"), ".phoenix", "broker.sqlite3")
+BROKER_WORKER_CAPACITY = SANDBOX_POOL_SIZE  # jobs one worker runs at once
+BROKER_POLL_INTERVAL = 0.1
+BROKER_HEARTBEAT_INTERVAL = 2
+BROKER_HEARTBEAT_TIMEOUT = 10  # a worker silent this long is dead and its jobs are queued again
+BROKER_MAX_ATTEMPTS = 3
+BROKER_RESULT_TIMEOUT = 120  # seconds a frontend waits before running the job itself
+
+# Multi-file workspaces (zip upload or the sidebar file tree)
+WORKSPACE_MAX_FILES = 200
+WORKSPACE_MAX_BYTES = 5 * 1024 * 1024  # source text read from one zip
+
+# Output judge behind Submit
+JUDGE_DEFAULT_MODE = "whitespace"  # exact, whitespace, float or unordered
+JUDGE_FLOAT_TOLERANCE = 1e-6  # absolute below 1, relative above
+
+# Stress testing: random inputs against a reference solution until the outputs differ
+STRESS_TIME_BUDGET = 30  # seconds of searching
+STRESS_MAX_CASES = 10000
+STRESS_WORKERS = SANDBOX_POOL_SIZE  # cases checked at once
+STRESS_MAX_SIZE = 1000  # largest SIZE handed to the generator
+STRESS_CASES_PER_SIZE = 10  # cases generated before SIZE grows by one
+STRESS_SHRINK_BUDGET = 5  # seconds spent looking for a smaller counterexample
+
+# Empirical complexity estimates: the submission is timed at SIZE = start * growth^step
+COMPLEXITY_START_SIZE = 1000
+COMPLEXITY_GROWTH = 2
+COMPLEXITY_STEPS = 8
+COMPLEXITY_REPEATS = 3  # runs per size; the median is fitted
+COMPLEXITY_TIME_BUDGET = 60  # seconds
+COMPLEXITY_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # leave cores free so timings stay honest
+
+# Static complexity analysis of Python code, re-run on every edit
+ANALYSIS_CACHE_ENTRIES = 256  # analysed sources kept, keyed by source hash
+
+# Cross-language comparison of LLM-converted code
+COMPARE_REPEATS = 5  # runs per language; medians are compared
+
+# Large custom inputs uploaded as files: kept on disk and handed to the program as its stdin
+INPUT_FILES_DIR = os.path.join(os.path.expanduser("~"), ".phoenix", "inputs")
+INPUT_FILE_CHUNK_BYTES = 1024 * 1024  # copy size while saving an upload
+INPUT_FILE_PREVIEW_BYTES = 4 * 1024  # shown under the uploader
+INPUT_FILE_MAX_AGE = 24 * 3600  # seconds an uploaded file is kept
+BROKER_INPUT_DIR = os.path.join(INPUT_FILES_DIR, "broker")  # where workers keep the input files sent with jobs
+
+# Warm-up at server start, so the first request is as fast as the rest
+WARMUP_ENABLED = True
+WARMUP_MODELS = ["llama3.2:1b", "codegemma:7b"]  # loaded into Ollama ahead of the first description/chat
+WARMUP_KEEP_ALIVE = "24h"  # how long Ollama keeps them loaded after the last request
+WARMUP_WORKERS = 4  # warm-up steps run at once
+CPP_WARMUP_ENABLED = True  # compile a trivial program (and the PCH)
+JAVA_WARMUP_ENABLED = True  # start the Java daemon and compile a trivial class
+
+# Admission control: per-user token buckets (rate per second, burst) and concurrent slots per action.
+# Requests over the limit queue round-robin across users and give up after timeout seconds
+ADMISSION_LIMITS = {
+    "execute": {"rate": 0.5, "burst": 5, "slots": JOB_WORKERS, "queue": 500, "timeout": 60},
+    "format": {"rate": 1.0, "burst": 10, "slots": SANDBOX_POOL_SIZE, "queue": 500, "timeout": 30},
+    "llm": {"rate": 0.1, "burst": 3, "slots": 2, "queue": 200, "timeout": 120},  # one Ollama server
+}
+ADMISSION_POLL_INTERVAL = 0.5  # seconds between queue position updates
+ADMISSION_MAX_BUCKETS = 10000  # idle users' buckets are dropped beyond this
+
+# Pre-flight syntax checks shown in the editor, re-run on every edit
+PREFLIGHT_CACHE_ENTRIES = 256  # checked sources kept, keyed by source hash
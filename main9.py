@@ -10,6 +10,7 @@ from utils2 import (
     format_cpp_code, format_java_code, optimize_cpp_code, optimize_java_code,
     store_feedback,store_ticket,fetch_jira_data
 )
+from phoenix_utils import stress_test
 
 st.set_page_config(layout="wide",page_icon='🐦')
 
@@ -293,7 +294,7 @@ def first_page():
             with col2:
                 test_case = st.button("Test Cases")
                 if test_case:
-                    st.toast("Success!",icon="✅")
+                    st.session_state["stress_open"] = not st.session_state.get("stress_open", False)
                     
             col3,col4 = st.columns(2)
             with col3:
@@ -308,6 +309,38 @@ def first_page():
             code_compt=st.button("Code Completion")
             if code_compt:
                 st.toast("Success!", icon="✅")      
+
+            if st.session_state.get("stress_open"):
+                with st.expander("Stress test", expanded=True):
+                    # Random inputs from a generator, checked against a slow but trusted reference solution
+                    if st.button("Draft with AI", key="stress_draft_button") and st.session_state["code"]:
+                        prompt = ("Write a short Python program that prints one random test input for the following code. "
+                                  "Use the already imported `random` module and the integer variable SIZE as the input size. "
+                                  f"Reply with code only:\n{st.session_state['code']}")
+                        drafted = run_ollama(prompt) or ""
+                        st.session_state["stress_generator"] = drafted.replace("```python", "").replace("```", "").strip()
+                        prompt = ("Write a simple brute-force Python solution that reads the same input from stdin and prints the "
+                                  f"same output as the following code. Reply with code only:\n{st.session_state['code']}")
+                        drafted = run_ollama(prompt) or ""
+                        st.session_state["stress_reference"] = drafted.replace("```python", "").replace("```", "").strip()
+                    st.text_area("Generator (Python, uses SIZE and random)", key="stress_generator", height=120)
+                    reference_language = st.selectbox("Reference language", ["Python", "C++", "Java"], key="stress_reference_language")
+                    st.text_area("Reference solution", key="stress_reference", height=120)
+                    budget = st.slider("Time budget (s)", 5, 120, 30, key="stress_budget")
+                    if st.button("Start", key="stress_start_button"):
+                        with st.spinner("Searching for a failing input..."):
+                            report = stress_test(st.session_state["selected_language"], st.session_state["code"],
+                                                 st.session_state.get("stress_generator", ""), st.session_state.get("stress_reference", ""),
+                                                 reference_language, budget=budget)
+                        if report["error"]:
+                            display_output(report["error"])
+                        elif report["failure"]:
+                            failure = report["failure"]
+                            display_output(f"Mismatch after {report['cases']} cases ({report['elapsed_s']:.1f}s). "
+                                           f"Smallest failing input:\n{failure['input']}\n"
+                                           f"Expected:\n{failure['expected']}\nGot:\n{failure['actual']}\n{failure['message']}")
+                        else:
+                            display_output(f"No mismatch in {report['cases']} cases ({report['elapsed_s']:.1f}s).")
         
     # st.session_state["custom_input"]=st.text_input("Custom Input", placeholder="Enter your test cases here...")
     st.write("Output:")
@@ -1,5 +1,3 @@
-import io
-import sys
 import subprocess
 import ast
 import re
@@ -9,6 +7,8 @@ import black
 import astor
 import os
 import tempfile
+from Phoenix_sandbox import get_pool, run_process, STATUS_MESSAGES
+from config import EXEC_MEMORY_LIMIT_MB
 
 
 class CodeOptimizer(ast.NodeTransformer):
@@ -42,17 +42,15 @@ def optimize_code(source_code):
     return optimized_code
 
 def run_python_code(code,custom_input=None):
-    output = io.StringIO()
-    sys.stdout = output  # Redirect stdout to capture print output
-
-    exec_globals = {}
-    try:
-        exec(code, exec_globals)
-        return output.getvalue() if output.getvalue() else "No output produced."
-    except Exception as e:
-        return f"Error during execution: {e}"
-    finally:
-        sys.stdout = sys.__stdout__  # Reset redirect.
+    # Execute in a pre-forked sandbox worker so sessions don't share sys.stdout;
+    # custom input values are fed to the program's stdin one per line
+    stdin = "\n".join(val.strip() for val in custom_input.split(",")) + "\n" if custom_input else ""
+    result = get_pool().run(code, stdin)
+    if result["status"] in STATUS_MESSAGES:
+        return STATUS_MESSAGES[result["status"]]
+    if result["error"]:
+        return f"Error during execution: {result['error']}"
+    return result["stdout"] if result["stdout"] else "No output produced."
 
 def execute_sql_query(query):
     try:
@@ -146,17 +144,16 @@ def run_cpp_code(code, custom_input=None):
     # Ensure the compiled output is executable
     os.chmod("temp_code.out", 0o755)  # Make the output file executable
     
-    # Run the compiled output, suppressing the version info of g++
-    run_result = subprocess.run(
-        ["./temp_code.out"],  # Use './' to indicate it's a local executable
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
+    # Run the compiled output under the configured wall/CPU/memory/output limits
+    run_result = run_process(["./temp_code.out"])  # Use './' to indicate it's a local executable
     
     # Only show the runtime output if there is no error
-    if run_result.returncode == 0:
-        return run_result.stdout
+    if run_result["status"] == "ok":
+        return run_result["stdout"]
+    elif run_result["status"] in STATUS_MESSAGES:
+        return STATUS_MESSAGES[run_result["status"]]
     else:
-        return f"Runtime Error: {run_result.stderr}"
+        return f"Runtime Error: {run_result['stderr']}"
 def run_java_code(code, input_data):
     # Extract the class name from the Java code
     class_match = re.search(r'class\s+(\w+)', code)
@@ -186,19 +183,21 @@ def run_java_code(code, input_data):
         if compile_result.returncode != 0:
             return f"Compilation error:\n{compile_result.stderr}"
         
-        # Run the compiled Java code
-        run_result = subprocess.run(
-            ["java", class_name],
-            capture_output=True,
-            text=True,
-            cwd=temp_dir  # Run in the directory where the class file is located
+        # Run the compiled Java code; the memory limit is applied as the JVM heap size
+        run_result = run_process(
+            ["java", f"-Xmx{EXEC_MEMORY_LIMIT_MB}m", class_name],
+            stdin=input_data.replace(",", "\n") if input_data else "",
+            cwd=temp_dir,  # Run in the directory where the class file is located
+            limit_memory=False,
         )
         
         # Check for runtime errors or return output
-        if run_result.returncode != 0:
-            return f"Runtime error:\n{run_result.stderr}"
+        if run_result["status"] in STATUS_MESSAGES:
+            return STATUS_MESSAGES[run_result["status"]]
+        if run_result["status"] != "ok":
+            return f"Runtime error:\n{run_result['stderr']}"
         
-        return run_result.stdout
+        return run_result["stdout"]
 # Placeholder for C++ formatting function
 def format_cpp_code(code):
     # Currently just returns the unmodified code; customize if you add formatting logic